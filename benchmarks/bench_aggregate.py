@@ -0,0 +1,50 @@
+"""
+Benchmark totalling transactions by month with Decimal against integer pennies
+
+Run from the repository root:
+
+    python benchmarks/bench_aggregate.py
+"""
+
+import sys
+from collections import defaultdict
+from decimal import Decimal
+from pathlib import Path
+from timeit import repeat
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+# pylint: disable=wrong-import-position
+from bench_transactions import make_rows  # noqa: E402
+from freeagent.aggregate import aggregate  # noqa: E402
+from freeagent.transaction import LazyTransaction, _parse_transaction  # noqa: E402
+
+
+def decimal_totals(rows):
+    """
+    Parse every row and add up Decimal debit values by month
+    """
+    totals = defaultdict(Decimal)
+    for row in map(_parse_transaction, rows):
+        totals[row.dated_on.strftime("%Y-%m")] += row.debit_value
+    return totals
+
+
+def main():
+    """
+    Print the time for each method and the speed up
+    """
+    rows = make_rows(200_000)
+    old = min(repeat(lambda: decimal_totals(rows), number=1, repeat=3))
+    new = min(
+        repeat(
+            lambda: aggregate(map(LazyTransaction, rows), "month"), number=1, repeat=3
+        )
+    )
+    print(f"Decimal : {old * 1000:8.1f} ms for {len(rows)} rows")
+    print(f"pennies : {new * 1000:8.1f} ms for {len(rows)} rows")
+    print(f"speed up: {old / new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark the cold start of ``import freeagent``
+
+Each statement runs in a fresh interpreter, so nothing is cached between runs.
+The modules a statement must not load are checked as well, as a slow import
+coming back is usually one of them.
+
+Run from the repository root:
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --budget-ms 50  # exit 1 if over budget
+"""
+
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+import json
+import os
+import subprocess
+import sys
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+# statement: modules it must not load
+STATEMENTS = {
+    "import freeagent": (
+        "freeagent.base",
+        "requests",
+        "requests_oauthlib",
+        "webbrowser",
+        "httpx",
+        "numpy",
+    ),
+    "from freeagent import FreeAgent": (
+        "requests",
+        "requests_oauthlib",
+        "webbrowser",
+        "httpx",
+        "numpy",
+        "asyncio",
+    ),
+    "from freeagent import ExplanationPayload": ("freeagent.base", "requests"),
+    "from freeagent import AsyncFreeAgent": ("requests_oauthlib", "webbrowser"),
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+exec(sys.argv[1])
+took = time.perf_counter() - start
+print(json.dumps([took, [m for m in sys.argv[2:] if m in sys.modules]]))
+"""
+
+
+def measure(statement: str, forbidden, runs: int):
+    """
+    Time a statement in fresh interpreters
+
+    :return: tuple of the median seconds and the forbidden modules it loaded
+    """
+    env = {**os.environ, "PYTHONPATH": str(SRC)}
+    times = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE, statement, *forbidden],
+            capture_output=True,
+            check=True,
+            env=env,
+            text=True,
+        ).stdout
+        took, found = json.loads(output)
+        times.append(took)
+        loaded.update(found)
+    return median(times), sorted(loaded)
+
+
+def main(argv=None) -> int:
+    """
+    Print the import time of each statement
+    """
+    parser = ArgumentParser(description=__doc__.strip().split("\n", 1)[0])
+    parser.add_argument(
+        "--runs", type=int, default=15, help="interpreters per statement"
+    )
+    parser.add_argument(
+        "--budget-ms", type=float, help="fail if import freeagent takes longer"
+    )
+    args = parser.parse_args(argv)
+
+    status = 0
+    for statement, forbidden in STATEMENTS.items():
+        seconds, loaded = measure(statement, forbidden, args.runs)
+        note = f"  loaded {', '.join(loaded)}" if loaded else ""
+        print(f"{statement:42} {seconds * 1000:8.1f} ms{note}")
+        if loaded:
+            status = 1
+        if (
+            statement == "import freeagent"
+            and args.budget_ms is not None
+            and seconds * 1000 > args.budget_ms
+        ):
+            print(f"import freeagent is over the {args.budget_ms} ms budget")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
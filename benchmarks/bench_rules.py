@@ -0,0 +1,88 @@
+"""
+Benchmark a compiled RuleSet against checking every rule against every row
+
+Run from the repository root:
+
+    python benchmarks/bench_rules.py
+"""
+
+import re
+import sys
+from pathlib import Path
+from timeit import repeat
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "tests"))
+
+# pylint: disable=wrong-import-position
+from test_rules import CATEGORIES  # noqa: E402
+from freeagent.category import CategoryIndex  # noqa: E402
+from freeagent.rules import Rule, RuleSet  # noqa: E402
+
+
+def make_rules(count: int):
+    """
+    Build substring rules with a regex rule every tenth
+    """
+    return [
+        (
+            Rule("365", pattern=rf"\bshop{i:04d}\b")
+            if i % 10 == 0
+            else Rule("365", contains=f"vendor{i:04d}")
+        )
+        for i in range(count)
+    ]
+
+
+def make_transactions(count: int, rules: int):
+    """
+    Build bank transactions, half of them matching a rule
+    """
+    return [
+        {
+            "url": f"https://api/bank_transactions/{i}",
+            "dated_on": "2024-01-10",
+            "description": f"CARD PAYMENT VENDOR{i % (rules * 2):04d} LONDON GB",
+            "amount": "-12.50",
+        }
+        for i in range(count)
+    ]
+
+
+def naive(rules, transactions):
+    """
+    Try every rule in turn for every transaction
+    """
+    compiled = [
+        (re.compile(r.pattern, re.I) if r.pattern else None, r.contains) for r in rules
+    ]
+    found = 0
+    for transaction in transactions:
+        text = transaction["description"]
+        for pattern, contains in compiled:
+            if pattern is not None and pattern.search(text):
+                found += 1
+                break
+            if contains and contains.lower() in text.lower():
+                found += 1
+                break
+    return found
+
+
+def main():
+    """
+    Print the time for each method and the speed up
+    """
+    rules = make_rules(300)
+    transactions = make_transactions(5000, 300)
+    ruleset = RuleSet(rules, CategoryIndex(CATEGORIES))
+    old = min(repeat(lambda: naive(rules, transactions), number=1, repeat=3))
+    new = min(repeat(lambda: ruleset.classify(transactions), number=1, repeat=3))
+    print(f"every rule : {old * 1000:8.1f} ms for {len(transactions)} transactions")
+    print(f"RuleSet    : {new * 1000:8.1f} ms for {len(transactions)} transactions")
+    print(f"speed up   : {old / new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
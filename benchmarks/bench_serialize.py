@@ -0,0 +1,71 @@
+"""
+Benchmark serialize_for_api against the asdict based serializer it replaced
+
+Run from the repository root:
+
+    python benchmarks/bench_serialize.py
+"""
+
+import sys
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from timeit import repeat
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "tests"))
+
+# pylint: disable=wrong-import-position
+# the asdict based serializer the tests check the compiled ones against
+from test_serializer import reference as asdict_serialize  # noqa: E402
+from freeagent.payload import ExplanationPayload  # noqa: E402
+from freeagent.serializer import serialize  # noqa: E402
+
+
+def make_batch(count: int, attachment_size: int):
+    """
+    Build a batch of payloads, every tenth one with an attachment
+    """
+    data = "A" * attachment_size
+    batch = []
+    for i in range(count):
+        payload = ExplanationPayload(
+            category="https://api.freeagent.com/v2/categories/285",
+            dated_on=date(2024, 1, 1 + i % 28),
+            gross_value=Decimal(f"-{i % 500}.{i % 100:02d}"),
+            description=f"Payment {i}",
+            bank_transaction=f"https://api.freeagent.com/v2/bank_transactions/{i}",
+        )
+        if i % 10 == 0:
+            payload.attachment = {
+                "file_name": "receipt.pdf",
+                "description": "Receipt",
+                "content_type": "application/x-pdf",
+                "data": data,
+            }
+        batch.append(payload)
+    return batch
+
+
+def bench(func, batch, number: int = 5) -> float:
+    """
+    Best time in seconds to serialize the whole batch
+    """
+    return min(repeat(lambda: [func(p) for p in batch], number=1, repeat=number))
+
+
+def main():
+    """
+    Print the time for each serializer and the speed up
+    """
+    batch = make_batch(10_000, 1024 * 1024)
+    old = bench(asdict_serialize, batch)
+    new = bench(serialize, batch)
+    print(f"asdict + convert : {old * 1000:8.1f} ms for {len(batch)} payloads")
+    print(f"compiled         : {new * 1000:8.1f} ms for {len(batch)} payloads")
+    print(f"speed up         : {old / new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Benchmark the library end to end against the local FreeAgent stub
+
+Every case runs real HTTP requests against stub_server.StubServer, so
+pagination, retries, serialization and parsing are all measured.  Results are
+appended to benchmarks/results.jsonl, which git ignores, and compared with the
+last run on the same machine.  Until a machine has a run of its own they are
+compared with the committed benchmarks/baseline.jsonl.  Slowdowns beyond the
+threshold are flagged.
+
+Run from the repository root:
+
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --pages 50 --latency 0.02 --only get_api
+    python benchmarks/bench_suite.py --check  # exit 1 on a regression
+
+Record a new baseline, with the default stub settings, after a change that is
+meant to alter the times:
+
+    python benchmarks/bench_suite.py --results benchmarks/baseline.jsonl
+"""
+
+from argparse import ArgumentParser
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter, time
+from timeit import repeat
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# the stub speaks plain http on localhost
+os.environ.setdefault("OAUTHLIB_INSECURE_TRANSPORT", "1")
+
+# pylint: disable=wrong-import-position
+from stub_server import StubServer  # noqa: E402
+from freeagent import AsyncFreeAgent, FreeAgent  # noqa: E402
+from freeagent.attachment import Base64File, encode_json  # noqa: E402
+from freeagent.payload import ExplanationPayload  # noqa: E402
+from freeagent.scheduler import RequestScheduler  # noqa: E402
+from freeagent.transaction import LazyTransaction, _parse_transaction  # noqa: E402
+
+RESULTS = Path(__file__).resolve().parent / "results.jsonl"
+BASELINE = Path(__file__).resolve().parent / "baseline.jsonl"
+TRANSACTION_PARAMS = ("365", "2024-01-01", "2024-12-31")
+
+CASES = {}
+
+
+def case(unit: str):
+    """
+    Register a benchmark case, the function returns the number of units done
+    """
+
+    def register(func):
+        CASES[func.__name__] = (func, unit)
+        return func
+
+    return register
+
+
+def token() -> dict:
+    """
+    Build a token that will not expire during the run
+    """
+    return {
+        "access_token": "stub",
+        "refresh_token": "stub",
+        "token_type": "bearer",
+        "expires_at": time() + 3600,
+    }
+
+
+def scheduler() -> RequestScheduler:
+    """
+    Build a scheduler that never throttles and retries without waiting, so the
+    client is measured and not the freeagent rate limits
+    """
+    return RequestScheduler(per_minute=10**9, per_hour=10**9, backoff=0.0)
+
+
+class Context:  # pylint: disable=too-few-public-methods
+    """
+    Everything the cases share
+    """
+
+    def __init__(self, server: StubServer, workdir: Path):
+        self.server = server
+        self.client = FreeAgent(server.url, scheduler=scheduler(), cache=False)
+        self.client.authenticate("ident", "secret", lambda t: None, token())
+        self.raw_transactions = self.client.get_api(
+            "accounting/transactions",
+            dict(zip(("nominal_code", "from_date", "to_date"), TRANSACTION_PARAMS)),
+        )["transactions"]
+        self.payloads = [
+            ExplanationPayload(
+                category="https://api.freeagent.com/v2/categories/365",
+                dated_on=date(2024, 1, 1 + n % 28),
+                gross_value=Decimal(f"-{n % 500}.{n % 100:02d}"),
+                description=f"Payment {n}",
+                bank_transaction=f"https://api.freeagent.com/v2/bank_transactions/{n}",
+            )
+            for n in range(10_000)
+        ]
+        self.attachment = workdir / "receipt.pdf"
+        self.attachment.write_bytes(os.urandom(4 * 1024 * 1024))
+
+
+@case("items")
+def get_api(ctx: Context) -> int:
+    """
+    Fetch every page of unexplained bank transactions
+    """
+    return len(ctx.client.bank.get_unexplained_transactions("1")["bank_transactions"])
+
+
+@case("items")
+def iter_api(ctx: Context) -> int:
+    """
+    Stream every page of unexplained bank transactions
+    """
+    return sum(1 for _ in ctx.client.bank.iter_unexplained_transactions("1"))
+
+
+@case("items")
+def get_api_429(ctx: Context) -> int:
+    """
+    Fetch every page with one request in five rate limited
+    """
+    config = ctx.server.config
+    every, config.rate_limit_every = config.rate_limit_every, 5
+    try:
+        return get_api(ctx)
+    finally:
+        config.rate_limit_every = every
+
+
+@case("items")
+def async_get_api(ctx: Context) -> int:
+    """
+    Fetch every page with the async client
+    """
+
+    async def run():
+        async with AsyncFreeAgent(
+            ctx.server.url, scheduler=scheduler(), cache=False
+        ) as client:
+            client.authenticate("ident", "secret", None, token())
+            response = await client.bank.get_unexplained_transactions("1")
+        return len(response["bank_transactions"])
+
+    return asyncio.run(run())
+
+
+@case("rows")
+def get_transactions(ctx: Context) -> int:
+    """
+    Fetch and fully parse accounting transactions
+    """
+    return len(ctx.client.transaction.get_transactions(*TRANSACTION_PARAMS))
+
+
+@case("rows")
+def parse_eager(ctx: Context) -> int:
+    """
+    Parse every field of fetched transactions
+    """
+    return len([_parse_transaction(raw) for raw in ctx.raw_transactions])
+
+
+@case("rows")
+def parse_lazy(ctx: Context) -> int:
+    """
+    Wrap fetched transactions and read the fields a report needs
+    """
+    rows = [LazyTransaction(raw) for raw in ctx.raw_transactions]
+    sum(row.debit_value for row in rows if row.dated_on.month < 7)
+    return len(rows)
+
+
+@case("payloads")
+def serialize_for_api(ctx: Context) -> int:
+    """
+    Serialize explanation payloads
+    """
+    return len([ctx.client.serialize_for_api(p) for p in ctx.payloads])
+
+
+@case("MB")
+def attachment_encode(ctx: Context) -> float:
+    """
+    Build and stream the body of an explanation with a 4MB attachment
+    """
+    body = encode_json(
+        {"bank_transaction_explanation": {"attachment": Base64File(ctx.attachment)}}
+    )
+    return sum(len(chunk) for chunk in body) / 1024 / 1024
+
+
+@case("MB")
+def attachment_post(ctx: Context) -> float:
+    """
+    Send an explanation with a streamed 4MB attachment to the stub
+    """
+    payload = ctx.payloads[0]
+    ctx.client.bank.attach_file_to_explanation(payload, ctx.attachment, stream=True)
+    try:
+        ctx.client.bank.explain_transactions([payload])
+    finally:
+        payload.attachment = None
+    return ctx.attachment.stat().st_size / 1024 / 1024
+
+
+@case("lookups")
+def category_lookup(ctx: Context) -> int:
+    """
+    Load the categories and look up descriptions, a fifth of them missing
+    """
+    ctx.client.category.refresh()
+    count = ctx.server.config.categories
+    descriptions = [f"category {n % (count * 5 // 4)} expenses" for n in range(10_000)]
+    ctx.client.category.get_desc_ids(descriptions)
+    return len(descriptions)
+
+
+@case("requests")
+def explain_transactions(ctx: Context) -> int:
+    """
+    Post explanations concurrently
+    """
+    report = ctx.client.bank.explain_transactions(ctx.payloads[:500], max_workers=8)
+    return len(report.succeeded)
+
+
+def git_commit() -> str:
+    """
+    Get the commit being measured, or None outside a git checkout
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_run(path: Path, machine: str, config: dict) -> dict:
+    """
+    Get the results of the last recorded run on this machine with the same stub
+    settings, as the settings change the times
+
+    :param machine: name of the machine, None for a run on any machine
+    """
+    if not path.exists():
+        return {}
+    last = {}
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if machine not in (None, record.get("machine")):
+                continue
+            if record.get("config") == config:
+                last = record["results"]
+    return last
+
+
+def run_case(ctx: Context, name: str, runs: int) -> dict:
+    """
+    Time a case, keeping the best of runs
+    """
+    func, unit = CASES[name]
+    done = []
+    seconds = min(repeat(lambda: done.append(func(ctx)), number=1, repeat=runs))
+    return {"seconds": seconds, "rate": done[-1] / seconds, "unit": unit}
+
+
+def show(name: str, result: dict, old: dict, threshold: float) -> bool:
+    """
+    Print a result with the change from the previous run
+
+    :return: True if it is a regression
+    """
+    note = ""
+    regression = False
+    if old is not None:
+        change = result["seconds"] / old["seconds"] - 1
+        regression = change > threshold
+        note = f"{change:+7.1%}" + ("  REGRESSION" if regression else "")
+    print(
+        f"{name:20} {result['seconds'] * 1000:9.1f} ms"
+        f" {result['rate']:12,.0f} {result['unit']}/s  {note}"
+    )
+    return regression
+
+
+def parse_args(argv=None):
+    """
+    Parse the command line
+    """
+    parser = ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--pages", type=int, default=20, help="pages per endpoint")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds per request"
+    )
+    parser.add_argument("--padding", type=int, default=0, help="extra description size")
+    parser.add_argument(
+        "--rate-limit-every", type=int, default=0, help="429 every nth request"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="runs per case, best kept"
+    )
+    parser.add_argument("--only", nargs="*", choices=sorted(CASES), help="cases to run")
+    parser.add_argument("--results", type=Path, default=RESULTS, help="results file")
+    parser.add_argument("--no-record", action="store_true", help="do not save results")
+    parser.add_argument(
+        "--threshold", type=float, default=0.15, help="slowdown flagged, 0.15 is 15%%"
+    )
+    parser.add_argument("--check", action="store_true", help="exit 1 on a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """
+    Run the cases, print a table and record the results
+    """
+    args = parse_args(argv)
+    config = {
+        "pages": args.pages,
+        "latency": args.latency,
+        "padding": args.padding,
+        "rate_limit_every": args.rate_limit_every,
+    }
+    machine = platform.node()
+    before = previous_run(args.results, machine, config)
+    if not before and args.results != BASELINE:
+        before = previous_run(BASELINE, None, config)
+        if before:
+            print(f"no earlier run on {machine}, comparing with {BASELINE.name}")
+    results = {}
+    regressions = []
+    with StubServer(**config) as server, TemporaryDirectory() as workdir:
+        ctx = Context(server, Path(workdir))
+        for name in args.only or CASES:
+            results[name] = run_case(ctx, name, args.repeat)
+            if show(name, results[name], before.get(name), args.threshold):
+                regressions.append(name)
+
+    if not args.no_record:
+        record = {
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": machine,
+            "config": config,
+            "results": results,
+        }
+        with args.results.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    return 1 if args.check and regressions else 0
+
+
+if __name__ == "__main__":
+    START = perf_counter()
+    STATUS = main()
+    print(f"total {perf_counter() - START:.1f} s")
+    sys.exit(STATUS)
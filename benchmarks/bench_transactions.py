@@ -0,0 +1,61 @@
+"""
+Benchmark a report over lazy transaction rows against fully parsed ones
+
+Run from the repository root:
+
+    python benchmarks/bench_transactions.py
+"""
+
+import sys
+from datetime import date
+from pathlib import Path
+from timeit import repeat
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+# pylint: disable=wrong-import-position
+from freeagent.transaction import LazyTransaction, _parse_transaction  # noqa: E402
+
+
+def make_rows(count: int):
+    """
+    Build rows as returned by the accounting/transactions endpoint
+    """
+    return [
+        {
+            "url": f"https://api.freeagent.com/v2/transactions/{i}",
+            "dated_on": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "created_at": "2024-01-06T10:00:00.000Z",
+            "updated_at": "2024-01-07T10:00:00.000Z",
+            "description": f"Payment {i}",
+            "category": "https://api.freeagent.com/v2/categories/365",
+            "category_name": "Travel",
+            "nominal_code": "365",
+            "debit_value": f"-{i % 500}.{i % 100:02d}",
+        }
+        for i in range(count)
+    ]
+
+
+def report(rows, parse):
+    """
+    Sum the debits in the first half of the year
+    """
+    cutoff = date(2024, 7, 1)
+    return sum(t.debit_value for t in map(parse, rows) if t.dated_on < cutoff)
+
+
+def main():
+    """
+    Print the time for each row type and the speed up
+    """
+    rows = make_rows(200_000)
+    times = {}
+    for name, parse in (("eager", _parse_transaction), ("lazy", LazyTransaction)):
+        times[name] = min(repeat(lambda p=parse: report(rows, p), number=1, repeat=3))
+        print(f"{name:6}: {times[name] * 1000:8.1f} ms for {len(rows)} rows")
+    print(f"speed up: {times['eager'] / times['lazy']:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Local stand in for the FreeAgent API, used by the benchmark suite
+
+Serves the endpoints this library calls with generated records, so requests,
+pagination and serialization run for real without the network or an account:
+
+- bank_accounts
+- bank_transactions, paginated
+- bank_transaction_explanations, POST and PUT
+- categories
+- accounting/transactions, paginated
+- token_endpoint
+
+Start it with ``with StubServer(pages=20) as server:`` and point a client at
+``server.url``.  Pages are built once and reused, so the time measured is the
+client's and not the stub's.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import sleep
+from urllib.parse import parse_qs, urlsplit
+import json
+
+PER_PAGE = 100
+
+
+class StubConfig:  # pylint: disable=too-few-public-methods
+    """
+    Settings for the stub, change them between runs to vary the load
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        pages: int = 10,
+        latency: float = 0.0,
+        padding: int = 0,
+        rate_limit_every: int = 0,
+        categories: int = 200,
+    ):
+        """
+        :param pages: pages of items in each paginated endpoint
+        :param latency: seconds to wait before answering each request
+        :param padding: extra characters added to each description, to make
+            pages larger
+        :param rate_limit_every: answer every nth request with a 429, 0 for never
+        :param categories: number of categories served
+        """
+        self.pages = pages
+        self.latency = latency
+        self.padding = padding
+        self.rate_limit_every = rate_limit_every
+        self.categories = categories
+
+
+def bank_transaction(number: int, padding: int) -> dict:
+    """
+    Build a generated unexplained bank transaction
+    """
+    return {
+        "url": f"https://api.freeagent.com/v2/bank_transactions/{number}",
+        "bank_account": "https://api.freeagent.com/v2/bank_accounts/1",
+        "dated_on": f"2024-{1 + number % 12:02d}-{1 + number % 28:02d}",
+        "amount": f"-{number % 500}.{number % 100:02d}",
+        "unexplained_amount": f"-{number % 500}.{number % 100:02d}",
+        "description": f"CARD PAYMENT VENDOR{number % 997:04d} LONDON GB"
+        + "x" * padding,
+        "created_at": "2024-01-06T10:00:00.000Z",
+        "updated_at": "2024-01-07T10:00:00.000Z",
+    }
+
+
+def accounting_transaction(number: int, padding: int) -> dict:
+    """
+    Build a generated accounting transaction
+    """
+    return {
+        "url": f"https://api.freeagent.com/v2/accounting/transactions/{number}",
+        "dated_on": f"2024-{1 + number % 12:02d}-{1 + number % 28:02d}",
+        "created_at": "2024-01-06T10:00:00.000Z",
+        "updated_at": "2024-01-07T10:00:00.000Z",
+        "description": f"Payment {number}" + "x" * padding,
+        "category": "https://api.freeagent.com/v2/categories/365",
+        "category_name": "Travel",
+        "nominal_code": "365",
+        "debit_value": f"-{number % 500}.{number % 100:02d}",
+    }
+
+
+def make_categories(count: int) -> dict:
+    """
+    Build generated categories, split between the category groups
+    """
+    groups = (
+        "admin_expenses_categories",
+        "cost_of_sales_categories",
+        "income_categories",
+        "general_categories",
+    )
+    result = {group: [] for group in groups}
+    for number in range(count):
+        code = str(100 + number)
+        result[groups[number % len(groups)]].append(
+            {
+                "url": f"https://api.freeagent.com/v2/categories/{code}",
+                "description": f"Category {number} expenses",
+                "nominal_code": code,
+            }
+        )
+    return result
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Answer requests from the pages held by the server
+    """
+
+    protocol_version = "HTTP/1.1"  # keep-alive, as freeagent does
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass  # keep benchmark output clean
+
+    def _reply(self, status: int, body: bytes, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start(self) -> bool:
+        """
+        Count the request, wait for the latency and inject rate limiting
+
+        :return: True if the request should be answered normally
+        """
+        length = int(self.headers.get("Content-Length") or 0)
+        self.server.stub.record(self.command, length)
+        self.rfile.read(length)
+        config = self.server.stub.config
+        if config.latency:
+            sleep(config.latency)
+        if self.server.stub.rate_limited():
+            self._reply(
+                429, b'{"errors":{"message":"rate limited"}}', {"Retry-After": "0"}
+            )
+            return False
+        return True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Serve the list endpoints
+        """
+        if not self._start():
+            return
+        parts = urlsplit(self.path)
+        endpoint = parts.path.split("/v2/", 1)[-1]
+        query = parse_qs(parts.query)
+        page = int(query.get("page", ["1"])[0])
+        found = self.server.stub.page(endpoint, page)
+        if found is None:
+            self._reply(404, b'{"errors":{"message":"not found"}}')
+            return
+        body, headers = found
+        self._reply(200, body, headers)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Accept new explanations and token refreshes
+        """
+        if not self._start():
+            return
+        endpoint = urlsplit(self.path).path.split("/v2/", 1)[-1]
+        if endpoint == "token_endpoint":
+            self._reply(
+                200,
+                b'{"access_token":"stub","refresh_token":"stub",'
+                b'"token_type":"bearer","expires_in":3600}',
+            )
+        elif endpoint == "bank_transaction_explanations":
+            self._reply(
+                201,
+                b'{"bank_transaction_explanation":{"url":'
+                b'"https://api.freeagent.com/v2/bank_transaction_explanations/1"}}',
+            )
+        else:
+            self._reply(404, b'{"errors":{"message":"not found"}}')
+
+    def do_PUT(self):  # pylint: disable=invalid-name
+        """
+        Accept explanation updates
+        """
+        if not self._start():
+            return
+        self._reply(200, b'{"bank_transaction_explanation":{}}')
+
+
+class StubServer:  # pylint: disable=too-many-instance-attributes
+    """
+    FreeAgent stub running in a background thread
+    """
+
+    def __init__(self, **config):
+        """
+        :param config: settings for StubConfig
+        """
+        self.config = StubConfig(**config)
+        self.requests = {}  # method: count
+        self.bytes_received = 0
+        self._count = 0
+        self._pages = {}
+        self._lock = Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """
+        api_base_url for clients
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v2/"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self, **config):
+        """
+        Clear the counters and cached pages, changing any settings passed
+
+        :param config: settings for StubConfig to change
+        """
+        with self._lock:
+            for name, value in config.items():
+                setattr(self.config, name, value)
+            self.requests = {}
+            self.bytes_received = 0
+            self._count = 0
+            self._pages = {}
+
+    def record(self, method: str, length: int):
+        """
+        Count a request
+        """
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+            self.bytes_received += length
+
+    def rate_limited(self) -> bool:
+        """
+        :return: True if this request should get a 429
+        """
+        every = self.config.rate_limit_every
+        with self._lock:
+            self._count += 1
+            return bool(every) and self._count % every == 0
+
+    def page(self, endpoint: str, page: int):
+        """
+        Get a page of an endpoint, built the first time it is asked for
+
+        :return: tuple of the body and headers, or None for unknown endpoints
+        """
+        key = (endpoint, page)
+        with self._lock:
+            found = self._pages.get(key)
+        if found is None:
+            found = self._build(endpoint, page)
+            if found is not None:
+                with self._lock:
+                    self._pages[key] = found
+        return found
+
+    def _build(self, endpoint: str, page: int):
+        config = self.config
+        if endpoint == "categories":
+            return json.dumps(make_categories(config.categories)).encode(), {}
+        if endpoint == "bank_accounts":
+            accounts = [
+                {
+                    "url": f"https://api.freeagent.com/v2/bank_accounts/{n}",
+                    "name": name,
+                    "type": kind,
+                    "is_primary": n == 1,
+                }
+                for n, (name, kind) in enumerate(
+                    (("Current", "StandardBankAccount"), ("PayPal", "PaypalAccount")),
+                    1,
+                )
+            ]
+            return json.dumps({"bank_accounts": accounts}).encode(), {}
+
+        builders = {
+            "bank_transactions": bank_transaction,
+            "accounting/transactions": accounting_transaction,
+        }
+        if endpoint not in builders:
+            return None
+        key = endpoint.rsplit("/", 1)[-1]
+        first = (page - 1) * PER_PAGE
+        stop = min(config.pages * PER_PAGE, first + PER_PAGE)
+        items = [builders[endpoint](n, config.padding) for n in range(first, stop)]
+        headers = {"X-Total-Count": str(config.pages * PER_PAGE)}
+        return json.dumps({key: items}).encode(), headers
@@ -1,27 +1,87 @@
 """
 Public class
+
+The public names are imported from their submodules the first time they are
+used (PEP 562), so ``import freeagent`` does not pay for modules a job never
+touches.
 """
 
+from importlib import import_module
+from typing import TYPE_CHECKING
+
 try:
     from ._version import version as __version__
 except ModuleNotFoundError:
     # _version.py is written when building dist
     __version__ = "0.0.0+local"
 
-from .base import FreeAgentBase
-from .bank import BankAPI
-from .category import CategoryAPI
-from .transaction import TransactionAPI
-from .payload import ExplanationPayload
+# public name: submodule it is defined in
+_EXPORTS = {
+    "FreeAgent": ".client",
+    "APIError": ".base",
+    "FreeAgentBase": ".base",
+    "BankAPI": ".bank",
+    "CategoryAPI": ".category",
+    "LazyTransaction": ".transaction",
+    "TransactionAPI": ".transaction",
+    "TransactionTable": ".table",
+    "ExplanationPayload": ".payload",
+    "ExplanationReport": ".payload",
+    "ExplanationResult": ".payload",
+    "Rule": ".rules",
+    "RuleSet": ".rules",
+    "AsyncFreeAgent": ".aio",
+    "RequestScheduler": ".scheduler",
+    "LRUCache": ".cache",
+    "SQLiteCache": ".cache",
+    "MetricsCollector": ".metrics",
+    "StatsdExporter": ".metrics",
+    "IncrementalSync": ".sync",
+    "MemoryStore": ".sync",
+    "SQLiteMirror": ".mirror",
+    "ClientPool": ".pool",
+    "FileTokenStore": ".auth",
+    "TokenManager": ".auth",
+}
 
+__all__ = list(_EXPORTS)
 
-class FreeAgent(FreeAgentBase):
+
+def __getattr__(name: str):
     """
-    The main public class
+    Import a public name from its submodule on first use
+
+    :param name: attribute being looked up
+
+    :return: the class
+    :raises AttributeError: if name is not public
     """
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value  # later lookups do not come back here
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
 
-    def __init__(self):
-        super().__init__()  # initialse base class
-        self.bank = BankAPI(self)
-        self.category = CategoryAPI(self)
-        self.transaction = TransactionAPI(self)
+if TYPE_CHECKING:  # pragma: no cover
+    from .aio import AsyncFreeAgent
+    from .auth import FileTokenStore, TokenManager
+    from .bank import BankAPI
+    from .base import APIError, FreeAgentBase
+    from .cache import LRUCache, SQLiteCache
+    from .category import CategoryAPI
+    from .client import FreeAgent
+    from .metrics import MetricsCollector, StatsdExporter
+    from .mirror import SQLiteMirror
+    from .payload import ExplanationPayload, ExplanationReport, ExplanationResult
+    from .pool import ClientPool
+    from .rules import Rule, RuleSet
+    from .scheduler import RequestScheduler
+    from .sync import IncrementalSync, MemoryStore
+    from .table import TransactionTable
+    from .transaction import LazyTransaction, TransactionAPI
@@ -0,0 +1,213 @@
+"""
+Registry of freeagent bank accounts, each view is fetched once and indexed
+so repeated lookups do not go back to the API
+"""
+
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+ALL_ACCOUNTS = "all"  # view name used for bank_accounts without a view filter
+
+
+def get_account_id(account: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Get the ID of a bank account from the end of its url
+
+    :param account: bank account dict, or None
+
+    :return: ID of the account or None
+    """
+    if account is None:
+        return None
+    return account["url"].rsplit("/", 1)[-1]
+
+
+class BankAccountIndex:  # pylint: disable=too-few-public-methods
+    """
+    Bank accounts from one view, indexed by lowercased name, ID, url and type
+
+    When names clash the first account listed wins, the same as a linear search.
+    """
+
+    def __init__(self, accounts: List[Dict[str, Any]]):
+        """
+        Build the indexes
+
+        :param accounts: list of bank account dicts from freeagent
+        """
+        self.accounts = accounts
+        self.by_name = {}
+        self.by_id = {}
+        self.by_url = {}
+        self.by_type = {}
+        self.primary = None
+        for account in accounts:
+            self.by_name.setdefault(account.get("name", "").lower(), account)
+            url = account.get("url")
+            if url:
+                self.by_url.setdefault(url, account)
+                self.by_id.setdefault(get_account_id(account), account)
+            self.by_type.setdefault(account.get("type"), []).append(account)
+            if self.primary is None and account.get("is_primary"):
+                self.primary = account
+
+
+class BankAccountRegistry:
+    """
+    Load each bank_accounts view once and answer lookups from its index
+
+    Call invalidate or refresh after adding or changing accounts on freeagent.
+    """
+
+    def __init__(self, parent):
+        """
+        Initialize the registry
+
+        :param parent: the main FreeAgent instance used to fetch the accounts
+        """
+        self.parent = parent
+        self._views = {}
+        self._lock = Lock()
+
+    def cached(self, view: str = ALL_ACCOUNTS) -> Optional[BankAccountIndex]:
+        """
+        Get the index for a view if it has been loaded
+
+        :param view: freeagent bank account view, or ALL_ACCOUNTS
+
+        :return: BankAccountIndex or None
+        """
+        return self._views.get(view)
+
+    def load(self, view: str, accounts: List[Dict[str, Any]]) -> BankAccountIndex:
+        """
+        Index accounts already fetched for a view, used by the async client
+
+        :param view: freeagent bank account view, or ALL_ACCOUNTS
+        :param accounts: list of bank account dicts from freeagent
+
+        :return: the new BankAccountIndex
+        """
+        index = BankAccountIndex(accounts)
+        self._views[view] = index
+        return index
+
+    def index(self, view: str = ALL_ACCOUNTS) -> BankAccountIndex:
+        """
+        Get the index for a view, fetching the accounts the first time
+
+        :param view: freeagent bank account view, or ALL_ACCOUNTS
+
+        :return: BankAccountIndex for the view
+        """
+        index = self._views.get(view)
+        if index is not None:
+            return index
+        with self._lock:
+            index = self._views.get(view)  # another thread may have loaded it
+            if index is None:
+                params = None if view == ALL_ACCOUNTS else {"view": view}
+                response = self.parent.get_api("bank_accounts", params)
+                index = self.load(view, response.get("bank_accounts", []))
+        return index
+
+    def invalidate(self, view: str = None):
+        """
+        Forget loaded accounts so the next lookup fetches them again
+
+        :param view: view to forget, or None for every view
+        """
+        with self._lock:
+            if view is None:
+                self._views.clear()
+            else:
+                self._views.pop(view, None)
+
+    def refresh(self, view: str = ALL_ACCOUNTS) -> BankAccountIndex:
+        """
+        Fetch a view again now
+
+        :param view: freeagent bank account view, or ALL_ACCOUNTS
+
+        :return: the new BankAccountIndex
+        """
+        self.invalidate(view)
+        return self.index(view)
+
+    def accounts(self, view: str = ALL_ACCOUNTS) -> List[Dict[str, Any]]:
+        """
+        Get every account in a view
+
+        :param view: freeagent bank account view, or ALL_ACCOUNTS
+
+        :return: list of bank account dicts
+        """
+        return self.index(view).accounts
+
+    def by_name(self, name: str, view: str = ALL_ACCOUNTS) -> Optional[Dict[str, Any]]:
+        """
+        Find an account by name, not case sensitive
+
+        :param name: name of the account
+        :param view: freeagent bank account view, or ALL_ACCOUNTS
+
+        :return: bank account dict or None if not found
+        """
+        return self.index(view).by_name.get(name.lower())
+
+    def _find(self, attr: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up key in an index of any loaded view, loading every account if needed
+
+        :param attr: name of the BankAccountIndex dict to search
+        :param key: key to look up
+
+        :return: bank account dict or None if not found
+        """
+        for index in list(self._views.values()):
+            account = getattr(index, attr).get(key)
+            if account is not None:
+                return account
+        if ALL_ACCOUNTS in self._views:
+            return None
+        return getattr(self.index(ALL_ACCOUNTS), attr).get(key)
+
+    def by_id(self, ident: str) -> Optional[Dict[str, Any]]:
+        """
+        Find an account by ID
+
+        :param ident: ID of the account, the end of its url
+
+        :return: bank account dict or None if not found
+        """
+        return self._find("by_id", str(ident))
+
+    def by_url(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Find an account by url
+
+        :param url: url of the account
+
+        :return: bank account dict or None if not found
+        """
+        return self._find("by_url", url)
+
+    def by_type(self, account_type: str) -> List[Dict[str, Any]]:
+        """
+        Get every account of a type
+
+        :param account_type: freeagent account type, for example "StandardBankAccount"
+
+        :return: list of bank account dicts
+        """
+        return self.index(ALL_ACCOUNTS).by_type.get(account_type, [])
+
+    def primary(self, view: str = "standard_bank_accounts") -> Optional[Dict[str, Any]]:
+        """
+        Get the primary account
+
+        :param view: freeagent bank account view to search
+
+        :return: bank account dict or None if there is no primary account
+        """
+        return self.index(view).primary
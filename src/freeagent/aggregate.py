@@ -0,0 +1,201 @@
+"""
+Totals of transactions grouped by nominal code, category or period
+
+Amounts are added up as whole pennies and only turned into Decimal for the
+results.  Rows are read one at a time, so the generators from iter_transactions
+can be aggregated without building a list.
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, AsyncIterable, Dict, Iterable, Tuple, Union
+
+from .payload import Transaction, to_pennies
+
+GROUPS = (
+    "nominal_code",
+    "category",
+    "category_name",
+    "day",
+    "month",
+    "year",
+    "vat_quarter",
+)
+
+
+@dataclass
+class Summary:
+    """
+    dataclass for the totals of one group
+    """
+
+    count: int
+    total: Decimal
+    minimum: Decimal
+    maximum: Decimal
+
+
+def vat_quarter(dated_on: str, stagger: int = 1) -> str:
+    """
+    Get the VAT quarter a date falls in
+
+    :param dated_on: YYYY-MM-DD date
+    :param stagger: VAT stagger of the company, 1 for quarters ending March,
+        June, September and December, 2 for April..., 3 for May...
+
+    :return: end month of the quarter as YYYY-MM
+    """
+    year, month = int(dated_on[:4]), int(dated_on[5:7])
+    end = month + (stagger - 1 - month) % 3
+    if end > 12:
+        year, end = year + 1, end - 12
+    return f"{year}-{end:02d}"
+
+
+def _order(key) -> tuple:
+    """
+    Sort key for group keys, which may hold None
+    """
+    parts = key if isinstance(key, tuple) else (key,)
+    return tuple("" if part is None else str(part) for part in parts)
+
+
+class Aggregator:
+    """
+    Running totals of transactions, grouped by one or more keys
+
+    Call add or update as rows arrive, then results for the Summary of each group.
+    """
+
+    def __init__(self, by: Union[str, Tuple[str, ...]] = "nominal_code", stagger=1):
+        """
+        Initialize the aggregator
+
+        :param by: key or tuple of keys to group by, from GROUPS
+        :param stagger: VAT stagger used for vat_quarter, see vat_quarter
+        """
+        self.by = (by,) if isinstance(by, str) else tuple(by)
+        for name in self.by:
+            if name not in GROUPS:
+                raise ValueError(f"cannot group by {name!r}, use one of {GROUPS}")
+        if stagger not in (1, 2, 3):
+            raise ValueError("stagger must be 1, 2 or 3")
+        self.stagger = stagger
+        self._groups = {}  # key: [count, total, minimum, maximum] in pennies
+
+    def _key(self, get, dated_on: str):
+        """
+        :param get: function returning a field of the row
+        :param dated_on: YYYY-MM-DD date of the row
+
+        :return: group key, a single value or a tuple for several keys
+        """
+        parts = []
+        for name in self.by:
+            if name == "day":
+                parts.append(dated_on[:10])
+            elif name == "month":
+                parts.append(dated_on[:7])
+            elif name == "year":
+                parts.append(dated_on[:4])
+            elif name == "vat_quarter":
+                parts.append(vat_quarter(dated_on, self.stagger))
+            else:
+                parts.append(get(name))
+        return parts[0] if len(parts) == 1 else tuple(parts)
+
+    def add(self, row: Any):
+        """
+        Add one transaction
+
+        :param row: Transaction, LazyTransaction or raw transaction dict
+        """
+        if isinstance(row, Transaction):
+            pennies = to_pennies(row.debit_value)
+            dated_on = row.dated_on.isoformat()
+            get = row.__getattribute__
+        else:
+            raw = row if isinstance(row, dict) else row.raw  # LazyTransaction
+            pennies = to_pennies(raw["debit_value"])
+            dated_on = raw["dated_on"]
+            get = raw.get
+
+        key = self._key(get, dated_on)
+        group = self._groups.get(key)
+        if group is None:
+            self._groups[key] = [1, pennies, pennies, pennies]
+            return
+        group[0] += 1
+        group[1] += pennies
+        if pennies < group[2]:
+            group[2] = pennies
+        elif pennies > group[3]:
+            group[3] = pennies
+
+    def update(self, rows: Iterable[Any]) -> "Aggregator":
+        """
+        Add every transaction from an iterable, one at a time
+
+        :param rows: iterable of Transaction, LazyTransaction or raw transaction dicts
+
+        :return: self, for chaining
+        """
+        add = self.add
+        for row in rows:
+            add(row)
+        return self
+
+    async def aupdate(self, rows: AsyncIterable[Any]) -> "Aggregator":
+        """
+        Add every transaction from an async iterable, such as the async
+        iter_transactions
+
+        :param rows: async iterable of transaction rows
+
+        :return: self, for chaining
+        """
+        async for row in rows:
+            self.add(row)
+        return self
+
+    def pennies(self) -> Dict[Any, Tuple[int, int, int, int]]:
+        """
+        Get the totals in pennies
+
+        :return: dict of group key to (count, total, minimum, maximum), by key
+        """
+        return {
+            key: tuple(self._groups[key]) for key in sorted(self._groups, key=_order)
+        }
+
+    def results(self) -> Dict[Any, Summary]:
+        """
+        Get the totals
+
+        :return: dict of group key to Summary, by key
+        """
+        return {
+            key: Summary(
+                count,
+                Decimal(total).scaleb(-2),
+                Decimal(minimum).scaleb(-2),
+                Decimal(maximum).scaleb(-2),
+            )
+            for key, (count, total, minimum, maximum) in self.pennies().items()
+        }
+
+
+def aggregate(
+    rows: Iterable[Any], by: Union[str, Tuple[str, ...]] = "nominal_code", stagger=1
+) -> Dict[Any, Summary]:
+    """
+    Total transactions by group in a single pass
+
+    :param rows: iterable of Transaction, LazyTransaction or raw transaction dicts,
+        usually the generator from TransactionAPI.iter_transactions
+    :param by: key or tuple of keys to group by, from GROUPS
+    :param stagger: VAT stagger used for vat_quarter, see vat_quarter
+
+    :return: dict of group key to Summary, by key
+    """
+    return Aggregator(by, stagger).update(rows).results()
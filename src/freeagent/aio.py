@@ -0,0 +1,802 @@
+"""
+Asyncio versions of the FreeAgent classes, so many companies and endpoints can
+be fetched concurrently from one event loop
+
+This module needs httpx, install it with ``pip install freeagent[async]``
+"""
+
+# pylint: disable=invalid-overridden-method
+import asyncio
+from typing import Any, AsyncIterator, Iterable, List, Sequence, Tuple
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+from .accounts import BankAccountIndex, get_account_id
+from .attachment import encode_json
+from .auth import (
+    TokenManager,
+    load_token,
+    refresh_request,
+    refreshed_token,
+)
+from .bank import EXPLANATION, EXPLANATIONS, SUBMIT_ERRORS, BankAPI
+from .base import FreeAgentBase, PER_PAGE
+from .cache import ResponseCache
+from .category import CategoryAPI
+from .metrics import Hook, RequestEvent
+from .payload import ExplanationPayload, ExplanationReport, ExplanationResult
+from .rules import Rule, RuleSet
+from .scheduler import RequestScheduler
+from .transaction import Row, TransactionAPI
+
+
+class AsyncFreeAgentBase(FreeAgentBase):
+    """
+    Common async functions, requests share one pool of keep-alive connections
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        api_base_url: str = "https://api.freeagent.com/v2/",
+        max_workers: int = 4,
+        max_connections: int = 20,
+        transport=None,
+        scheduler: RequestScheduler = None,
+        cache: ResponseCache = None,
+        hooks: Iterable[Hook] = None,
+    ):
+        """
+        Initialize the base class
+
+        :param api_base_url: the url to use for requests, defaults to normal but can be
+            changed to sandbox
+        :param max_workers: default number of pages get_api fetches at the same time
+        :param max_connections: size of the keep-alive connection pool
+        :param transport: optional httpx transport, used for testing
+        :param scheduler: RequestScheduler used to rate limit and retry requests,
+            defaults to one sized for the freeagent limits
+        :param cache: ResponseCache for get requests, for example an LRUCache or an
+            SQLiteCache to keep responses between runs, defaults to None for no
+            caching so iter_api holds one page at a time
+        :param hooks: instrumentation hooks called for every request, for example
+            a MetricsCollector, see freeagent.metrics
+        """
+        if httpx is None:
+            raise ImportError(
+                "AsyncFreeAgent needs httpx, install it with: pip install freeagent[async]"
+            )
+        super().__init__(api_base_url, max_workers, scheduler, cache, hooks)
+        self.max_connections = max_connections
+        self.transport = transport
+        self._ahead = None
+
+    def authenticate(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        oauth_ident: str,
+        oauth_secret: str,
+        save_token_cb,
+        token: dict = None,
+        token_store=None,
+    ):
+        """
+        Set up the async client with an existing oauth token
+
+        The interactive browser flow is only available from FreeAgent.authenticate,
+        use that once to get a token.
+
+        :param oauth_ident: oauth identifier from the freeagent dev dashboard
+        :param oauth_secret: oauth secret from the freeagent dev dashboard
+        :param save_token_cb: function to call when the token is refreshed to save it
+        :param token: token from a previous authentication
+        :param token_store: path of a json file holding the token, or a
+            FileTokenStore, shared with other processes using the token so
+            only one of them refreshes it
+
+        :raises ValueError: if there is no token
+        """
+        token, token_store = load_token(token, token_store)
+        if not token:
+            raise ValueError("Need oauth_token, use FreeAgent.authenticate to get one")
+
+        self._oauth = {"client_id": oauth_ident, "client_secret": oauth_secret}
+        self.tokens = TokenManager(
+            token, store=token_store, save_token_cb=save_token_cb
+        )
+        self.session = httpx.AsyncClient(
+            headers={
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+            },
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+            transport=self.transport,
+        )
+
+    @property
+    def token(self) -> dict:
+        """
+        the current oauth token, or None before authenticate
+        """
+        return None if self.tokens is None else self.tokens.token
+
+    async def aclose(self):
+        """
+        Close the connection pool
+        """
+        if self._ahead is not None:
+            await self._ahead  # let a background refresh save its token
+        if self.session is not None:
+            await self.session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _fetch_token(self, token: dict) -> dict:
+        """
+        Get a new access token from the token endpoint
+
+        :param token: the expiring token
+
+        :return: the new token
+        """
+        response = await self.session.post(
+            **refresh_request(self.api_base_url, token, self._oauth)
+        )
+        response.raise_for_status()
+        return refreshed_token(token, response.json())
+
+    async def _refresh_token(self, stale_token: str):
+        """
+        Refresh the access token through the TokenManager
+
+        The manager waits on thread and file locks, so it runs in a worker
+        thread and sends the refresh back to this loop.  Callers waiting for
+        the same refresh reuse the token it fetched.
+
+        :param stale_token: the access token the caller found to be expired
+        """
+        loop = asyncio.get_running_loop()
+
+        def fetch(token):
+            return asyncio.run_coroutine_threadsafe(
+                self._fetch_token(token), loop
+            ).result()
+
+        await asyncio.to_thread(self.tokens.refresh, stale_token, fetch)
+
+    async def _refresh_quietly(self, stale_token: str):
+        try:
+            await self._refresh_token(stale_token)
+        except Exception:  # pylint: disable=broad-exception-caught
+            pass  # the token still works, the refresh is tried again at expiry
+
+    def _body(self, document) -> dict:
+        """
+        Get the httpx request arguments to send document as JSON, streaming any
+        Base64File values with a Content-Length header
+
+        :param document: JSON compatible document
+
+        :return: dict of keyword arguments for the request
+        """
+        body = encode_json(document)
+        if isinstance(body, bytes):
+            return {"content": body}
+        return {"content": body, "headers": {"Content-Length": str(len(body))}}
+
+    @staticmethod
+    def _unsent(err: Exception) -> bool:
+        """
+        Check if a connection error happened before the request was sent
+
+        :param err: the httpx exception
+
+        :return: True if connecting failed, False if the request may have
+            reached freeagent
+        """
+        return isinstance(
+            err, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+        )
+
+    async def _request(
+        self, method: str, url: str, event: RequestEvent = None, **kwargs
+    ):
+        """
+        Send a request through the scheduler, the async version of
+        FreeAgentBase._request
+
+        :param method: HTTP method to use
+        :param url: complete url for the request
+        :param event: RequestEvent from _instrument to fill in, or None
+
+        :return: the httpx response
+        :raises APIError: if the connection keeps failing
+        """
+        for attempt in range(self.scheduler.max_retries + 1):
+            await asyncio.sleep(max(0.0, self.scheduler.reserve()))
+            try:
+                response = await self._send(method, url, **kwargs)
+            except httpx.TransportError as err:
+                await asyncio.sleep(self._retry_error(method, attempt, err, event))
+                continue
+            delay = self._retry_response(method, attempt, response)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        self._record(event, response, attempt, kwargs.get("content"))
+        return response
+
+    async def _attempt(self, request: tuple) -> tuple:
+        """
+        Send a request yielded by a flow, see FreeAgentBase._step
+
+        :param request: tuple of method, url, event and keyword arguments
+
+        :return: tuple of the response and None, or None and the exception
+        """
+        method, url, event, kwargs = request
+        try:
+            response = await self._request(method, url, event, **kwargs)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            return None, err  # thrown into the flow, which records and raises it
+        return response, None
+
+    async def _run(self, flow):
+        """
+        Drive a request flow to the end, see FreeAgentBase._step
+
+        :param flow: generator from one of the _flow methods
+
+        :return: the value the flow returned
+        """
+        done, value = self._step(flow)
+        while not done:
+            done, value = self._step(flow, *await self._attempt(value))
+        return value
+
+    async def _send(self, method: str, url: str, **kwargs):
+        """
+        Send a request with the oauth token, refreshing the token if needed
+
+        :param method: HTTP method to use
+        :param url: complete url for the request
+
+        :return: the httpx response
+        """
+        left = self.tokens.expires_in()
+        if left < self.tokens.expiry_margin:
+            await self._refresh_token(self.token.get("access_token"))
+        elif left < self.tokens.refresh_ahead and (
+            self._ahead is None or self._ahead.done()
+        ):
+            # refresh in the background, this request uses the current token
+            self._ahead = asyncio.ensure_future(
+                self._refresh_quietly(self.token.get("access_token"))
+            )
+
+        extra_headers = kwargs.pop("headers", None) or {}
+        for attempt in range(2):
+            access_token = self.token.get("access_token")
+            headers = {**extra_headers, "Authorization": f"Bearer {access_token}"}
+            response = await self.session.request(
+                method, url, headers=headers, **kwargs
+            )
+            if (
+                response.status_code != 401
+                or attempt
+                or "refresh_token" not in self.token
+            ):
+                return response
+            await self._refresh_token(access_token)
+        return response
+
+    async def _get_page(self, endpoint: str, params: dict, page: int):
+        """
+        Fetch a single page of a paginated endpoint
+
+        :param endpoint: end part of the endpoint URL
+        :param params: dict of "Name": Value entries for request to process into URL
+        :param page: number of the page to fetch, starting at 1
+
+        :return: tuple of the response and its decoded json
+        """
+        return await self._run(self._page_flow(endpoint, params, page))
+
+    async def _get_pages(self, endpoint: str, params: dict, pages: list, workers: int):
+        """
+        Fetch pages concurrently
+
+        :param endpoint: end part of the endpoint URL
+        :param params: dict of "Name": Value entries for request to process into URL
+        :param pages: list of page numbers
+        :param workers: number of pages to fetch at the same time
+
+        :return: list of the decoded json of each page, in the order of pages
+        """
+        semaphore = asyncio.Semaphore(max(1, workers))
+
+        async def fetch(page):
+            async with semaphore:
+                _response, json_data = await self._get_page(endpoint, params, page)
+            return json_data
+
+        return await asyncio.gather(*(fetch(page) for page in pages))
+
+    async def get_api(
+        self, endpoint: str, params: dict = None, max_workers: int = None
+    ) -> dict[str, Any]:
+        """
+        Perform an API get request, handling pagination.
+
+        :param endpoint: end part of the endpoint URL
+        :param params: dict of "Name": Value entries for request to process into URL
+        :param max_workers: number of pages to fetch at the same time, defaults to
+            the max_workers the class was created with
+
+        :return: response as a dict
+        """
+        params = {**(params or {}), "per_page": PER_PAGE}
+        first = await self._get_page(endpoint, params, 1)
+        flow = self._collect_pages(endpoint, *first)
+        done, value = self._step(flow)
+        while not done:
+            pages = await self._get_pages(
+                endpoint, params, value, max_workers or self.max_workers
+            )
+            done, value = self._step(flow, pages)
+        return value
+
+    async def iter_api(self, endpoint: str, params: dict = None) -> AsyncIterator:
+        """
+        Perform an API get request, yielding the items one page at a time.
+
+        The next page is requested while the caller works through the current one.
+
+        :param endpoint: end part of the endpoint URL
+        :param params: dict of "Name": Value entries for request to process into URL
+
+        :return: async generator of the items from every page
+        """
+        params = {**(params or {}), "per_page": PER_PAGE}
+        walk = self._walk_pages(endpoint, *await self._get_page(endpoint, params, 1))
+        items, page = walk.send(None)
+        while True:
+            task = None
+            if page is not None:
+                task = asyncio.ensure_future(self._get_page(endpoint, params, page))
+            try:
+                for item in items:
+                    yield item
+            except GeneratorExit:
+                if task is not None:
+                    task.cancel()
+                raise
+            if task is None:
+                break
+            _response, json_data = await task
+            items, page = walk.send(json_data)
+
+    async def put_api(self, url: str, root: str, updates: str):
+        """
+        Perform an API put request
+
+        :param url: complete url for put request
+        :param root: first part of payload
+        :param updates: second part of payload
+
+        :raises APIError: if put request fails
+        """
+        await self._run(self._put_flow(url, root, updates))
+
+    async def post_api(self, endpoint: str, root: str, payload: str):
+        """
+        Perform an API post request
+
+        :param endpoint: end part of url endpoint
+        :param root: first part of payload
+        :param payload: second part of payload
+
+        :return: the decoded response
+        :raises APIError: if post request fails
+        """
+        return await self._run(self._post_flow(endpoint, root, payload))
+
+
+class AsyncBankAPI(BankAPI):
+    """
+    Async version of BankAPI, file helpers are shared with BankAPI
+    """
+
+    async def explain_transaction(
+        self, tx_obj: ExplanationPayload, dryrun: bool = False
+    ):
+        """
+        Post the explanation to freeagent in the passed ExplanationPayload tx_obj
+
+        :param tx_obj: ExplanationPayload to use
+        :param dry_run: if True then do not post to freeagent, only print details
+        """
+        json_data = self._explanation_data(tx_obj, dryrun)
+        if not dryrun:
+            await self.parent.post_api(EXPLANATIONS, EXPLANATION, json_data)
+
+    async def explain_update(
+        self, url: str, tx_obj: ExplanationPayload, dryrun: bool = False
+    ):
+        """
+        Update an existing explanation on freeagent with the passed url
+
+        :param url: url attribute of the bank transaction explanation to change
+        :param tx_obj: ExplanationPayload to use for updating the explanation
+        :param dry_run: if True then do not post to freeagent, only print details
+        """
+        json_data = self._explanation_data(tx_obj, dryrun)
+        if not dryrun:
+            await self.parent.put_api(url, EXPLANATION, json_data)
+
+    async def _submit_explanation(self, result: ExplanationResult) -> ExplanationResult:
+        """
+        Post or put one serialized explanation and record the outcome in result
+
+        :param result: ExplanationResult holding the serialized payload, and the url
+            for updates
+
+        :return: the updated result
+        """
+        try:
+            response = await self._explanation_call(result)
+        except (*SUBMIT_ERRORS, httpx.HTTPError) as err:
+            return self._explanation_failed(result, err)
+        return self._explanation_done(result, response)
+
+    async def _submit_explanations(
+        self, jobs: Iterable[Tuple[str, ExplanationPayload]], dryrun, max_workers
+    ) -> ExplanationReport:
+        """
+        Serialize every payload, then submit them with bounded concurrency
+
+        :param jobs: iterable of (url, payload), url is None for new explanations
+        :param dryrun: if True then serialize only
+        :param max_workers: number of requests to send at the same time
+
+        :return: ExplanationReport in the same order as jobs
+        """
+        report, pending = self._prepare_explanations(jobs, dryrun)
+        semaphore = asyncio.Semaphore(max(1, max_workers or self.parent.max_workers))
+
+        async def submit(result):
+            async with semaphore:
+                await self._submit_explanation(result)
+
+        await asyncio.gather(*(submit(result) for result in pending))
+        return report
+
+    async def explain_transactions(
+        self,
+        tx_objs: Iterable[ExplanationPayload],
+        dryrun: bool = False,
+        max_workers: int = None,
+    ) -> ExplanationReport:
+        """
+        Post many explanations to freeagent at once
+
+        :param tx_objs: iterable of ExplanationPayload to post
+        :param dryrun: if True then do not post to freeagent, only serialize
+        :param max_workers: number of requests to send at the same time
+
+        :return: ExplanationReport with a result for each payload, in order
+        """
+        jobs = ((None, tx_obj) for tx_obj in tx_objs)
+        return await self._submit_explanations(jobs, dryrun, max_workers)
+
+    async def explain_updates(
+        self,
+        updates: Iterable[Tuple[str, ExplanationPayload]],
+        dryrun: bool = False,
+        max_workers: int = None,
+    ) -> ExplanationReport:
+        """
+        Update many existing explanations on freeagent at once
+
+        :param updates: iterable of (url, ExplanationPayload) pairs
+        :param dryrun: if True then do not put to freeagent, only serialize
+        :param max_workers: number of requests to send at the same time
+
+        :return: ExplanationReport with a result for each update, in order
+        """
+        return await self._submit_explanations(updates, dryrun, max_workers)
+
+    async def get_unexplained_transactions(
+        self, account_id: str
+    ) -> dict[str, list[dict[str, Any]]]:
+        """
+        Return a dict of unexplained transactions for the bank account with id of account_id
+
+        :param account_id: account id to use, not the whole url
+
+        :return: dict of the unexplained transactions
+        """
+        params = {"bank_account": account_id, "view": "unexplained"}
+        return await self.parent.get_api("bank_transactions", params)
+
+    def iter_unexplained_transactions(
+        self, account_id: str
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Yield the unexplained transactions for the bank account with id of account_id
+        a page at a time
+
+        :param account_id: account id to use, not the whole url
+
+        :return: async generator of the unexplained transactions
+        """
+        params = {"bank_account": account_id, "view": "unexplained"}
+        return self.parent.iter_api("bank_transactions", params)
+
+    async def _index(self, view: str) -> BankAccountIndex:
+        """
+        Get the index for a bank account view, fetching the accounts the first time
+
+        :param view: freeagent bank account view
+
+        :return: BankAccountIndex for the view
+        """
+        index = self.accounts.cached(view)
+        if index is None:
+            response = await self.parent.get_api("bank_accounts", {"view": view})
+            index = self.accounts.load(view, response.get("bank_accounts", []))
+        return index
+
+    async def get_paypal_id(self, account_name: str) -> str:
+        """
+        Get the ID of PayPal account on freeagent
+
+        :param account_name: name of the account to find
+
+        :return: ID of the named PayPal account or None
+        """
+        return self._named_id(await self._index("paypal_accounts"), account_name)
+
+    async def get_first_paypal_id(self) -> str:
+        """
+        Get the ID of the first PayPal account on freeagent
+
+        :return: ID of the first PayPal account or None if there is no PayPal account
+        """
+        return self._first_id(await self._index("paypal_accounts"))
+
+    async def get_id(self, account_name: str) -> str:
+        """
+        Get the ID of account_name searching standard bank accounts
+
+        :param account_name: name of the account to find
+
+        :return: ID of the account or None if not found
+        """
+        return self._named_id(await self._index("standard_bank_accounts"), account_name)
+
+    async def get_primary(self):
+        """
+        Get the ID of the primary bank account on freeagent (current account)
+
+        :return: ID of the account or None if not found
+        """
+        return get_account_id((await self._index("standard_bank_accounts")).primary)
+
+    async def get_primary_uri(self):
+        """
+        Get the uri for the primary bank account on freeagent (current account)
+
+        :return: uri of the account or None if not found
+        """
+        return self._primary_uri(await self._index("standard_bank_accounts"))
+
+
+class AsyncCategoryAPI(CategoryAPI):
+    """
+    Async version of CategoryAPI, categories are cached after first run
+    """
+
+    async def _prep_categories(self):
+        """
+        get the categories if not already done
+        """
+        if not self.categories:
+            self.categories = await self.parent.get_api("categories")
+
+    async def get_desc_id(self, description: str) -> str:
+        """
+        Return the description id for passed category name
+
+        :param description: name of category to find
+
+        :return: id url of the category or None if not found
+        """
+        await self._prep_categories()
+        cat = self._find_desc(description)
+        return cat["url"] if cat else None
+
+    async def refresh(self):
+        """
+        Fetch the categories again, for when they have been changed on freeagent
+        """
+        self.categories = await self.parent.get_api("categories")
+
+    async def get_desc_ids(self, descriptions: Iterable[str]) -> List[str]:
+        """
+        Return the description ids for many category names in one call
+
+        :param descriptions: iterable of category names to find
+
+        :return: list of id urls, None for names not found
+        """
+        await self._prep_categories()
+        return [
+            cat["url"] if cat else None for cat in self.index.find_many(descriptions)
+        ]
+
+    async def compile_rules(self, rules: Sequence[Rule]) -> RuleSet:
+        """
+        Compile rules for explaining bank transactions, resolving their
+        categories from the loaded categories
+
+        :param rules: list of Rule, earlier rules win
+
+        :return: RuleSet
+        :raises ValueError: if a rule category cannot be found
+        """
+        await self._prep_categories()
+        return RuleSet(rules, self.index)
+
+    async def get_category(self, url: str) -> dict:
+        """
+        Get a category from its url
+
+        :param url: id url of the category
+
+        :return: the category dict or None if not found
+        """
+        await self._prep_categories()
+        return self.index.by_url.get(url)
+
+    async def get_desc_nominal_code(self, description: str) -> int:
+        """
+        Return the nominal code for a given category description.
+
+        :param description: The description of the category.
+        :return: The nominal code of the category, or None if not found.
+        """
+        await self._prep_categories()
+        cat = self._find_desc(description)
+        return cat["nominal_code"] if cat else None
+
+    async def get_nominal_code_id(self, nominal_code: int) -> str:
+        """
+        Get category id from nominal code
+
+        :param nominal_code: nominal code of category to find
+
+        :return: id url of the category or None if not found
+        """
+        await self._prep_categories()
+        cat = self._find_nominal_code(nominal_code)
+        return cat["url"] if cat else None
+
+
+class AsyncTransactionAPI(TransactionAPI):
+    """
+    Async version of TransactionAPI
+    """
+
+    async def get_transactions(
+        self, nominal_code: str, start_date: str, end_date: str, lazy: bool = False
+    ) -> List[Row]:
+        """
+        Get transactions for a given category nominal code and date range.
+
+        :param nominal_code: The nominal code of the category.
+        :param start_date: Start date of the date range (YYYY-MM-DD).
+        :param end_date: End date of the date range (YYYY-MM-DD).
+        :param lazy: True for LazyTransaction rows parsed as fields are read,
+            False (the default) for fully parsed Transaction objects.
+        :return: A list of Transaction or LazyTransaction objects.
+        """
+        params = self._params(nominal_code, start_date, end_date)
+        response = await self.parent.get_api("accounting/transactions", params)
+        return [self._row(t, lazy) for t in response.get("transactions", [])]
+
+    async def iter_transactions(
+        self, nominal_code: str, start_date: str, end_date: str, lazy: bool = False
+    ) -> AsyncIterator[Row]:
+        """
+        Yield transactions for a given category nominal code and date range a page
+        at a time.
+
+        :param nominal_code: The nominal code of the category.
+        :param start_date: Start date of the date range (YYYY-MM-DD).
+        :param end_date: End date of the date range (YYYY-MM-DD).
+        :param lazy: True for LazyTransaction rows parsed as fields are read,
+            False (the default) for fully parsed Transaction objects.
+        :return: An async generator of Transaction or LazyTransaction objects.
+        """
+        params = self._params(nominal_code, start_date, end_date)
+        async for transaction_data in self.parent.iter_api(
+            "accounting/transactions", params
+        ):
+            yield self._row(transaction_data, lazy)
+
+    async def get_transaction_table(
+        self,
+        nominal_code: str,
+        start_date: str,
+        end_date: str,
+        use_numpy: bool = None,
+    ) -> "TransactionTable":
+        """
+        Get transactions for a given category nominal code and date range as a
+        columnar table.
+
+        :param nominal_code: The nominal code of the category.
+        :param start_date: Start date of the date range (YYYY-MM-DD).
+        :param end_date: End date of the date range (YYYY-MM-DD).
+        :param use_numpy: True or False to choose the backend, None to use NumPy
+            if it is installed.
+        :return: A TransactionTable.
+        """
+        params = self._params(nominal_code, start_date, end_date)
+        response = await self.parent.get_api("accounting/transactions", params)
+        return self._table(response.get("transactions", []), use_numpy)
+
+    async def get_transactions_batch(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        nominal_codes: Iterable[str],
+        start_date: str,
+        end_date: str,
+        shard: str = "month",
+        max_workers: int = None,
+        lazy: bool = False,
+    ) -> List[Row]:
+        """
+        Get transactions for many nominal codes over a long date range, split
+        into a request per code and month (or year) fetched at the same time.
+
+        :param nominal_codes: Iterable of category nominal codes.
+        :param start_date: Start date of the date range (YYYY-MM-DD).
+        :param end_date: End date of the date range (YYYY-MM-DD).
+        :param shard: "month", "year" or None to only split by code.
+        :param max_workers: Number of shards to fetch at the same time, defaults
+            to the max_workers of the FreeAgent instance.
+        :param lazy: True for LazyTransaction rows parsed as fields are read,
+            False (the default) for fully parsed Transaction objects.
+        :return: A list of Transaction or LazyTransaction objects, ordered by
+            code then date shard, each transaction once.
+        """
+        shards = self._shard_params(nominal_codes, start_date, end_date, shard)
+        semaphore = asyncio.Semaphore(max(1, max_workers or self.parent.max_workers))
+
+        async def fetch(params):
+            async with semaphore:
+                return await self.parent.get_api("accounting/transactions", params, 1)
+
+        responses = await asyncio.gather(*(fetch(params) for params in shards))
+        return self._merge(responses, lazy)
+
+
+class AsyncFreeAgent(AsyncFreeAgentBase):
+    """
+    The main public async class
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)  # initialse base class
+        self.bank = AsyncBankAPI(self)
+        self.category = AsyncCategoryAPI(self)
+        self.transaction = AsyncTransactionAPI(self)
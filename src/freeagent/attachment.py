@@ -0,0 +1,271 @@
+"""
+Streaming attachments, so files are base64 encoded a chunk at a time while the
+request is sent instead of being held in memory
+"""
+
+from base64 import b64encode
+from collections import OrderedDict
+from dataclasses import dataclass
+from hashlib import sha256
+from json import dumps
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Iterator, List, Union
+from uuid import uuid4
+
+
+class Base64File:
+    """
+    Attachment data read from a file and base64 encoded as it is sent
+
+    Use in place of the encoded string in an attachment dict.  Every iteration
+    opens the file again, so a request can be retried.
+    """
+
+    chunk_size = 3 * 64 * 1024  # a multiple of 3 so chunks encode without padding
+
+    def __init__(self, path: Path):
+        """
+        Initialize with the file to send
+
+        :param path: pathlike Path of the file
+        """
+        self.path = Path(path)
+        self.size = self.path.stat().st_size
+
+    def __len__(self) -> int:
+        """
+        Length of the encoded data in bytes
+        """
+        return 4 * ((self.size + 2) // 3)
+
+    def __iter__(self) -> Iterator[bytes]:
+        with self.path.open("rb") as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield b64encode(chunk)
+
+    async def __aiter__(self):
+        # only reached from a running loop, so asyncio is already loaded
+        from asyncio import get_running_loop  # pylint: disable=import-outside-toplevel
+
+        loop = get_running_loop()
+        with self.path.open("rb") as f:
+            while True:
+                chunk = await loop.run_in_executor(None, f.read, self.chunk_size)
+                if not chunk:
+                    break
+                yield b64encode(chunk)
+
+    def __deepcopy__(self, memo):
+        # dataclasses.asdict deep copies fields, the file does not need copying
+        return self
+
+    def __repr__(self) -> str:
+        return f"Base64File({str(self.path)!r})"
+
+
+class JSONStreamBody:
+    """
+    JSON request body with Base64File values streamed in place
+
+    The rest of the document is encoded once up front, each file is read in
+    chunks while the body is sent.  The length is known in advance so the
+    request still has a Content-Length header.
+    """
+
+    def __init__(self, parts: List[Union[bytes, Base64File]]):
+        """
+        Initialize with the encoded parts
+
+        :param parts: list of encoded JSON bytes and the Base64File values between them
+        """
+        self.parts = parts
+
+    def __len__(self) -> int:
+        return sum(len(part) for part in self.parts)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for part in self.parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                yield from part
+
+    async def __aiter__(self):
+        for part in self.parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                async for chunk in part:
+                    yield chunk
+
+
+def encode_json(document: Any) -> Union[bytes, JSONStreamBody]:
+    """
+    Encode a request body as JSON, streaming any Base64File values
+
+    :param document: JSON compatible document
+
+    :return: the encoded bytes, or a JSONStreamBody if there are files to stream
+    """
+    files = {}
+
+    def placeholder(value):
+        if isinstance(value, Base64File):
+            token = f"freeagent-stream-{uuid4().hex}"
+            files[token] = value
+            return token
+        raise TypeError(
+            f"Object of type {type(value).__name__} is not JSON serializable"
+        )
+
+    text = dumps(document, default=placeholder)
+    if not files:
+        return text.encode()
+
+    parts = []
+    for token, value in files.items():  # in the order they appear in text
+        before, text = text.split(f'"{token}"', 1)
+        parts.extend((f'{before}"'.encode(), value, b'"'))
+    parts.append(text.encode())
+    return JSONStreamBody(parts)
+
+
+@dataclass
+class PreparedAttachment:
+    """
+    dataclass for an attachment that has been checked, typed and encoded
+    """
+
+    file_name: str
+    content_type: str
+    size: int  # size of the file in bytes
+    data: Union[str, Base64File]  # encoded data, or the file to stream
+    digest: str = None  # sha256 of the encoded data, None when streamed
+
+    def as_dict(self, description: str = None) -> dict:
+        """
+        Build the attachment dict for an ExplanationPayload
+
+        :param description: optional description to use for the file on freeagent
+
+        :return: attachment dict
+        """
+        return {
+            "file_name": self.file_name,
+            "description": description or "Attachment",
+            "content_type": self.content_type,
+            "data": self.data,
+        }
+
+
+class AttachmentCache:  # pylint: disable=too-many-instance-attributes
+    """
+    Bounded cache of prepared attachments, so a receipt attached to many
+    explanations is only checked, read and encoded once
+
+    Entries are found by path, modification time and size, a changed file is
+    prepared again.  Files with the same content at different paths share one
+    encoded string.  hits and misses count lookups by path.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 1024):
+        """
+        Initialize the cache
+
+        :param max_bytes: most encoded bytes to keep
+        :param max_entries: most files to remember
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._by_key = OrderedDict()
+        self._by_digest = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def get(
+        self,
+        path: Path,
+        stream: bool,
+        prepare: Callable[[Path, bool], PreparedAttachment],
+    ) -> PreparedAttachment:
+        """
+        Get the prepared attachment for a file, preparing it on a miss
+
+        :param path: pathlike Path of the file
+        :param stream: True to stream the file instead of encoding it now
+        :param prepare: function to prepare the attachment, called as
+            prepare(path, stream) on a miss
+
+        :return: PreparedAttachment for the file
+        """
+        stat = path.stat()
+        key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size, stream)
+        with self._lock:
+            prepared = self._by_key.get(key)
+            if prepared is not None:
+                self._by_key.move_to_end(key)
+                self.hits += 1
+                return prepared
+            self.misses += 1
+
+        prepared = prepare(path, stream)
+        with self._lock:
+            if prepared.digest is not None:
+                # same content elsewhere, share the encoded string
+                prepared.data = self._by_digest.setdefault(
+                    prepared.digest, prepared.data
+                )
+            self._store(key, prepared)
+        return prepared
+
+    def _store(self, key: tuple, prepared: PreparedAttachment):
+        """
+        Add an entry, dropping the least recently used ones if the cache is full
+
+        :param key: path, mtime, size and stream flag of the file
+        :param prepared: PreparedAttachment to store
+        """
+        cost = len(prepared.data) if isinstance(prepared.data, str) else 0
+        if cost > self.max_bytes:
+            return
+        self._by_key[key] = prepared
+        self.size += cost
+        dropped_any = False
+        while len(self._by_key) > self.max_entries or self.size > self.max_bytes:
+            _key, dropped = self._by_key.popitem(last=False)
+            if isinstance(dropped.data, str):
+                self.size -= len(dropped.data)
+            dropped_any = True
+        if dropped_any:
+            live = {p.digest for p in self._by_key.values()}
+            for digest in [d for d in self._by_digest if d not in live]:
+                del self._by_digest[digest]
+
+    def clear(self):
+        """
+        Forget every prepared attachment and reset the counters
+        """
+        with self._lock:
+            self._by_key.clear()
+            self._by_digest.clear()
+            self.size = self.hits = self.misses = 0
+
+
+def data_digest(data: str) -> str:
+    """
+    Get the content hash used to spot duplicate files
+
+    :param data: base64 encoded file
+
+    :return: hex sha256 digest
+    """
+    return sha256(data.encode("ascii")).hexdigest()
@@ -0,0 +1,348 @@
+"""
+OAuth token refresh shared by every thread and process using one token
+
+freeagent access tokens last an hour.  When many threads, or many worker
+processes, share a token they all see it expire together, and each sending its
+own refresh to the token endpoint makes some of them fail with an invalid
+refresh token.  A TokenManager refreshes once and hands the new token to the
+callers that were waiting.  Given a FileTokenStore it also takes a lock on the
+token file, so a process that finds the token already refreshed by another
+process reads it instead of refreshing again.  Tokens are refreshed in the
+background a few minutes before they expire, so requests do not wait for it.
+"""
+
+from contextlib import contextmanager
+import json
+import os
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from threading import Lock, Thread
+from time import time
+from typing import Callable
+
+try:
+    import fcntl
+
+    msvcrt = None  # pylint: disable=invalid-name
+except ImportError:  # pragma: no cover
+    fcntl = None
+    import msvcrt
+
+FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+def refresh_request(api_base_url: str, token: dict, oauth: dict) -> dict:
+    """
+    Build the post to the token endpoint refreshing a token
+
+    :param api_base_url: base url of the freeagent API
+    :param token: the token to refresh
+    :param oauth: dict of client_id and client_secret
+
+    :return: dict of keyword arguments for the session's post
+    """
+    return {
+        "url": api_base_url + "token_endpoint",
+        "data": {
+            "grant_type": "refresh_token",
+            "refresh_token": token["refresh_token"],
+            **oauth,
+        },
+        "headers": FORM_HEADERS,
+    }
+
+
+def refreshed_token(token: dict, new: dict) -> dict:
+    """
+    Complete the token returned by the token endpoint
+
+    :param token: the token that was refreshed
+    :param new: decoded json response of the token endpoint
+
+    :return: the new token, keeping the refresh token if no new one was sent and
+        with expires_at set
+    """
+    new = dict(new)
+    new.setdefault("refresh_token", token["refresh_token"])
+    if "expires_in" in new:
+        new["expires_at"] = time() + float(new["expires_in"])
+    return new
+
+
+def load_token(token: dict, token_store) -> tuple:
+    """
+    Get the token to start with, from token_store if none is given
+
+    :param token: the token passed in, or None
+    :param token_store: path of a json file holding the token, a
+        FileTokenStore, or None
+
+    :return: tuple of the token, None if there is none, and the FileTokenStore
+        or None
+    """
+    if token_store is not None and not isinstance(token_store, FileTokenStore):
+        token_store = FileTokenStore(token_store)
+    if not token and token_store is not None:
+        token = token_store.load()
+    return token or None, token_store
+
+
+class FileTokenStore:
+    """
+    Token saved as json in a file, with a lock file so processes sharing it
+    refresh one at a time
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the store
+
+        :param path: path of the json file, the lock is path with .lock added
+        """
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+
+    def load(self) -> dict:
+        """
+        Read the token
+
+        :return: the token, or None if the file is missing or unreadable
+        """
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, token: dict):
+        """
+        Write the token, replacing the file in one step so readers never see a
+        partly written token
+
+        :param token: the token to save
+        """
+        with NamedTemporaryFile(
+            "w", dir=self.path.parent, prefix=self.path.name, delete=False
+        ) as f:
+            json.dump(token, f)
+        os.replace(f.name, self.path)
+
+    @contextmanager
+    def lock(self):
+        """
+        Hold the lock file, waiting for other processes to let it go
+        """
+        with self.lock_path.open("a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:  # pragma: no cover
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:  # pragma: no cover
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class TokenManager:  # pylint: disable=too-many-instance-attributes
+    """
+    Keep an oauth token fresh for every thread using it
+
+    Only one refresh runs at a time, threads that found the same token expired
+    wait for it and use the token it fetched.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        token: dict = None,
+        refresh: Callable[[dict], dict] = None,
+        *,
+        store: FileTokenStore = None,
+        save_token_cb=None,
+        expiry_margin: float = 30,
+        refresh_ahead: float = 300,
+        clock=time,
+    ):
+        """
+        Initialize the manager
+
+        :param token: the oauth token, defaults to the one in store
+        :param refresh: function getting a new token from the token endpoint,
+            called with the current token
+        :param store: FileTokenStore shared with other processes, or None
+        :param save_token_cb: function to call with the new token when it is
+            refreshed, or None
+        :param expiry_margin: seconds before expiry a token is treated as
+            expired, and refreshed before the request is sent
+        :param refresh_ahead: seconds before expiry a token is refreshed in the
+            background, 0 turns this off
+        :param clock: function returning the time in seconds
+
+        :raises ValueError: if there is no token
+        """
+        if not token and store is not None:
+            token = store.load()
+        if not token:
+            raise ValueError("Need oauth_token, or a token_store holding one")
+        self.token = dict(token)
+        self.refresh_fn = refresh
+        self.store = store
+        self.save_token_cb = save_token_cb
+        self.expiry_margin = expiry_margin
+        self.refresh_ahead = refresh_ahead
+        self.clock = clock
+        self._lock = Lock()
+        self._background_lock = Lock()
+        self._background = None
+
+    def expires_in(self, token: dict = None) -> float:
+        """
+        :param token: token to check, defaults to the current one
+
+        :return: seconds until the token expires, inf if it has no expiry
+        """
+        expires_at = (token or self.token).get("expires_at")
+        if expires_at is None:
+            return float("inf")
+        return float(expires_at) - self.clock()
+
+    def access_token(self) -> str:
+        """
+        Get the access token to send, refreshing it first if it has expired and
+        in the background if it will soon
+
+        :return: the access token
+        """
+        left = self.expires_in()
+        if left < self.expiry_margin:
+            self.refresh(self.token.get("access_token"))
+        elif left < self.refresh_ahead:
+            self.refresh_soon()
+        return self.token.get("access_token")
+
+    def refresh_soon(self):
+        """
+        Refresh the token in a background thread, unless one is running
+        """
+        with self._background_lock:  # not _lock, a refresh may be holding it
+            if self._background is not None and self._background.is_alive():
+                return
+            self._background = Thread(
+                target=self._refresh_quietly,
+                args=(self.token.get("access_token"),),
+                daemon=True,
+            )
+            self._background.start()
+
+    def _refresh_quietly(self, stale_token: str):
+        try:
+            self.refresh(stale_token)
+        except Exception:  # pylint: disable=broad-exception-caught
+            pass  # the token still works, the refresh is tried again at expiry
+
+    def refresh(self, stale_token: str = None, refresh=None) -> dict:
+        """
+        Refresh the token, unless it changed since the caller read it
+
+        With a store the token file is locked while refreshing, and a newer
+        token saved by another process is used instead of fetching one.
+
+        :param stale_token: the access token the caller found to be expired,
+            None always refreshes
+        :param refresh: function getting a new token, defaults to the one the
+            manager was built with
+
+        :return: the current token
+        """
+        with self._lock:
+            if (
+                stale_token is not None
+                and self.token.get("access_token") != stale_token
+            ):
+                return self.token  # refreshed while waiting for the lock
+            if self.store is None:
+                self._fetch(refresh)
+                return self.token
+            with self.store.lock():
+                stored = self.store.load()
+                if stored and stored.get("access_token") != self.token.get(
+                    "access_token"
+                ):
+                    # another process got here first, its refresh token is the
+                    # one that still works
+                    self.token = stored
+                    if self.expires_in() >= self.expiry_margin:
+                        return self.token
+                self._fetch(refresh)
+                self.store.save(self.token)
+            return self.token
+
+    def _fetch(self, refresh=None):
+        refresh = refresh or self.refresh_fn
+        if refresh is None or "refresh_token" not in self.token:
+            raise ValueError("Token has expired and cannot be refreshed")
+        self.token = refresh(self.token)
+        if self.save_token_cb:
+            self.save_token_cb(self.token)
+
+    def set_token(self, token: dict):
+        """
+        Replace the token, for example after authorising again
+
+        :param token: the new token
+        """
+        with self._lock:
+            self.token = dict(token)
+            if self.store is not None:
+                with self.store.lock():
+                    self.store.save(self.token)
+
+
+class TokenAuth:  # pylint: disable=too-few-public-methods
+    """
+    requests auth sending the access token from a TokenManager, a 401 response
+    refreshes the token and sends the request once more
+    """
+
+    def __init__(self, tokens: TokenManager):
+        """
+        :param tokens: TokenManager holding the token
+        """
+        self.tokens = tokens
+
+    def __call__(self, request):
+        request.headers["Authorization"] = f"Bearer {self.tokens.access_token()}"
+        request.register_hook("response", self.handle_401)
+        return request
+
+    def handle_401(self, response, **kwargs):
+        """
+        Refresh the token and send the request again if it was rejected
+        """
+        if response.status_code != 401 or "refresh_token" not in self.tokens.token:
+            return response
+        retry = response.request.copy()
+        if not isinstance(retry.body, (bytes, str, type(None))):
+            return response  # a streamed body cannot be sent twice
+        stale = retry.headers["Authorization"].split(" ", 1)[-1]
+        self.tokens.refresh(stale)
+        retry.headers["Authorization"] = f"Bearer {self.tokens.token['access_token']}"
+        retry.deregister_hook("response", self.handle_401)
+        response.content  # pylint: disable=pointless-statement
+        response.close()
+        new = response.connection.send(retry, **kwargs)
+        new.history.append(response)
+        new.request = retry
+        return new
+
+
+def no_auth(request):
+    """
+    requests auth sending no token, for posts to the token endpoint from a
+    session using TokenAuth
+    """
+    return request
@@ -4,11 +4,24 @@ about bank accounts on freeagent
 """
 
 from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+import logging
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Iterator, Tuple
 
-from .base import FreeAgentBase
-from .payload import ExplanationPayload
+from .accounts import BankAccountIndex, BankAccountRegistry, get_account_id
+from .attachment import AttachmentCache, Base64File, PreparedAttachment, data_digest
+from .base import APIError, FreeAgentBase
+from .payload import ExplanationPayload, ExplanationReport, ExplanationResult
+
+EXPLANATIONS = "bank_transaction_explanations"  # endpoint
+EXPLANATION = "bank_transaction_explanation"  # root of the payload
+# what one submission in a batch can raise without stopping the rest: APIError
+# is a RuntimeError, requests' RequestException an OSError and a body that is
+# not JSON a ValueError
+SUBMIT_ERRORS = (RuntimeError, ValueError, OSError)
+
+logger = logging.getLogger(__name__)
 
 
 class BankAPI(FreeAgentBase):
@@ -24,11 +37,20 @@ class BankAPI(FreeAgentBase):
     :param token_name: The name to use for the oauth token when storing in keyring
     """
 
-    def __init__(self, parent):  # pylint: disable=super-init-not-called
+    def __init__(  # pylint: disable=super-init-not-called
+        self, parent, attachment_cache: AttachmentCache = None
+    ):
         """
         Initialize the BankAPI class
+
+        :param parent: the main FreeAgent instance
+        :param attachment_cache: AttachmentCache so a file attached many times is
+            encoded once, defaults to None to encode it every time, it can also
+            be set later through the attachment_cache attribute
         """
         self.parent = parent  # the main FreeAgent instance
+        self.accounts = BankAccountRegistry(parent)  # bank accounts, fetched once
+        self.attachment_cache = attachment_cache  # files already encoded, or None
 
     def _check_file_size(self, path: Path) -> int:
         """
@@ -83,7 +105,11 @@ class BankAPI(FreeAgentBase):
         return content_type
 
     def attach_file_to_explanation(
-        self, payload: ExplanationPayload, path: Path, description: str = None
+        self,
+        payload: ExplanationPayload,
+        path: Path,
+        description: str = None,
+        stream: bool = False,
     ):
         """
         Attach a file to an existing ExplanationPayload
@@ -97,16 +123,53 @@ class BankAPI(FreeAgentBase):
 
         :param payload: ExplanationPayload to add the file to
         :param description: optional description to use for the file on freeagent
+        :param stream: if True the file is not read now, it is encoded a chunk at a
+            time while the explanation is sent, keeping memory use low
+        """
+        if self.attachment_cache is None:
+            prepared = self._prepare_attachment(path, stream)
+        else:
+            prepared = self.attachment_cache.get(path, stream, self._prepare_attachment)
+        payload.attachment = prepared.as_dict(description)
+
+    def _prepare_attachment(self, path: Path, stream: bool) -> PreparedAttachment:
+        """
+        Check, type and encode a file for attaching, called through the attachment
+        cache, if there is one, when the file has not been prepared before
+
+        :param path: pathlike Path of the file
+        :param stream: if True the file is streamed when sent instead of encoded now
+
+        :return: PreparedAttachment for the file
         """
-        file_data = self._encode_file_base64(path)
+        if stream:
+            size = self._check_file_size(path)
+            file_data = Base64File(path)
+            digest = None
+        else:
+            file_data = self._encode_file_base64(path)
+            size = len(file_data) * 3 // 4 - file_data[-2:].count("=")
+            digest = data_digest(file_data)
         file_type = self._get_filetype(path)
+        return PreparedAttachment(path.name, file_type, size, file_data, digest)
 
-        payload.attachment = {
-            "file_name": path.name,
-            "description": description or "Attachment",
-            "content_type": file_type,
-            "data": file_data,
-        }
+    def _explanation_data(self, tx_obj: ExplanationPayload, dryrun: bool) -> dict:
+        """
+        Serialize an explanation for explain_transaction or explain_update, a dry
+        run prints the details and a real one logs them at debug level
+
+        :param tx_obj: ExplanationPayload to use
+        :param dryrun: if the explanation is not going to be sent
+
+        :return: the serialized payload
+        """
+        json_data = self.serialize_for_api(tx_obj)
+        details = (json_data["description"], json_data.get("gross_value"))
+        if dryrun:
+            print(*details)
+        else:
+            logger.debug("Explaining %s %s", *details)
+        return json_data
 
     def explain_transaction(self, tx_obj: ExplanationPayload, dryrun: bool = False):
         """
@@ -115,14 +178,9 @@ class BankAPI(FreeAgentBase):
         :param tx_obj: ExplanationPayload to use
         :param dry_run: if True then do not post to freeagent, only print details
         """
-        json_data = self.serialize_for_api(tx_obj)
-        print(json_data["description"], json_data.get("gross_value"))
+        json_data = self._explanation_data(tx_obj, dryrun)
         if not dryrun:
-            self.parent.post_api(
-                "bank_transaction_explanations",
-                "bank_transaction_explanation",
-                json_data,
-            )
+            self.parent.post_api(EXPLANATIONS, EXPLANATION, json_data)
 
     def explain_update(
         self, url: str, tx_obj: ExplanationPayload, dryrun: bool = False
@@ -134,10 +192,162 @@ class BankAPI(FreeAgentBase):
         :param tx_obj: ExplanationPayload to use for updating the explanation
         :param dry_run: if True then do not post to freeagent, only print details
         """
-        json_data = self.serialize_for_api(tx_obj)
-        print(json_data["description"], json_data.get("gross_value"))
+        json_data = self._explanation_data(tx_obj, dryrun)
         if not dryrun:
-            self.parent.put_api(url, "bank_transaction_explanation", json_data)
+            self.parent.put_api(url, EXPLANATION, json_data)
+
+    def _explanation_call(self, result: ExplanationResult):
+        """
+        Post or put one serialized explanation
+
+        :param result: ExplanationResult holding the serialized payload, and the url
+            for updates
+
+        :return: what the parent's post_api or put_api returns, a coroutine for
+            the async client
+        """
+        if result.url is None:
+            return self.parent.post_api(EXPLANATIONS, EXPLANATION, result.data)
+        return self.parent.put_api(result.url, EXPLANATION, result.data)
+
+    @staticmethod
+    def _explanation_done(result: ExplanationResult, response) -> ExplanationResult:
+        """
+        Record a successful submission in result
+
+        :param result: the ExplanationResult
+        :param response: decoded response of a post, None for a put
+
+        :return: the updated result
+        """
+        result.status = "ok"
+        result.response = response
+        return result
+
+    @staticmethod
+    def _explanation_failed(
+        result: ExplanationResult, err: Exception
+    ) -> ExplanationResult:
+        """
+        Record a failed submission in result
+
+        :param result: the ExplanationResult
+        :param err: the APIError, or other exception in SUBMIT_ERRORS, raised
+
+        :return: the updated result
+        """
+        if isinstance(err, APIError):
+            result.status = "retryable" if err.retryable else "failed"
+            result.status_code = err.status_code
+            result.error = err.text if err.text is not None else str(err)
+        else:
+            result.status = "failed"
+            result.error = str(err)
+        return result
+
+    def _submit_explanation(self, result: ExplanationResult) -> ExplanationResult:
+        """
+        Post or put one serialized explanation and record the outcome in result
+
+        :param result: ExplanationResult holding the serialized payload, and the url
+            for updates
+
+        :return: the updated result
+        """
+        try:
+            response = self._explanation_call(result)
+        except SUBMIT_ERRORS as err:
+            return self._explanation_failed(result, err)
+        return self._explanation_done(result, response)
+
+    def _prepare_explanations(
+        self, jobs: Iterable[Tuple[str, ExplanationPayload]], dryrun: bool
+    ) -> Tuple[ExplanationReport, list]:
+        """
+        Serialize every payload up front, so bad payloads fail before anything is sent
+
+        :param jobs: iterable of (url, payload), url is None for new explanations
+        :param dryrun: if True then nothing will be sent
+
+        :return: tuple of the ExplanationReport and the results still to send
+        """
+        report = ExplanationReport()
+        pending = []
+        for index, (url, tx_obj) in enumerate(jobs):
+            result = ExplanationResult(
+                index, "dryrun" if dryrun else "pending", url=url
+            )
+            try:
+                result.data = self.serialize_for_api(tx_obj)
+            except (TypeError, ValueError, AttributeError) as err:
+                result.status = "failed"
+                result.error = f"could not serialize payload: {err}"
+            else:
+                if not dryrun:
+                    pending.append(result)
+            report.results.append(result)
+        return report, pending
+
+    def _submit_explanations(
+        self, jobs: Iterable[Tuple[str, ExplanationPayload]], dryrun, max_workers
+    ) -> ExplanationReport:
+        """
+        Serialize every payload, then submit them on a bounded pool of threads
+
+        :param jobs: iterable of (url, payload), url is None for new explanations
+        :param dryrun: if True then serialize only
+        :param max_workers: number of requests to send at the same time
+
+        :return: ExplanationReport in the same order as jobs
+        """
+        report, pending = self._prepare_explanations(jobs, dryrun)
+        if pending:
+            workers = max_workers or getattr(self.parent, "max_workers", 4)
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                list(pool.map(self._submit_explanation, pending))
+        return report
+
+    def explain_transactions(
+        self,
+        tx_objs: Iterable[ExplanationPayload],
+        dryrun: bool = False,
+        max_workers: int = None,
+    ) -> ExplanationReport:
+        """
+        Post many explanations to freeagent at once
+
+        A failure does not stop the others, check the returned report.
+
+        :param tx_objs: iterable of ExplanationPayload to post
+        :param dryrun: if True then do not post to freeagent, only serialize
+        :param max_workers: number of requests to send at the same time, defaults
+            to the max_workers of the FreeAgent instance
+
+        :return: ExplanationReport with a result for each payload, in order
+        """
+        jobs = ((None, tx_obj) for tx_obj in tx_objs)
+        return self._submit_explanations(jobs, dryrun, max_workers)
+
+    def explain_updates(
+        self,
+        updates: Iterable[Tuple[str, ExplanationPayload]],
+        dryrun: bool = False,
+        max_workers: int = None,
+    ) -> ExplanationReport:
+        """
+        Update many existing explanations on freeagent at once
+
+        A failure does not stop the others, check the returned report.
+
+        :param updates: iterable of (url, ExplanationPayload) pairs, url is the url
+            attribute of the bank transaction explanation to change
+        :param dryrun: if True then do not put to freeagent, only serialize
+        :param max_workers: number of requests to send at the same time, defaults
+            to the max_workers of the FreeAgent instance
+
+        :return: ExplanationReport with a result for each update, in order
+        """
+        return self._submit_explanations(updates, dryrun, max_workers)
 
     def get_unexplained_transactions(
         self, account_id: str
@@ -152,19 +362,40 @@ class BankAPI(FreeAgentBase):
         params = {"bank_account": account_id, "view": "unexplained"}
         return self.parent.get_api("bank_transactions", params)
 
-    def _find_bank_id(self, bank_accounts: dict[str, any], account_name: str) -> str:
+    def iter_unexplained_transactions(
+        self, account_id: str
+    ) -> Iterator[dict[str, Any]]:
         """
-        Get the freeagent bank account ID for account_name
+        Yield the unexplained transactions for the bank account with id of account_id
+        a page at a time, without holding them all in memory
 
-        :param bank_accounts: a dict of the bank accounts on freeagent
-        :param account_name: name of the account to find
+        :param account_id: account id to use, not the whole url
 
-        :return: the id of the bank account or None if not found
+        :return: generator of the unexplained transactions
+        """
+        params = {"bank_account": account_id, "view": "unexplained"}
+        return self.parent.iter_api("bank_transactions", params)
+
+    @staticmethod
+    def _named_id(index: BankAccountIndex, account_name: str) -> str:
+        """
+        :return: ID of the account in index named account_name, or None
+        """
+        return get_account_id(index.by_name.get(account_name.lower()))
+
+    @staticmethod
+    def _first_id(index: BankAccountIndex) -> str:
+        """
+        :return: ID of the first account in index, or None if it is empty
+        """
+        return get_account_id(index.accounts[0]) if index.accounts else None
+
+    @staticmethod
+    def _primary_uri(index: BankAccountIndex) -> str:
+        """
+        :return: url of the primary account in index, or None
         """
-        for account in bank_accounts:
-            if account["name"].lower() == account_name.lower():
-                return account["url"].rsplit("/", 1)[-1]
-        return None
+        return index.primary["url"] if index.primary else None
 
     def get_paypal_id(self, account_name: str) -> str:
         """
@@ -174,9 +405,7 @@ class BankAPI(FreeAgentBase):
 
         :return: ID of the named PayPal account or None
         """
-        params = {"view": "paypal_accounts"}
-        response = self.parent.get_api("bank_accounts", params)
-        return self._find_bank_id(response.get("bank_accounts", []), account_name)
+        return self._named_id(self.accounts.index("paypal_accounts"), account_name)
 
     def get_first_paypal_id(self) -> str:
         """
@@ -184,12 +413,7 @@ class BankAPI(FreeAgentBase):
 
         :return: ID of the first PayPal account or None if there is no PayPal account
         """
-        params = {"view": "paypal_accounts"}
-        response = self.parent.get_api("bank_accounts", params)
-        accounts = response.get("bank_accounts", [])
-        if accounts:
-            return accounts[0]["url"].rsplit("/", 1)[-1]
-        return None
+        return self._first_id(self.accounts.index("paypal_accounts"))
 
     def get_id(self, account_name: str) -> str:
         """
@@ -199,9 +423,9 @@ class BankAPI(FreeAgentBase):
 
         :return: ID of the account or None if not found
         """
-        params = {"view": "standard_bank_accounts"}
-        response = self.parent.get_api("bank_accounts", params)
-        return self._find_bank_id(response.get("bank_accounts", []), account_name)
+        return self._named_id(
+            self.accounts.index("standard_bank_accounts"), account_name
+        )
 
     def get_primary(self):
         """
@@ -209,12 +433,7 @@ class BankAPI(FreeAgentBase):
 
         :return: ID of the account or None if not found
         """
-        params = {"view": "standard_bank_accounts"}
-        response = self.parent.get_api("bank_accounts", params)
-        for acct in response.get("bank_accounts", []):
-            if acct.get("is_primary"):
-                return acct["url"].rsplit("/", 1)[-1]
-        return None
+        return get_account_id(self.accounts.primary())
 
     def get_primary_uri(self):
         """
@@ -222,9 +441,4 @@ class BankAPI(FreeAgentBase):
 
         :return: uri of the account or None if not found
         """
-        params = {"view": "standard_bank_accounts"}
-        response = self.parent.get_api("bank_accounts", params)
-        for acct in response.get("bank_accounts", []):
-            if acct.get("is_primary"):
-                return acct["url"]
-        return None
+        return self._primary_uri(self.accounts.index("standard_bank_accounts"))
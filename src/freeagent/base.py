@@ -2,80 +2,196 @@
 Base class the other class inherit from
 """
 
-from dataclasses import asdict, is_dataclass
-from datetime import date, datetime
-from decimal import Decimal
-from webbrowser import open as open_browser
-import re
+# requests and the oauth stack are imported when first needed, as they are
+# slow to import and not needed to build payloads or read cached data
+# pylint: disable=import-outside-toplevel
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import replace
+import json
+from math import ceil
+from time import perf_counter, sleep, time
+from typing import Iterable
+from urllib.parse import parse_qs, urlsplit
+
+from .attachment import encode_json
+from .auth import (
+    TokenAuth,
+    TokenManager,
+    load_token,
+    no_auth,
+    refresh_request,
+    refreshed_token,
+)
+from .cache import CachedResponse, CacheEntry, ResponseCache, cache_key
+from .metrics import Hook, RequestEvent, endpoint_name
+from .scheduler import RETRY_METHODS, RETRY_STATUSES, RequestScheduler
+from .serializer import serialize
+
+PER_PAGE = 100  # maximum page size allowed by freeagent
+
+
+class APIError(RuntimeError):
+    """
+    Raised when a freeagent request fails
+
+    :param message: description of the failure
+    :param status_code: HTTP status of the response
+    :param text: body of the response
+    :param retryable: True if sending the request again is safe and may work,
+        defaults to True for connection failures and 429 or 5xx responses
+    """
 
-from requests_oauthlib import OAuth2Session
+    def __init__(
+        self,
+        message: str,
+        status_code: int = None,
+        text: str = None,
+        retryable: bool = None,
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.text = text
+        if retryable is None:
+            retryable = status_code is None or status_code in RETRY_STATUSES
+        self.retryable = retryable
 
 
-class FreeAgentBase:
+class FreeAgentBase:  # pylint: disable=too-many-instance-attributes
     """
     Common functions used in other classes
     """
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
         self,
         api_base_url: str = "https://api.freeagent.com/v2/",
+        max_workers: int = 4,
+        scheduler: RequestScheduler = None,
+        cache: ResponseCache = None,
+        hooks: Iterable[Hook] = None,
     ):
         """
         Initialize the base class
 
         :param api_base_url: the url to use for requests, defaults to normal but can be
             changed to sandbox
-        :param service_name: The service name to use with keyring for storing oauth token
-        :param token_name: The name to use for the oauth token when storing in keyring
+        :param max_workers: default number of pages get_api fetches at the same time
+        :param scheduler: RequestScheduler used to rate limit and retry requests,
+            defaults to one sized for the freeagent limits
+        :param cache: ResponseCache for get requests, for example an LRUCache or an
+            SQLiteCache to keep responses between runs, defaults to None for no
+            caching so iter_api holds one page at a time
+        :param hooks: instrumentation hooks called for every request, for example
+            a MetricsCollector, see freeagent.metrics
         """
         self.api_base_url = api_base_url
         self.session = None
+        self.tokens = None
+        self._oauth = {}
+        self.max_workers = max_workers
+        self.scheduler = scheduler or RequestScheduler()
+        self.cache = None if cache is False else cache  # an empty cache is falsy
+        self.hooks = list(hooks or [])
+
+    def add_hook(self, hook: Hook):
+        """
+        Add an instrumentation hook, called for every request from now on
 
-    def authenticate(
-        self, oauth_ident: str, oauth_secret: str, save_token_cb, token: str = None
+        :param hook: Hook to add
+        """
+        self.hooks.append(hook)
+
+    @contextmanager
+    def _instrument(self, method: str, url: str, page: int = None):
+        """
+        Tell the hooks about a request, before_request on entry and
+        after_request on exit, even if the request fails
+
+        :param method: HTTP method of the request
+        :param url: complete url for the request
+        :param page: page number for paginated gets
+
+        :return: the RequestEvent, to fill in while the request runs
+        """
+        if url.startswith(self.api_base_url):
+            url = url[len(self.api_base_url) :]
+        event = RequestEvent(method, endpoint_name(url), page)
+        for hook in self.hooks:
+            hook.before_request(event)
+        try:
+            yield event
+        except Exception as err:
+            if event.status is None and event.error is None:
+                event.error = str(err)
+            raise
+        finally:
+            if not event.latency:
+                event.latency = perf_counter() - event.started
+            for hook in self.hooks:
+                hook.after_request(event)
+
+    @staticmethod
+    def _record(event: RequestEvent, response, attempt: int, body):
+        """
+        Fill in an event from the final response to a request
+
+        :param event: RequestEvent from _instrument, or None
+        :param response: the final response
+        :param attempt: number of the attempt that got the response, from 0
+        :param body: request body that was sent, or None
+        """
+        if event is None:
+            return
+        event.status = response.status_code
+        event.retries = attempt
+        event.latency = perf_counter() - event.started
+        event.bytes_sent = 0 if body is None else len(body)
+        event.bytes_received = len(response.content)
+
+    def authenticate(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        oauth_ident: str,
+        oauth_secret: str,
+        save_token_cb,
+        token: str = None,
+        token_store=None,
     ):
         """
         Authenticate with the freeagent API
 
+        The token is refreshed by a TokenManager, once for every thread using
+        the client and shortly before it expires, see freeagent.auth.
+
         :param oauth_ident: oauth identifier from the freeagent dev dashboard
         :param oauth_secret: oauth secret from the freeagent dev dashboard
         :param save_token_cb: function to call when the token is refreshed to save it
         :param token: initial token, or None
+        :param token_store: path of a json file holding the token, or a
+            FileTokenStore, shared with other processes using the token so
+            only one of them refreshes it
         """
-        token_url = self.api_base_url + "token_endpoint"
-        redirect_uri = "https://localhost/"
-
-        extra = {"client_id": oauth_ident, "client_secret": oauth_secret}
-
-        if token:
-            oauth = OAuth2Session(
-                oauth_ident,
-                token=token,
-                auto_refresh_url=token_url,
-                auto_refresh_kwargs=extra,
-                token_updater=save_token_cb,
-            )
-        elif oauth_secret:
-            oauth = OAuth2Session(
-                oauth_ident, redirect_uri=redirect_uri, scope=[self.api_base_url]
-            )
-            auth_url, _state = oauth.authorization_url(
-                self.api_base_url + "approve_app"
-            )
-            print("🔐 Open this URL and authorise the app:", auth_url)
-            open_browser(auth_url)
-            redirect_response = input("📋 Paste the full redirect URL here: ").strip()
-
-            token = oauth.fetch_token(
-                token_url,
-                authorization_response=redirect_response,
-                client_secret=oauth_secret,
-            )
+        import requests
+
+        token, token_store = load_token(token, token_store)
+        if not token:
+            if not oauth_secret:
+                raise ValueError("Need oauth_secret, or oauth_token")
+            token = self._authorise(oauth_ident, oauth_secret)
+            if token_store is not None:
+                with token_store.lock():
+                    token_store.save(token)
             save_token_cb(token)
-        else:
-            raise ValueError("Need oauth_secret, or oauth_token")
 
-        self.session = oauth
+        self._oauth = {"client_id": oauth_ident, "client_secret": oauth_secret}
+        self.tokens = TokenManager(
+            token,
+            self._fetch_token,
+            store=token_store,
+            save_token_cb=save_token_cb,
+        )
+        self.session = requests.Session()
+        self.session.auth = TokenAuth(self.tokens)
         self.session.headers.update(
             {
                 "Accept": "application/json",
@@ -83,80 +199,534 @@ class FreeAgentBase:
             }
         )
 
+    def _authorise(self, oauth_ident: str, oauth_secret: str) -> dict:
+        """
+        Get a token by asking the user to authorise the app in a browser
+
+        :param oauth_ident: oauth identifier from the freeagent dev dashboard
+        :param oauth_secret: oauth secret from the freeagent dev dashboard
+
+        :return: the new token
+        """
+        # the oauth stack is slow to import and only needed to authorise
+        from requests_oauthlib import OAuth2Session
+        from webbrowser import open as open_browser
+
+        oauth = OAuth2Session(
+            oauth_ident, redirect_uri="https://localhost/", scope=[self.api_base_url]
+        )
+        auth_url, _state = oauth.authorization_url(self.api_base_url + "approve_app")
+        print("🔐 Open this URL and authorise the app:", auth_url)
+        open_browser(auth_url)
+        redirect_response = input("📋 Paste the full redirect URL here: ").strip()
+
+        return oauth.fetch_token(
+            self.api_base_url + "token_endpoint",
+            authorization_response=redirect_response,
+            client_secret=oauth_secret,
+        )
+
+    def _fetch_token(self, token: dict) -> dict:
+        """
+        Get a new access token from the token endpoint, called by the
+        TokenManager
+
+        :param token: the expiring token
+
+        :return: the new token
+        """
+        response = self.session.post(
+            **refresh_request(self.api_base_url, token, self._oauth), auth=no_auth
+        )
+        response.raise_for_status()
+        return refreshed_token(token, response.json())
+
     def serialize_for_api(self, obj) -> dict[str, any]:
         """
         Convert dataclasses or dicts with Decimal, date, etc. into plain API-compatible dicts.
 
+        Dataclasses use a serializer compiled once per type, see freeagent.serializer.
+
         :param obj: dataclass or dict to convert
 
         return: API-compatible dict
         """
-        if is_dataclass(obj):
-            obj = asdict(obj)
+        return serialize(obj)
+
+    def _body(self, document) -> dict:
+        """
+        Get the request arguments to send document as JSON
 
-        def convert(val):
-            if isinstance(val, Decimal):
-                return str(val)
-            if isinstance(val, (date, datetime)):
-                return val.isoformat()
-            if isinstance(val, dict):
-                return {k: convert(v) for k, v in val.items()}
-            if isinstance(val, list):
-                return [convert(i) for i in val]
-            return val
+        :param document: JSON compatible document
 
-        return {k: convert(v) for k, v in obj.items() if v is not None}
+        :return: dict of keyword arguments for the request
+        """
+        return {"data": encode_json(document)}
 
-    def get_api(self, endpoint: str, params: dict = None) -> dict[str, any]:
+    @staticmethod
+    def _unsent(err: Exception) -> bool:
         """
-        Perform an API get request, handling pagination.
+        Check if a connection error happened before the request was sent
+
+        :param err: the requests exception
+
+        :return: True if connecting failed, False if the request may have
+            reached freeagent
+        """
+        # loaded by authenticate, so this is a lookup in sys.modules
+        from requests.exceptions import ConnectTimeout
+        from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+        if isinstance(err, ConnectTimeout):
+            return True
+        reason = err.args[0] if err.args else None
+        if isinstance(reason, MaxRetryError):
+            reason = reason.reason
+        return isinstance(reason, NewConnectionError)
+
+    def _retry_error(self, method: str, attempt: int, err: Exception, event) -> float:
+        """
+        Decide what to do after a request could not be sent or timed out
+
+        A POST or PUT is only sent again if it failed while connecting, once it
+        may have reached freeagent sending it twice could apply it twice.
+
+        :param method: HTTP method of the request
+        :param attempt: number of the attempt that failed, from 0
+        :param err: the connection error
+        :param event: RequestEvent from _instrument to fill in, or None
+
+        :return: seconds to wait before sending the request again
+        :raises APIError: if the retries have run out or the request must not
+            be sent again, retryable is False if it may have been applied
+        """
+        scheduler = self.scheduler
+        scheduler.record_error()
+        retryable = method in RETRY_METHODS or self._unsent(err)
+        if not retryable or attempt == scheduler.max_retries:
+            if event is not None:
+                event.retries = attempt
+            raise APIError(f"{method} failed: {err}", retryable=retryable) from err
+        return scheduler.retry_delay(attempt)
+
+    def _retry_response(self, method: str, attempt: int, response) -> float:
+        """
+        Decide if a response is kept or the request sent again
+
+        :param method: HTTP method of the request
+        :param attempt: number of the attempt that got the response, from 0
+        :param response: the response
+
+        :return: seconds to wait before sending the request again, or None to
+            keep the response
+        """
+        scheduler = self.scheduler
+        retry_after = scheduler.record(response.status_code, response.headers)
+        if (
+            not scheduler.should_retry(response.status_code, method)
+            or attempt == scheduler.max_retries
+        ):
+            return None
+        return scheduler.retry_delay(attempt, retry_after)
+
+    def _request(self, method: str, url: str, event: RequestEvent = None, **kwargs):
+        """
+        Send a request through the scheduler
+
+        Waits for the rate limit before sending, then retries 429, 5xx and
+        connection errors with backoff.  POST and PUT are only retried on 429
+        and on failures to connect.  The last response is returned once the
+        retries run out.
+
+        :param method: HTTP method to use
+        :param url: complete url for the request
+        :param event: RequestEvent from _instrument to fill in, or None
+
+        :return: the response
+        :raises APIError: if the connection keeps failing
+        """
+        # loaded by authenticate, so this is a lookup in sys.modules
+        from requests.exceptions import ConnectionError as RequestsConnectionError
+        from requests.exceptions import Timeout
+
+        for attempt in range(self.scheduler.max_retries + 1):
+            wait = self.scheduler.reserve()
+            if wait > 0:
+                sleep(wait)
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (RequestsConnectionError, Timeout) as err:
+                sleep(self._retry_error(method, attempt, err, event))
+                continue
+            delay = self._retry_response(method, attempt, response)
+            if delay is None:
+                break
+            sleep(delay)
+        self._record(event, response, attempt, kwargs.get("data"))
+        return response
+
+    @staticmethod
+    def _step(flow, response=None, error: Exception = None):
+        """
+        Advance a request flow
+
+        Flows are generators holding everything about a call except the I/O:
+        they yield (method, url, event, kwargs) for each request they need and
+        are sent its response, or thrown the error it raised.  The sync and async
+        clients drive the same flows.
+
+        :param flow: the generator
+        :param response: response to the request the flow last yielded
+        :param error: exception raised by that request instead
+
+        :return: tuple of (done, value), value is the next request or, once done,
+            the value the flow returned
+        """
+        try:
+            if error is not None:
+                return False, flow.throw(error)
+            return False, flow.send(response)
+        except StopIteration as stop:
+            return True, stop.value
+
+    def _attempt(self, request: tuple) -> tuple:
+        """
+        Send a request yielded by a flow
+
+        :param request: tuple of method, url, event and keyword arguments
+
+        :return: tuple of the response and None, or None and the exception
+        """
+        method, url, event, kwargs = request
+        try:
+            return self._request(method, url, event, **kwargs), None
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            return None, err  # thrown into the flow, which records and raises it
+
+    def _run(self, flow):
+        """
+        Drive a request flow to the end
+
+        :param flow: generator from one of the _flow methods
+
+        :return: the value the flow returned
+        """
+        done, value = self._step(flow)
+        while not done:
+            done, value = self._step(flow, *self._attempt(value))
+        return value
+
+    def _cache_lookup(self, endpoint: str, params: dict):
+        """
+        Find the cached copy of a page and build the conditional request headers
 
         :param endpoint: end part of the endpoint URL
-        :param params: dict of "Name": Value entries for request to process into URL
+        :param params: dict of the request parameters, including the page
 
-        :return: response as a dict
+        :return: tuple of the cache key, cached entry and request headers,
+            the key is None if there is no cache
         """
-        if params is None:
-            params = {}
+        if self.cache is None:
+            return None, None, None
+        key = cache_key(endpoint, params)
+        entry = self.cache.get(key)
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return key, entry, headers or None
+
+    def _cache_response(
+        self, key: str, entry: CacheEntry, response, event: RequestEvent = None
+    ):
+        """
+        Decode a page, serving 304 replies from the cache and storing pages that
+        have an ETag or Last-Modified header, or a time to live in the cache
+
+        :param key: cache key from _cache_lookup
+        :param entry: cached entry from _cache_lookup
+        :param response: response for the page
+        :param event: RequestEvent to add the decode time to, or None
 
-        per_page = 100
-        params["per_page"] = per_page
-        params["page"] = 1
+        :return: tuple of the response and its decoded json
+        """
+        started = perf_counter()
+        if response.status_code == 304 and entry is not None:
+            entry = replace(entry, stored_at=time())  # restart its time to live
+            self.cache.set(key, entry)
+            json_data = json.loads(entry.content)
+            if event is not None:
+                event.decode_time = perf_counter() - started
+            return CachedResponse(entry), json_data
 
-        response = self.session.get(self.api_base_url + endpoint, params=params)
         response.raise_for_status()
         json_data = response.json()
+        if event is not None:
+            event.decode_time = perf_counter() - started
+        if key is not None:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified or self.cache.ttl(key):
+                self.cache.set(
+                    key,
+                    CacheEntry(
+                        response.content,
+                        etag,
+                        last_modified,
+                        {
+                            name: response.headers[name]
+                            for name in ("X-Total-Count", "Link")
+                            if name in response.headers
+                        },
+                        dict(response.links),
+                    ),
+                )
+        return response, json_data
+
+    def _page_flow(self, endpoint: str, params: dict, page: int):
+        """
+        Request flow fetching a single page of a paginated endpoint, pages the
+        cache holds fresh are not requested
+
+        :param endpoint: end part of the endpoint URL
+        :param params: dict of "Name": Value entries for request to process into URL
+        :param page: number of the page to fetch, starting at 1
+
+        :return: tuple of the response and its decoded json
+        """
+        params = {**params, "page": page}
+        key, entry, headers = self._cache_lookup(endpoint, params)
+        with self._instrument("GET", endpoint, page) as event:
+            if entry is not None and self.cache.is_fresh(key, entry):
+                event.cached = True
+                started = perf_counter()
+                json_data = json.loads(entry.content)
+                event.decode_time = perf_counter() - started
+                return CachedResponse(entry), json_data
+            response = yield (
+                "GET",
+                self.api_base_url + endpoint,
+                event,
+                {"params": params, "headers": headers},
+            )
+            return self._cache_response(key, entry, response, event)
+
+    def _get_page(self, endpoint: str, params: dict, page: int):
+        """
+        Fetch a single page of a paginated endpoint
+
+        :param endpoint: end part of the endpoint URL
+        :param params: dict of "Name": Value entries for request to process into URL
+        :param page: number of the page to fetch, starting at 1
+
+        :return: tuple of the response and its decoded json
+        """
+        return self._run(self._page_flow(endpoint, params, page))
+
+    def _last_page(self, response, item_count: int) -> int:
+        """
+        Work out the number of the last page from the first response
+
+        freeagent sends the total number of items in ``X-Total-Count`` and the
+        last page in the ``Link`` header, either is enough to know how many pages
+        are left without asking for them one after another.
+
+        :param response: response for the first page
+        :param item_count: number of items in the first page
 
-        # some endpoints return a single object, not a list
-        # if the response is not a dict, or if the key is not in the dict, return it
+        :return: number of the last page, or None if it cannot be worked out
+        """
+        if item_count < PER_PAGE:
+            return 1
+
+        total = response.headers.get("X-Total-Count")
+        if total is not None and total.isdigit():
+            return max(1, ceil(int(total) / PER_PAGE))
+
+        links = response.links
+        if "last" in links:
+            query = parse_qs(urlsplit(links["last"]["url"]).query)
+            if query.get("page", [""])[0].isdigit():
+                return int(query["page"][0])
+        if links and "next" not in links:
+            return 1
+        return None
+
+    @staticmethod
+    def _items_key(endpoint: str, json_data) -> str:
+        """
+        Get the key holding the list of items in a page
+
+        :param endpoint: end part of the endpoint URL
+        :param json_data: decoded json of the first page
+
+        :return: the key, or None if the endpoint returned a single object
+        """
         key = endpoint.split("/")[-1]
         if not isinstance(json_data, dict) or key not in json_data:
+            return None
+        return key
+
+    def _collect_pages(self, endpoint: str, response, json_data):
+        """
+        Merge every page of a paginated get, without doing the I/O
+
+        Yields lists of page numbers to fetch, and is sent the decoded json of
+        those pages in the same order.  The remaining pages are asked for in one
+        list when the first response says how many there are, otherwise one at a
+        time until a short page.
+
+        :param endpoint: end part of the endpoint URL
+        :param response: response for the first page
+        :param json_data: decoded json of the first page
+
+        :return: the merged response
+        """
+        key = self._items_key(endpoint, json_data)
+        if key is None:
+            # some endpoints return a single object, not a list
             return json_data
 
         items = json_data.get(key, [])
-
-        if len(items) == per_page:
-            # More pages might exist, so start paginating from page 2
+        last_page = self._last_page(response, len(items))
+        if last_page is None:
+            # no pagination headers, so keep going until a short page
             page = 2
             while True:
-                params["page"] = page
-                response = self.session.get(self.api_base_url + endpoint, params=params)
-                response.raise_for_status()
-                json_data = response.json()
-
-                if key in json_data:
-                    current_items = json_data[key]
-                    items.extend(current_items)
-
-                    if len(current_items) < per_page:
-                        break
-                else:
+                (json_data,) = yield [page]
+                current_items = json_data.get(key, [])
+                items.extend(current_items)
+                if len(current_items) < PER_PAGE:
                     break
-
                 page += 1
-
+        elif last_page > 1:
+            for page_json in (yield list(range(2, last_page + 1))):
+                items.extend(page_json.get(key, []))
         return {key: items}
 
+    def _walk_pages(self, endpoint: str, response, json_data):
+        """
+        Walk the pages of a paginated get one at a time, without doing the I/O
+
+        Yields (items, next_page) for each page, next_page being the page to
+        request next or None after the last one, and is sent the decoded json of
+        that page.  An endpoint returning a single object yields it as the only
+        item.
+
+        :param endpoint: end part of the endpoint URL
+        :param response: response for the first page
+        :param json_data: decoded json of the first page
+        """
+        key = self._items_key(endpoint, json_data)
+        if key is None:
+            yield [json_data], None
+            return
+        last_page = self._last_page(response, len(json_data[key]))
+        page = 1
+        while True:
+            items = json_data.get(key, [])
+            if last_page is None:
+                more = len(items) == PER_PAGE
+            else:
+                more = page < last_page
+            page += 1
+            json_data = yield items, page if more else None
+
+    def _get_pages(self, endpoint: str, params: dict, pages: list, workers: int):
+        """
+        Fetch pages on a pool of threads
+
+        :param endpoint: end part of the endpoint URL
+        :param params: dict of "Name": Value entries for request to process into URL
+        :param pages: list of page numbers
+        :param workers: number of pages to fetch at the same time
+
+        :return: list of the decoded json of each page, in the order of pages
+        """
+        if len(pages) == 1:
+            return [self._get_page(endpoint, params, pages[0])[1]]
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pages)))) as pool:
+            # map returns results in page order whatever order they finish in
+            return [
+                json_data
+                for _response, json_data in pool.map(
+                    lambda page: self._get_page(endpoint, params, page), pages
+                )
+            ]
+
+    def get_api(
+        self, endpoint: str, params: dict = None, max_workers: int = None
+    ) -> dict[str, any]:
+        """
+        Perform an API get request, handling pagination.
+
+        The first page is fetched on its own, then the remaining pages are fetched
+        concurrently and merged in page order.  If the response headers do not say
+        how many pages there are the pages are fetched one at a time instead.
+
+        :param endpoint: end part of the endpoint URL
+        :param params: dict of "Name": Value entries for request to process into URL
+        :param max_workers: number of pages to fetch at the same time, defaults to
+            the max_workers the class was created with
+
+        :return: response as a dict
+        """
+        params = {**(params or {}), "per_page": PER_PAGE}
+        workers = max_workers or self.max_workers
+        flow = self._collect_pages(endpoint, *self._get_page(endpoint, params, 1))
+        done, value = self._step(flow)
+        while not done:
+            done, value = self._step(
+                flow, self._get_pages(endpoint, params, value, workers)
+            )
+        return value
+
+    def iter_api(self, endpoint: str, params: dict = None):
+        """
+        Perform an API get request, yielding the items one page at a time.
+
+        The next page is requested in the background while the caller works through
+        the current one, so no more than two pages are held in memory at once.
+        Endpoints that return a single object yield that object.
+
+        :param endpoint: end part of the endpoint URL
+        :param params: dict of "Name": Value entries for request to process into URL
+
+        :return: generator of the items from every page
+        """
+        params = {**(params or {}), "per_page": PER_PAGE}
+        walk = self._walk_pages(endpoint, *self._get_page(endpoint, params, 1))
+        items, page = walk.send(None)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            while True:
+                future = None
+                if page is not None:
+                    future = pool.submit(self._get_page, endpoint, params, page)
+
+                yield from items
+                del items  # let the page be freed before the next one
+
+                if future is None:
+                    break
+                items, page = walk.send(future.result()[1])
+
+    def _put_flow(self, url: str, root: str, updates):
+        """
+        Request flow for put_api
+
+        :raises APIError: if put request fails
+        """
+        with self._instrument("PUT", url) as event:
+            response = yield "PUT", url, event, self._body({root: updates})
+        if response.status_code != 200:
+            raise APIError(
+                f"PUT failed {response.status_code}: {response.text}",
+                response.status_code,
+                response.text,
+            )
+
     def put_api(self, url: str, root: str, updates: str):
         """
         Perform an API put request
@@ -165,12 +735,34 @@ class FreeAgentBase:
         :param root: first part of payload
         :param updates: second part of payload
 
-        :raises RunTimeError: if put request fails
+        :raises APIError: if put request fails
         """
-        payload = {root: updates}
-        response = self.session.put(url, json=payload)
-        if response.status_code != 200:
-            raise RuntimeError(f"PUT failed {response.status_code}: {response.text}")
+        self._run(self._put_flow(url, root, updates))
+
+    def _post_flow(self, endpoint: str, root: str, payload):
+        """
+        Request flow for post_api
+
+        :return: the decoded response
+        :raises APIError: if post request fails
+        """
+        with self._instrument("POST", endpoint) as event:
+            response = yield (
+                "POST",
+                self.api_base_url + endpoint,
+                event,
+                self._body({root: payload}),
+            )
+            if response.status_code not in (200, 201):
+                raise APIError(
+                    f"POST failed {response.status_code}: {response.text}",
+                    response.status_code,
+                    response.text,
+                )
+            started = perf_counter()
+            json_data = response.json()
+            event.decode_time = perf_counter() - started
+        return json_data
 
     def post_api(self, endpoint: str, root: str, payload: str):
         """
@@ -180,10 +772,7 @@ class FreeAgentBase:
         :param root: first part of payload
         :param payload: second part of payload
 
-        :raises RunTimeError: if post request fails
+        :return: the decoded response
+        :raises APIError: if post request fails
         """
-        data = {root: payload}
-        response = self.session.post(self.api_base_url + endpoint, json=data)
-        if response.status_code not in (200, 201):
-            raise RuntimeError(f"POST failed {response.status_code}: {response.text}")
-        return response.json()
+        return self._run(self._post_flow(endpoint, root, payload))
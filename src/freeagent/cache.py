@@ -0,0 +1,387 @@
+"""
+Response caches used by get_api and iter_api
+
+Each page is stored with its ETag and Last-Modified headers so the next request
+for it can be conditional, a 304 reply is then served from the cache.  Endpoints
+given a time to live are served from the cache without a request until it runs out.
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Optional
+from urllib.parse import urlencode
+import json
+import sqlite3
+
+# reference data that rarely changes, in seconds
+DEFAULT_TTLS = {
+    "bank_accounts": 60 * 60,
+    "categories": 24 * 60 * 60,
+    "company": 24 * 60 * 60,
+    "users/me": 60 * 60,
+}
+# keys starting with :prefix, compared exactly as LIKE ignores case
+_PREFIX_MATCH = "WHERE substr(key, 1, length(:prefix)) = :prefix"
+
+
+def cache_key(endpoint: str, params: dict) -> str:
+    """
+    Build the cache key for a request
+
+    :param endpoint: end part of the endpoint URL
+    :param params: dict of the request parameters, including the page
+
+    :return: key string, the endpoint followed by the sorted parameters
+    """
+    return endpoint + "?" + urlencode(sorted(params.items()))
+
+
+@dataclass
+class CacheEntry:
+    """
+    dataclass for a cached response
+    """
+
+    content: bytes  # raw body, decoded again on each hit so callers get a fresh copy
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    headers: dict = field(default_factory=dict)  # pagination headers
+    links: dict = field(default_factory=dict)
+    stored_at: float = field(default_factory=time)
+
+
+class CachedResponse:  # pylint: disable=too-few-public-methods
+    """
+    Stand-in for the response of a request answered from the cache, only has the
+    parts get_api reads
+    """
+
+    status_code = 304
+
+    def __init__(self, entry: CacheEntry):
+        self.headers = entry.headers
+        self.links = entry.links
+        self.content = entry.content
+
+
+class ResponseCache(ABC):
+    """
+    Common functions for the caches, subclasses provide get, set and invalidate
+
+    :param ttls: dict of endpoint to seconds its pages are used without asking
+        freeagent, endpoints not listed are always revalidated
+    """
+
+    def __init__(self, ttls: dict = None):
+        self.ttls = dict(ttls or {})
+
+    def ttl(self, key: str) -> float:
+        """
+        Get the time to live for a cache key
+
+        :param key: cache key from cache_key
+
+        :return: seconds the entry is fresh for, 0 if it always needs revalidating
+        """
+        return self.ttls.get(key.split("?", 1)[0], 0)
+
+    def is_fresh(self, key: str, entry: CacheEntry) -> bool:
+        """
+        Check if an entry can be used without asking freeagent
+
+        :param key: cache key from cache_key
+        :param entry: the cached entry
+
+        :return: True if the entry is younger than the endpoint's time to live
+        """
+        return time() - entry.stored_at < self.ttl(key)
+
+    @abstractmethod
+    def get(self, key: str) -> CacheEntry:
+        """
+        Get an entry
+
+        :param key: cache key from cache_key
+
+        :return: the CacheEntry or None if not cached
+        """
+
+    @abstractmethod
+    def set(self, key: str, entry: CacheEntry):
+        """
+        Store an entry
+
+        :param key: cache key from cache_key
+        :param entry: CacheEntry to store
+        """
+
+    @abstractmethod
+    def invalidate(self, prefix: str = ""):
+        """
+        Remove entries whose key starts with prefix
+
+        :param prefix: start of the keys to remove, usually an endpoint,
+            an empty string removes everything
+        """
+
+
+class LRUCache(ResponseCache):
+    """
+    Bounded in-memory cache, the least recently used entries are dropped first
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 8 * 1024 * 1024,
+        ttls: dict = None,
+    ):
+        """
+        Initialize the cache
+
+        :param max_entries: most responses to keep
+        :param max_bytes: most response bytes to keep
+        :param ttls: dict of endpoint to seconds its pages are used without asking
+            freeagent, defaults to always revalidating
+        """
+        super().__init__(ttls)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> CacheEntry:
+        """
+        Get an entry and mark it as recently used
+
+        :param key: cache key from cache_key
+
+        :return: the CacheEntry or None if not cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        """
+        Store an entry, dropping old entries if the cache is full
+
+        :param key: cache key from cache_key
+        :param entry: CacheEntry to store
+        """
+        if len(entry.content) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old.content)
+            self._entries[key] = entry
+            self.size += len(entry.content)
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                _key, dropped = self._entries.popitem(last=False)
+                self.size -= len(dropped.content)
+
+    def invalidate(self, prefix: str = ""):
+        """
+        Remove entries whose key starts with prefix
+
+        :param prefix: start of the keys to remove, usually an endpoint,
+            an empty string removes everything
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self.size -= len(self._entries.pop(key).content)
+
+
+class PrefixedCache(ResponseCache):
+    """
+    View of a shared cache with every key prefixed, so clients for different
+    companies can share one cache without seeing each other's pages
+    """
+
+    def __init__(self, cache: ResponseCache, prefix: str):
+        """
+        Initialize the view
+
+        :param cache: shared ResponseCache holding the entries
+        :param prefix: added to the start of every key, for example the company
+        """
+        super().__init__()
+        self.cache = cache
+        self.prefix = f"{prefix}|"
+
+    def ttl(self, key: str) -> float:
+        return self.cache.ttl(key)
+
+    def get(self, key: str) -> CacheEntry:
+        return self.cache.get(self.prefix + key)
+
+    def set(self, key: str, entry: CacheEntry):
+        self.cache.set(self.prefix + key, entry)
+
+    def invalidate(self, prefix: str = ""):
+        self.cache.invalidate(self.prefix + prefix)
+
+
+class SQLiteCache(ResponseCache):
+    """
+    Persistent cache in an SQLite file, so new processes start warm
+
+    Entries are kept per namespace, use a different namespace for each company
+    sharing the file.  The least recently used entries are dropped once the
+    stored responses go over max_bytes.
+    """
+
+    def __init__(
+        self,
+        path,
+        namespace: str = "",
+        max_bytes: int = 64 * 1024 * 1024,
+        ttls: dict = None,
+    ):
+        """
+        Initialize the cache, creating the file if needed
+
+        :param path: pathlike location of the SQLite file
+        :param namespace: prefix for the keys, usually the company
+        :param max_bytes: most response bytes to keep in the file
+        :param ttls: dict of endpoint to seconds its pages are used without asking
+            freeagent, defaults to DEFAULT_TTLS
+        """
+        super().__init__(DEFAULT_TTLS if ttls is None else ttls)
+        self.path = Path(path)
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        with self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    content BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    headers TEXT NOT NULL,
+                    links TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+                """)
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed"
+                " ON responses (accessed_at)"
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM responses " + _PREFIX_MATCH,
+                {"prefix": self.namespace + "|"},
+            ).fetchone()[0]
+
+    def close(self):
+        """
+        Close the database
+        """
+        self._db.close()
+
+    def get(self, key: str) -> CacheEntry:
+        """
+        Get an entry and mark it as recently used
+
+        :param key: cache key from cache_key
+
+        :return: the CacheEntry or None if not cached
+        """
+        full_key = self.namespace + "|" + key
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT content, etag, last_modified, headers, links, stored_at"
+                " FROM responses WHERE key = ?",
+                (full_key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (time(), full_key),
+            )
+        content, etag, last_modified, headers, links, stored_at = row
+        return CacheEntry(
+            content,
+            etag,
+            last_modified,
+            json.loads(headers),
+            json.loads(links),
+            stored_at,
+        )
+
+    def set(self, key: str, entry: CacheEntry):
+        """
+        Store an entry, dropping old entries if the file is full
+
+        :param key: cache key from cache_key
+        :param entry: CacheEntry to store
+        """
+        size = len(entry.content)
+        if size > self.max_bytes:
+            return
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.namespace + "|" + key,
+                    entry.content,
+                    entry.etag,
+                    entry.last_modified,
+                    json.dumps(entry.headers),
+                    json.dumps(entry.links),
+                    entry.stored_at,
+                    time(),
+                    size,
+                ),
+            )
+            total = self._db.execute("SELECT SUM(size) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(total - self.max_bytes)
+
+    def _evict(self, excess: int):
+        """
+        Delete the least recently used entries until excess bytes are freed
+
+        :param excess: number of bytes to free
+        """
+        rows = self._db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ).fetchall()
+        doomed = []
+        for key, size in rows:
+            if excess <= 0:
+                break
+            doomed.append((key,))
+            excess -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def invalidate(self, prefix: str = ""):
+        """
+        Remove entries in this namespace whose key starts with prefix
+
+        :param prefix: start of the keys to remove, usually an endpoint,
+            an empty string removes everything in the namespace
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM responses " + _PREFIX_MATCH,
+                {"prefix": self.namespace + "|" + prefix},
+            )
@@ -3,7 +3,106 @@ Class for getting freeagent categories
 categories are cached after first run
 """
 
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Sequence
+
 from .base import FreeAgentBase
+from .rules import Rule, RuleSet
+
+
+class CategoryIndex:  # pylint: disable=too-many-instance-attributes
+    """
+    Categories indexed for fast lookup, built once each time categories are loaded
+
+    - nominal code and url maps
+    - every lowercased description joined into one string, so a substring search
+      is a single str.find and finds the first matching category, as a linear
+      search would
+    - sorted descriptions for prefix searches
+    """
+
+    memo_size = 4096  # most description lookups to remember
+
+    def __init__(self, categories: dict):
+        """
+        Build the index
+
+        :param categories: dict of category group to list of categories, as returned
+            by the categories endpoint
+        """
+        self.source = categories
+        self.categories = [
+            cat
+            for _, cats in categories.items()
+            if isinstance(cats, list)
+            for cat in cats
+        ]
+        self.by_nominal_code = {}
+        self.by_url = {}
+        for cat in self.categories:
+            self.by_nominal_code.setdefault(str(cat.get("nominal_code", "")), cat)
+            self.by_url.setdefault(cat.get("url"), cat)
+
+        descriptions = [cat.get("description", "").lower() for cat in self.categories]
+        self._starts = []
+        offset = 0
+        for desc in descriptions:
+            self._starts.append(offset)
+            offset += len(desc) + 1
+        self._haystack = "\0".join(descriptions)
+        self._sorted = sorted((desc, i) for i, desc in enumerate(descriptions))
+        self._memo = {}
+
+    def find(self, description: str) -> dict:
+        """
+        Find the first category whose description contains description
+
+        :param description: text to find, not case sensitive
+
+        :return: the category dict or None if not found
+        """
+        needle = description.lower()
+        try:
+            return self._memo[needle]
+        except KeyError:
+            pass
+
+        cat = None
+        pos = self._haystack.find(needle) if self.categories else -1
+        if pos >= 0:
+            cat = self.categories[bisect_right(self._starts, pos) - 1]
+
+        if len(self._memo) >= self.memo_size:
+            self._memo.clear()
+        self._memo[needle] = cat
+        return cat
+
+    def find_many(self, descriptions: Iterable[str]) -> List[dict]:
+        """
+        Find the categories for many descriptions in one call
+
+        :param descriptions: iterable of text to find, not case sensitive
+
+        :return: list of category dicts, None where not found
+        """
+        return [self.find(description) for description in descriptions]
+
+    def find_prefix(self, prefix: str) -> List[dict]:
+        """
+        Find every category whose description starts with prefix
+
+        :param prefix: start of the description, not case sensitive
+
+        :return: list of category dicts in description order
+        """
+        prefix = prefix.lower()
+        start = bisect_left(self._sorted, (prefix, -1))
+        found = []
+        for desc, i in self._sorted[start:]:
+            if not desc.startswith(prefix):
+                break
+            found.append(self.categories[i])
+        return found
 
 
 class CategoryAPI(FreeAgentBase):
@@ -17,6 +116,7 @@ class CategoryAPI(FreeAgentBase):
         """
         self.parent = parent  # the main FreeAgent instance
         self.categories = {}
+        self._index = None
 
     def _prep_categories(self):
         """
@@ -25,6 +125,41 @@ class CategoryAPI(FreeAgentBase):
         if not self.categories:
             self.categories = self.parent.get_api("categories")
 
+    @property
+    def index(self) -> CategoryIndex:
+        """
+        CategoryIndex of the loaded categories, rebuilt whenever they change
+        """
+        if self._index is None or self._index.source is not self.categories:
+            self._index = CategoryIndex(self.categories)
+        return self._index
+
+    def refresh(self):
+        """
+        Fetch the categories again, for when they have been changed on freeagent
+        """
+        self.categories = self.parent.get_api("categories")
+
+    def _find_desc(self, description: str) -> dict:
+        """
+        Find the first category whose description contains description
+
+        :param description: name of category to find, not case sensitive
+
+        :return: the category dict or None if not found
+        """
+        return self.index.find(description)
+
+    def _find_nominal_code(self, nominal_code: int) -> dict:
+        """
+        Find the category with the passed nominal code
+
+        :param nominal_code: nominal code of category to find
+
+        :return: the category dict or None if not found
+        """
+        return self.index.by_nominal_code.get(str(nominal_code))
+
     def get_desc_id(self, description: str) -> str:
         """
         Return the description id for passed category name
@@ -34,13 +169,23 @@ class CategoryAPI(FreeAgentBase):
         :return: id url of the category or None if not found
         """
         self._prep_categories()
-        for _, cats in self.categories.items():
-            for cat in cats:
-                if description.lower() in cat.get("description", "").lower():
-                    return cat["url"]
-        return None
+        cat = self._find_desc(description)
+        return cat["url"] if cat else None
+
+    def get_desc_ids(self, descriptions: Iterable[str]) -> List[str]:
+        """
+        Return the description ids for many category names in one call
+
+        :param descriptions: iterable of category names to find
+
+        :return: list of id urls, None for names not found
+        """
+        self._prep_categories()
+        return [
+            cat["url"] if cat else None for cat in self.index.find_many(descriptions)
+        ]
 
-    def get_desc_nominal_code(self, description: str) -> ints:
+    def get_desc_nominal_code(self, description: str) -> int:
         """
         Return the nominal code for a given category description.
 
@@ -48,11 +193,8 @@ class CategoryAPI(FreeAgentBase):
         :return: The nominal code of the category, or None if not found.
         """
         self._prep_categories()
-        for _, cats in self.categories.items():
-            for cat in cats:
-                if description.lower() in cat.get("description", "").lower():
-                    return cat["nominal_code"]
-        return None
+        cat = self._find_desc(description)
+        return cat["nominal_code"] if cat else None
 
     def get_nominal_code_id(self, nominal_code: int) -> str:
         """
@@ -63,8 +205,29 @@ class CategoryAPI(FreeAgentBase):
         :return: id url of the category or None if not found
         """
         self._prep_categories()
-        for _, cats in self.categories.items():
-            for cat in cats:
-                if str(nominal_code) == cat.get("nominal_code", ""):
-                    return cat["url"]
-        return None
+        cat = self._find_nominal_code(nominal_code)
+        return cat["url"] if cat else None
+
+    def get_category(self, url: str) -> dict:
+        """
+        Get a category from its url
+
+        :param url: id url of the category
+
+        :return: the category dict or None if not found
+        """
+        self._prep_categories()
+        return self.index.by_url.get(url)
+
+    def compile_rules(self, rules: Sequence[Rule]) -> RuleSet:
+        """
+        Compile rules for explaining bank transactions, resolving their
+        categories from the loaded categories
+
+        :param rules: list of Rule, earlier rules win
+
+        :return: RuleSet
+        :raises ValueError: if a rule category cannot be found
+        """
+        self._prep_categories()
+        return RuleSet(rules, self.index)
@@ -0,0 +1,20 @@
+"""
+The FreeAgent client, with the sub-APIs attached
+"""
+
+from .bank import BankAPI
+from .base import FreeAgentBase
+from .category import CategoryAPI
+from .transaction import TransactionAPI
+
+
+class FreeAgent(FreeAgentBase):
+    """
+    The main public class
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)  # initialse base class
+        self.bank = BankAPI(self)
+        self.category = CategoryAPI(self)
+        self.transaction = TransactionAPI(self)
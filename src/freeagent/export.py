@@ -0,0 +1,207 @@
+"""
+Write transactions to CSV, JSON Lines or Parquet as they stream in
+
+Pass the generator from TransactionAPI.iter_transactions so rows are written
+while iter_api fetches the next page in the background.  Rows are written in
+chunks of chunk_size, so memory use does not grow with the size of the export.
+
+Parquet needs pyarrow, install it with ``pip install freeagent[parquet]``
+"""
+
+from contextlib import contextmanager
+from dataclasses import fields
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Union
+import csv
+import json
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+from .payload import Transaction
+from .serializer import convert_value
+from .transaction import LazyTransaction
+
+COLUMNS = tuple(f.name for f in fields(Transaction))
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".parquet": "parquet"}
+
+
+def _chunks(rows: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """
+    :param rows: iterable of transaction rows, raw dicts are wrapped in
+        LazyTransaction
+    :param size: rows per chunk
+
+    :return: generator of lists of up to size rows
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield [LazyTransaction(r) if isinstance(r, dict) else r for r in chunk]
+
+
+def _text(value: Any) -> Any:
+    """
+    :param value: field value of a transaction
+
+    :return: value as written to CSV or JSON, amounts as exact strings
+    """
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return value
+
+
+@contextmanager
+def _open(target, mode: str):
+    """
+    Open target if it is a path, otherwise use it as an open file
+
+    :param target: pathlike or file object
+    :param mode: mode to open a path with
+    """
+    if isinstance(target, (str, Path)):
+        with open(target, mode, encoding="utf-8", newline="") as f:
+            yield f
+    else:
+        yield target
+
+
+def write_csv(rows: Iterable[Any], target, chunk_size: int = 1000) -> int:
+    """
+    Write transactions to CSV with a header row
+
+    :param rows: iterable of Transaction, LazyTransaction or raw transaction dicts
+    :param target: pathlike or text file object to write to
+    :param chunk_size: rows to write at a time
+
+    :return: number of rows written
+    """
+    count = 0
+    with _open(target, "w") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for chunk in _chunks(rows, chunk_size):
+            writer.writerows(
+                [_text(getattr(row, name)) for name in COLUMNS] for row in chunk
+            )
+            count += len(chunk)
+    return count
+
+
+def write_jsonl(rows: Iterable[Any], target, chunk_size: int = 1000) -> int:
+    """
+    Write transactions as JSON Lines, one object per transaction
+
+    :param rows: iterable of Transaction, LazyTransaction or raw transaction dicts
+    :param target: pathlike or text file object to write to
+    :param chunk_size: rows to write at a time
+
+    :return: number of rows written
+    """
+    count = 0
+    with _open(target, "w") as f:
+        for chunk in _chunks(rows, chunk_size):
+            f.write(
+                "".join(
+                    json.dumps(
+                        {name: convert_value(getattr(row, name)) for name in COLUMNS}
+                    )
+                    + "\n"
+                    for row in chunk
+                )
+            )
+            count += len(chunk)
+    return count
+
+
+def parquet_schema():
+    """
+    Get the Parquet schema transactions are written with
+
+    :return: pyarrow Schema, amounts as decimal128(18, 2) and dates as date32
+    """
+    if pyarrow is None:
+        raise ImportError(
+            "Parquet export needs pyarrow, install it with: pip install freeagent[parquet]"
+        )
+    string = pyarrow.string()
+    return pyarrow.schema(
+        [
+            ("url", string),
+            ("dated_on", pyarrow.date32()),
+            ("created_at", pyarrow.timestamp("us", tz="UTC")),
+            ("updated_at", pyarrow.timestamp("us", tz="UTC")),
+            ("description", string),
+            ("category", string),
+            ("category_name", string),
+            ("nominal_code", string),
+            ("debit_value", pyarrow.decimal128(18, 2)),
+            ("source_item_url", string),
+            ("foreign_currency_data", string),  # JSON text
+        ]
+    )
+
+
+def write_parquet(rows: Iterable[Any], target, chunk_size: int = 10_000) -> int:
+    """
+    Write transactions to Parquet, a row group per chunk
+
+    :param rows: iterable of Transaction, LazyTransaction or raw transaction dicts
+    :param target: pathlike or binary file object to write to
+    :param chunk_size: rows per row group
+
+    :return: number of rows written
+    """
+    schema = parquet_schema()
+    count = 0
+    with pyarrow.parquet.ParquetWriter(
+        str(target) if isinstance(target, Path) else target, schema
+    ) as writer:
+        for chunk in _chunks(rows, chunk_size):
+            columns = {name: [getattr(row, name) for row in chunk] for name in COLUMNS}
+            columns["debit_value"] = [
+                v.quantize(Decimal("0.01")) for v in columns["debit_value"]
+            ]
+            columns["foreign_currency_data"] = [
+                None if v is None else json.dumps(v)
+                for v in columns["foreign_currency_data"]
+            ]
+            writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+            count += len(chunk)
+    return count
+
+
+def export_transactions(
+    rows: Iterable[Any], target: Union[str, Path], fmt: str = None, **kwargs
+) -> int:
+    """
+    Write transactions in the format given by fmt or the file extension
+
+    :param rows: iterable of Transaction, LazyTransaction or raw transaction dicts,
+        usually the generator from TransactionAPI.iter_transactions
+    :param target: path to write to
+    :param fmt: "csv", "jsonl" or "parquet", None to use the extension of target
+    :param kwargs: passed on to the writer, for example chunk_size
+
+    :return: number of rows written
+    """
+    if fmt is None:
+        fmt = FORMATS.get(Path(target).suffix.lower())
+    writers = {"csv": write_csv, "jsonl": write_jsonl, "parquet": write_parquet}
+    if fmt not in writers:
+        raise ValueError(
+            f"unknown export format for {target}, use one of {list(writers)}"
+        )
+    return writers[fmt](rows, target, **kwargs)
@@ -0,0 +1,281 @@
+"""
+Instrumentation hooks for the HTTP calls the clients make
+
+Pass hooks to FreeAgent or AsyncFreeAgent, each one has before_request called
+as a request starts and after_request once it has been answered and decoded,
+with a RequestEvent describing it.  MetricsCollector keeps counters and latency
+histograms in process and can render them for Prometheus, StatsdExporter sends
+each event to a StatsD server.
+"""
+
+from dataclasses import dataclass, field
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+import re
+import socket
+
+# latency histogram bucket upper bounds in seconds, +Inf is added
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_name(endpoint: str) -> str:
+    """
+    Get the name an endpoint is counted under, with IDs in the path replaced so
+    every explanation update is counted together
+
+    :param endpoint: end part of the endpoint URL, or a complete url
+
+    :return: endpoint with numeric path segments replaced by :id
+    """
+    return _ID_SEGMENT.sub("/:id", endpoint.split("?", 1)[0])
+
+
+@dataclass
+class RequestEvent:  # pylint: disable=too-many-instance-attributes
+    """
+    dataclass for one HTTP call, filled in as it progresses
+    """
+
+    method: str
+    endpoint: str  # from endpoint_name
+    page: Optional[int] = None  # page number for paginated gets
+    status: Optional[int] = None  # status of the final response
+    latency: float = 0.0  # seconds from the first attempt to the final response
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    retries: int = 0  # attempts after the first
+    decode_time: float = 0.0  # seconds spent decoding JSON
+    cached: bool = False  # answered from the cache without a request
+    error: Optional[str] = None  # set if the request failed without a response
+    started: float = field(default_factory=perf_counter)
+
+
+class Hook:
+    """
+    Base class for instrumentation hooks, override either method
+    """
+
+    def before_request(self, event: RequestEvent):
+        """
+        Called as a request starts, only method, endpoint and page are set
+
+        :param event: the RequestEvent
+        """
+
+    def after_request(self, event: RequestEvent):
+        """
+        Called once a request has finished, successfully or not
+
+        :param event: the completed RequestEvent
+        """
+
+
+@dataclass
+class EndpointStats:  # pylint: disable=too-many-instance-attributes
+    """
+    dataclass for the totals of one method and endpoint
+    """
+
+    requests: int = 0
+    errors: int = 0  # failed connections and 4xx or 5xx responses
+    cached: int = 0
+    retries: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    latency_sum: float = 0.0
+    decode_sum: float = 0.0
+    statuses: Dict[int, int] = field(default_factory=dict)
+    buckets: List[int] = field(default_factory=list)  # count per bucket, +Inf last
+
+
+class MetricsCollector(Hook):
+    """
+    Keep per endpoint counters and latency histograms in memory
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize the collector
+
+        :param buckets: latency histogram bucket upper bounds in seconds
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._stats = {}
+        self._lock = Lock()
+
+    def after_request(self, event: RequestEvent):
+        with self._lock:
+            stats = self._stats.get((event.method, event.endpoint))
+            if stats is None:
+                stats = EndpointStats(buckets=[0] * (len(self.buckets) + 1))
+                self._stats[(event.method, event.endpoint)] = stats
+            stats.requests += 1
+            if event.cached:
+                stats.cached += 1
+            if event.error is not None or (event.status or 0) >= 400:
+                stats.errors += 1
+            if event.status is not None:
+                stats.statuses[event.status] = stats.statuses.get(event.status, 0) + 1
+            stats.retries += event.retries
+            stats.bytes_sent += event.bytes_sent
+            stats.bytes_received += event.bytes_received
+            stats.latency_sum += event.latency
+            stats.decode_sum += event.decode_time
+            for index, bound in enumerate(self.buckets):
+                if event.latency <= bound:
+                    stats.buckets[index] += 1
+                    break
+            else:
+                stats.buckets[-1] += 1
+
+    def stats(self) -> Dict[Tuple[str, str], EndpointStats]:
+        """
+        Get a copy of the totals
+
+        :return: dict of (method, endpoint) to EndpointStats
+        """
+        with self._lock:
+            return {
+                key: EndpointStats(
+                    **{
+                        **vars(stats),
+                        "statuses": dict(stats.statuses),
+                        "buckets": list(stats.buckets),
+                    }
+                )
+                for key, stats in self._stats.items()
+            }
+
+    def reset(self):
+        """
+        Clear every total
+        """
+        with self._lock:
+            self._stats.clear()
+
+    def prometheus(self, prefix: str = "freeagent") -> str:
+        """
+        Render the totals in the Prometheus text exposition format
+
+        :param prefix: start of every metric name
+
+        :return: text for a /metrics endpoint
+        """
+        counters = {
+            "retries": ("retries", "Requests sent again after a failure"),
+            "cached": ("cache_hits", "Requests answered from the cache"),
+            "errors": ("errors", "Failed requests"),
+            "bytes_sent": ("bytes_sent", "Request body bytes"),
+            "bytes_received": ("bytes_received", "Response body bytes"),
+            "decode_sum": ("json_decode_seconds", "Seconds spent decoding JSON"),
+        }
+        stats = sorted(self.stats().items())
+        lines = [
+            f"# HELP {prefix}_requests_total Requests by final status",
+            f"# TYPE {prefix}_requests_total counter",
+        ]
+        for (method, endpoint), totals in stats:
+            labels = f'method="{method}",endpoint="{endpoint}"'
+            for status, count in sorted(totals.statuses.items()):
+                lines.append(
+                    f'{prefix}_requests_total{{{labels},status="{status}"}} {count}'
+                )
+        for attr, (name, text) in counters.items():
+            lines += [
+                f"# HELP {prefix}_{name}_total {text}",
+                f"# TYPE {prefix}_{name}_total counter",
+            ]
+            for (method, endpoint), totals in stats:
+                labels = f'method="{method}",endpoint="{endpoint}"'
+                lines.append(
+                    f"{prefix}_{name}_total{{{labels}}} {getattr(totals, attr)}"
+                )
+
+        lines += self._histogram(f"{prefix}_request_duration_seconds", stats)
+        return "\n".join(lines) + "\n"
+
+    def _histogram(self, name: str, stats: list) -> List[str]:
+        """
+        :param name: metric name of the latency histogram
+        :param stats: sorted list of ((method, endpoint), EndpointStats)
+
+        :return: exposition lines for the histogram
+        """
+        lines = [
+            f"# HELP {name} Request latency including retries",
+            f"# TYPE {name} histogram",
+        ]
+        for (method, endpoint), totals in stats:
+            labels = f'method="{method}",endpoint="{endpoint}"'
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), totals.buckets):
+                running += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {running}')
+            lines.append(f"{name}_sum{{{labels}}} {totals.latency_sum}")
+            lines.append(f"{name}_count{{{labels}}} {totals.requests}")
+        return lines
+
+
+class StatsdExporter(Hook):
+    """
+    Send each request to a StatsD server as counters and timers over UDP
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 8125,
+        prefix: str = "freeagent",
+        send: Callable[[bytes], None] = None,
+    ):
+        """
+        Initialize the exporter
+
+        :param host: StatsD server host
+        :param port: StatsD server port
+        :param prefix: start of every metric name
+        :param send: function to send a packet, defaults to a UDP socket
+        """
+        self.address = (host, port)
+        self.prefix = prefix
+        self._send = send
+        self._socket = None
+
+    def send(self, packet: bytes):
+        """
+        Send a packet, dropping it if the server cannot be reached
+
+        :param packet: StatsD lines separated by newlines
+        """
+        if self._send is not None:
+            self._send(packet)
+            return
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self._socket.sendto(packet, self.address)
+        except OSError:
+            pass  # metrics must never stop a job
+
+    def after_request(self, event: RequestEvent):
+        name = re.sub(r"[^A-Za-z0-9_.]", "_", event.endpoint.replace("/", "."))
+        base = f"{self.prefix}.{event.method.lower()}.{name.strip('.')}"
+        lines = [
+            f"{base}.requests:1|c",
+            f"{base}.latency:{event.latency * 1000:.3f}|ms",
+            f"{base}.decode:{event.decode_time * 1000:.3f}|ms",
+            f"{base}.bytes_sent:{event.bytes_sent}|c",
+            f"{base}.bytes_received:{event.bytes_received}|c",
+        ]
+        if event.status is not None:
+            lines.append(f"{base}.status.{event.status}:1|c")
+        if event.retries:
+            lines.append(f"{base}.retries:{event.retries}|c")
+        if event.cached:
+            lines.append(f"{base}.cache_hits:1|c")
+        if event.error is not None:
+            lines.append(f"{base}.errors:1|c")
+        self.send("\n".join(lines).encode())
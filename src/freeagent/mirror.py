@@ -0,0 +1,386 @@
+"""
+Local SQLite mirror of freeagent records, for questions answered without the API
+
+Bank accounts, bank transactions, explanations, categories and accounting
+transactions are kept in one table with the columns queries filter on pulled
+out and indexed.  The mirror is a SyncStore, so IncrementalSync can keep it up
+to date, or records can be bulk loaded with load.
+"""
+
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+import json
+import sqlite3
+
+from .accounts import get_account_id
+from .payload import to_pennies
+from .sync import SyncStore, Watermark
+
+AMOUNT_FIELDS = ("amount", "gross_value", "debit_value", "current_balance")
+BATCH_SIZE = 10_000  # rows per executemany call when loading
+
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
+Amount = Union[Decimal, str, int, float]
+
+
+def _kind(feed: str) -> str:
+    """
+    :param feed: feed key from cache_key
+
+    :return: kind of record in the feed, the last part of its endpoint
+    """
+    return feed.split("?", 1)[0].rsplit("/", 1)[-1]
+
+
+def _pennies(value: Any) -> Optional[int]:
+    return None if value in (None, "") else to_pennies(str(value))
+
+
+def _row(company: str, kind: str, record: Dict[str, Any]) -> tuple:
+    """
+    Pull the indexed columns out of a record
+
+    :param company: company the record belongs to
+    :param kind: kind of record, for example bank_transactions
+    :param record: freeagent record dict
+
+    :return: tuple of values for the records table
+    """
+    url = record["url"]
+    account = record.get("bank_account")
+    if kind == "bank_accounts":
+        account = url
+    amount = None
+    for name in AMOUNT_FIELDS:
+        amount = record.get(name)
+        if amount is not None:
+            break
+    return (
+        company,
+        kind,
+        url,
+        account.rsplit("/", 1)[-1] if account else None,
+        record.get("dated_on"),
+        None if record.get("nominal_code") is None else str(record["nominal_code"]),
+        record.get("category"),
+        _pennies(amount),
+        _pennies(record.get("unexplained_amount")),
+        record.get("updated_at"),
+        _encode(record),
+    )
+
+
+def _chunks(rows: Iterable[tuple]) -> Iterator[List[tuple]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= BATCH_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class SQLiteMirror(SyncStore):
+    """
+    Records mirrored in an SQLite file
+
+    Records are kept once per company, kind and url, feeds list which records
+    they returned so a full sync can remove deleted ones.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the mirror, creating the file if needed
+
+        :param path: pathlike location of the SQLite file, or ":memory:"
+        """
+        self.path = path if path == ":memory:" else Path(path)
+        self._lock = Lock()
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute("PRAGMA cache_size = -65536")  # 64MB, keeps loads fast
+        with self._db:
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS records (
+                    company TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    account TEXT,
+                    dated_on TEXT,
+                    nominal_code TEXT,
+                    category TEXT,
+                    amount INTEGER,
+                    unexplained INTEGER,
+                    updated_at TEXT,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (company, kind, url)
+                );
+                CREATE INDEX IF NOT EXISTS records_account
+                    ON records (company, kind, account, dated_on);
+                CREATE INDEX IF NOT EXISTS records_date
+                    ON records (company, kind, dated_on);
+                CREATE INDEX IF NOT EXISTS records_nominal_code
+                    ON records (company, kind, nominal_code, dated_on);
+                CREATE INDEX IF NOT EXISTS records_amount
+                    ON records (company, kind, amount);
+                CREATE TABLE IF NOT EXISTS feed_records (
+                    company TEXT NOT NULL,
+                    feed TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    PRIMARY KEY (company, feed, url)
+                );
+                CREATE TABLE IF NOT EXISTS watermarks (
+                    company TEXT NOT NULL,
+                    feed TEXT NOT NULL,
+                    updated_since TEXT,
+                    full_at REAL NOT NULL,
+                    PRIMARY KEY (company, feed)
+                );
+                """)
+
+    def close(self):
+        """
+        Close the database
+        """
+        self._db.close()
+
+    def load(
+        self, kind: str, records: Iterable[Dict[str, Any]], company: str = ""
+    ) -> int:
+        """
+        Bulk insert records, replacing stored ones with the same url, in one
+        transaction
+
+        :param kind: kind of record, for example bank_transactions
+        :param records: iterable of freeagent record dicts, read as they are loaded
+        :param company: company the records belong to
+
+        :return: number of records loaded
+        """
+        with self._lock, self._db:
+            return self._insert(kind, records, company)
+
+    def _insert(
+        self, kind: str, records: Iterable[Dict[str, Any]], company: str
+    ) -> int:
+        """
+        Insert records, the caller holds the lock and the transaction
+
+        :param kind: kind of record, for example bank_transactions
+        :param records: iterable of freeagent record dicts
+        :param company: company the records belong to
+
+        :return: number of records inserted
+        """
+        count = 0
+        for chunk in _chunks(_row(company, kind, r) for r in records):
+            self._db.executemany(
+                "INSERT OR REPLACE INTO records"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                chunk,
+            )
+            count += len(chunk)
+        return count
+
+    def load_categories(self, categories: dict, company: str = "") -> int:
+        """
+        Bulk insert categories as returned by the categories endpoint
+
+        :param categories: dict of category group to list of categories
+        :param company: company the categories belong to
+
+        :return: number of categories loaded
+        """
+        return self.load(
+            "categories",
+            (
+                cat
+                for cats in categories.values()
+                if isinstance(cats, list)
+                for cat in cats
+            ),
+            company,
+        )
+
+    def watermark(self, company: str, feed: str) -> Watermark:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT updated_since, full_at FROM watermarks"
+                " WHERE company = ? AND feed = ?",
+                (company, feed),
+            ).fetchone()
+        return Watermark(*row) if row else Watermark()
+
+    def set_watermark(self, company: str, feed: str, watermark: Watermark):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?)",
+                (company, feed, watermark.updated_since, watermark.full_at),
+            )
+
+    def upsert(self, company: str, feed: str, records: List[Dict[str, Any]]):
+        """
+        Store records and list them under the feed, in one transaction so the
+        records and feed_records tables never disagree
+
+        :param company: company the feed belongs to
+        :param feed: feed key from cache_key
+        :param records: list of freeagent record dicts
+        """
+        with self._lock, self._db:
+            self._insert(_kind(feed), records, company)
+            for chunk in _chunks((company, feed, r["url"]) for r in records):
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO feed_records VALUES (?, ?, ?)", chunk
+                )
+
+    def prune(self, company: str, feed: str, keep: Iterable[str]) -> int:
+        """
+        Remove the records of a feed that are not in keep from the feed, and
+        delete those no other feed of the company still lists
+
+        :param company: company the feed belongs to
+        :param feed: feed key from cache_key
+        :param keep: urls of the records still on freeagent
+
+        :return: number of records removed from the feed
+        """
+        keep = set(keep)
+        with self._lock, self._db:
+            urls = [
+                url
+                for (url,) in self._db.execute(
+                    "SELECT url FROM feed_records WHERE company = ? AND feed = ?",
+                    (company, feed),
+                )
+                if url not in keep
+            ]
+            doomed = [(company, feed, url) for url in urls]
+            self._db.executemany(
+                "DELETE FROM feed_records WHERE company = ? AND feed = ? AND url = ?",
+                doomed,
+            )
+            # records also returned by another feed are still on freeagent
+            self._db.executemany(
+                "DELETE FROM records WHERE company = ? AND kind = ? AND url = ?"
+                " AND NOT EXISTS (SELECT 1 FROM feed_records f"
+                " WHERE f.company = records.company AND f.url = records.url)",
+                [(company, _kind(feed), url) for url in urls],
+            )
+        return len(urls)
+
+    def records(self, company: str, feed: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT r.data FROM feed_records f JOIN records r"
+                " ON r.company = f.company AND r.kind = ? AND r.url = f.url"
+                " WHERE f.company = ? AND f.feed = ? ORDER BY r.dated_on, r.url",
+                (_kind(feed), company, feed),
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    @staticmethod
+    def _where(  # pylint: disable=too-many-arguments
+        kind: str,
+        *,
+        company: str = "",
+        account: str = None,
+        start: Union[date, str] = None,
+        end: Union[date, str] = None,
+        nominal_code: str = None,
+        min_amount: Amount = None,
+        max_amount: Amount = None,
+        min_size: Amount = None,
+        unexplained: bool = None,
+    ):
+        """
+        Build the WHERE clause for query and total, see query for the parameters
+
+        :return: tuple of the SQL condition and its parameters
+        """
+        terms = ["company = ?", "kind = ?"]
+        params = [company, kind]
+        for term, value in (
+            ("account = ?", account and get_account_id({"url": str(account)})),
+            ("dated_on >= ?", start and str(start)),
+            ("dated_on <= ?", end and str(end)),
+            ("nominal_code = ?", None if nominal_code is None else str(nominal_code)),
+            ("amount >= ?", _pennies(min_amount)),
+            ("amount <= ?", _pennies(max_amount)),
+            ("ABS(amount) >= ?", _pennies(min_size)),
+        ):
+            if value is not None:
+                terms.append(term)
+                params.append(value)
+        if unexplained is not None:
+            terms.append("unexplained != 0" if unexplained else "unexplained = 0")
+        return " AND ".join(terms), params
+
+    def query(self, kind: str, limit: int = None, **filters) -> List[Dict[str, Any]]:
+        """
+        Find mirrored records, every filter given must match
+
+        :param kind: kind of record, bank_accounts, bank_transactions,
+            bank_transaction_explanations, categories or transactions
+        :param limit: most records to return
+        :param company: company the records belong to
+        :param account: bank account ID or url
+        :param start: first date to include, YYYY-MM-DD or date
+        :param end: last date to include, YYYY-MM-DD or date
+        :param nominal_code: nominal code of the records
+        :param min_amount: smallest amount to include
+        :param max_amount: largest amount to include
+        :param min_size: smallest amount to include ignoring the sign
+        :param unexplained: True for bank transactions with an unexplained amount,
+            False for explained ones
+
+        :return: list of record dicts, by date
+        """
+        where, params = self._where(kind, **filters)
+        sql = f"SELECT data FROM records WHERE {where} ORDER BY dated_on, url"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def total(self, kind: str, **filters) -> Decimal:
+        """
+        Add up the amounts of mirrored records, takes the filters of query
+
+        :param kind: kind of record
+        :return: total amount
+        """
+        where, params = self._where(kind, **filters)
+        with self._lock:
+            (total,) = self._db.execute(
+                f"SELECT COALESCE(SUM(amount), 0) FROM records WHERE {where}", params
+            ).fetchone()
+        return Decimal(total).scaleb(-2)
+
+    def unexplained_transactions(
+        self, account: str, company: str = "", **filters
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the mirrored bank transactions of an account still to be explained,
+        takes the filters of query
+
+        :param account: bank account ID or url
+        :param company: company the records belong to
+
+        :return: list of bank transaction dicts, by date
+        """
+        return self.query(
+            "bank_transactions",
+            company=company,
+            account=account,
+            unexplained=True,
+            **filters,
+        )
@@ -2,10 +2,52 @@
 ExplanationPayload dataclass used by this module
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import date, datetime
 from decimal import Decimal
-from typing import Optional, Dict, List
+from functools import lru_cache
+from typing import Any, Optional, Dict, List, Union
+
+
+@lru_cache(maxsize=8192)
+def parse_date(value: str) -> date:
+    """
+    Parse a YYYY-MM-DD date, remembering recent values as most rows share a few
+    thousand dates
+
+    :param value: ISO date string
+
+    :return: date object
+    """
+    return date.fromisoformat(value)
+
+
+def parse_datetime(value: str) -> datetime:
+    """
+    Parse an ISO timestamp as sent by freeagent
+
+    :param value: ISO timestamp string
+
+    :return: datetime object
+    """
+    return datetime.fromisoformat(value)
+
+
+def to_pennies(value: Union[str, Decimal]) -> int:
+    """
+    Convert an amount to whole pennies
+
+    :param value: amount as a string or Decimal
+
+    :return: amount in pennies, rounded half to even
+    """
+    if isinstance(value, str):
+        # freeagent sends two decimal places, skip Decimal for those
+        whole, _dot, fraction = value.partition(".")
+        digits = whole[1:] if whole[:1] == "-" else whole
+        if len(fraction) == 2 and fraction.isdecimal() and digits.isdecimal():
+            return int(whole + fraction)
+    return int(Decimal(value).scaleb(2).to_integral_value())
 
 
 @dataclass
@@ -40,3 +82,58 @@ class ExplanationPayload:
     bank_transaction: Optional[str] = None  # Required for new explanations
     attachment: Optional[Dict] = None
     transfer_bank_account: Optional[str] = None
+
+
+@dataclass
+class ExplanationResult:
+    """
+    dataclass for the outcome of one explanation in a bulk submission
+    """
+
+    index: int  # position of the payload in the submitted list
+    status: str  # "ok", "failed", "retryable" or "dryrun"
+    data: Optional[Dict[str, Any]] = None  # serialized payload
+    url: Optional[str] = None  # explanation url, for updates
+    response: Optional[Dict[str, Any]] = None  # decoded response from freeagent
+    status_code: Optional[int] = None
+    error: Optional[str] = None  # response body or error message
+
+
+@dataclass
+class ExplanationReport:
+    """
+    dataclass for the per-item results of a bulk submission, in submission order
+    """
+
+    results: List[ExplanationResult] = field(default_factory=list)
+
+    def _with_status(self, status: str) -> List[ExplanationResult]:
+        return [result for result in self.results if result.status == status]
+
+    @property
+    def succeeded(self) -> List[ExplanationResult]:
+        """
+        results that were accepted by freeagent
+        """
+        return self._with_status("ok")
+
+    @property
+    def failed(self) -> List[ExplanationResult]:
+        """
+        results freeagent rejected, sending them again will fail the same way
+        """
+        return self._with_status("failed")
+
+    @property
+    def retryable(self) -> List[ExplanationResult]:
+        """
+        results that failed with rate limit, server or connection errors
+        """
+        return self._with_status("retryable")
+
+    @property
+    def ok(self) -> bool:
+        """
+        True if nothing failed
+        """
+        return not self.failed and not self.retryable
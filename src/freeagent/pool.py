@@ -0,0 +1,344 @@
+"""
+Clients for many freeagent companies sharing one connection pool
+
+An accountancy running the same job for every client company registers each
+company's token with a ClientPool and asks it for a client per company.  The
+clients are FreeAgent instances with the usual bank, category and transaction
+sub-APIs, but they send through one requests session whose connection pool is
+capped, so a fan-out over hundreds of companies never holds more than
+max_connections sockets.  Each company keeps its own rate limits, as freeagent
+counts requests per company, and can also share a scheduler that limits the
+total.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from .auth import (
+    TokenAuth,
+    TokenManager,
+    load_token,
+    refresh_request,
+    refreshed_token,
+)
+from .cache import PrefixedCache, ResponseCache
+from .client import FreeAgent
+from .metrics import Hook
+from .scheduler import RequestScheduler
+
+
+class TenantScheduler:
+    """
+    Scheduler for one company, waits for its own limits and for the limits
+    shared by every company in the pool
+    """
+
+    def __init__(self, tenant: RequestScheduler, shared: RequestScheduler = None):
+        """
+        Initialize the scheduler
+
+        :param tenant: RequestScheduler for the company's own limits, its retry
+            settings are used
+        :param shared: RequestScheduler limiting every company together, or None
+        """
+        self.tenant = tenant
+        self.shared = shared
+        self.max_retries = tenant.max_retries
+
+    def reserve(self) -> float:
+        """
+        Reserve a slot for one request with both schedulers
+
+        :return: seconds to wait before sending the request
+        """
+        wait = self.tenant.reserve()
+        if self.shared is not None:
+            wait = max(wait, self.shared.reserve())
+        return wait
+
+    def record(self, status_code: int, headers) -> float:
+        """
+        Update the company's scheduler from a response, rate limits from
+        freeagent only apply to the company that got them
+
+        :return: seconds the server asked to wait before retrying, or None
+        """
+        return self.tenant.record(status_code, headers)
+
+    def record_error(self):
+        """
+        Update the company's scheduler after a connection error
+        """
+        self.tenant.record_error()
+
+    def retry_delay(self, attempt: int, retry_after: float = None) -> float:
+        """
+        Get the delay before retrying a failed request, see RequestScheduler
+        """
+        return self.tenant.retry_delay(attempt, retry_after)
+
+    def should_retry(self, status_code: int, method: str = "GET") -> bool:
+        """
+        Check if a response status is worth retrying, see RequestScheduler
+        """
+        return self.tenant.should_retry(status_code, method)
+
+
+class TenantSession:  # pylint: disable=too-few-public-methods
+    """
+    Send requests for one company through the pool's session with its token
+
+    Stands in for the session authenticate would build, without a connection
+    pool of its own.  The token is kept fresh by a TokenManager, see
+    freeagent.auth.
+    """
+
+    def __init__(self, pool: "ClientPool", tenant: str, tokens: TokenManager):
+        """
+        Initialize the session
+
+        :param pool: ClientPool that sends the requests
+        :param tenant: name of the company
+        :param tokens: TokenManager holding the company's token
+        """
+        self.pool = pool
+        self.tenant = tenant
+        self.tokens = tokens
+        self.auth = TokenAuth(tokens)
+        self.headers = {}
+
+    def request(self, method: str, url: str, headers: dict = None, **kwargs):
+        """
+        Send a request with the company's token
+
+        :param method: HTTP method to use
+        :param url: complete url for the request
+        :param headers: extra headers for the request, or None
+
+        :return: the response
+        """
+        return self.pool.session.request(
+            method,
+            url,
+            headers={**self.headers, **(headers or {})},
+            auth=self.auth,
+            **kwargs,
+        )
+
+
+class ClientPool:  # pylint: disable=too-many-instance-attributes
+    """
+    FreeAgent clients for many companies, sharing connections, a response cache
+    and optionally a scheduler
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        oauth_ident: str,
+        oauth_secret: str,
+        *,
+        api_base_url: str = "https://api.freeagent.com/v2/",
+        max_connections: int = 32,
+        max_workers: int = 4,
+        per_minute: int = 120,
+        per_hour: int = 3600,
+        shared_scheduler: RequestScheduler = None,
+        cache: ResponseCache = None,
+        hooks: Iterable[Hook] = None,
+        adapter: BaseAdapter = None,
+    ):
+        """
+        Initialize the pool
+
+        :param oauth_ident: oauth identifier from the freeagent dev dashboard
+        :param oauth_secret: oauth secret from the freeagent dev dashboard
+        :param api_base_url: the url to use for requests, defaults to normal but can be
+            changed to sandbox
+        :param max_connections: most connections open at once, requests beyond
+            this wait for a free connection
+        :param max_workers: default number of pages each client's get_api fetches
+            at the same time
+        :param per_minute: requests allowed per minute for each company
+        :param per_hour: requests allowed per hour for each company
+        :param shared_scheduler: RequestScheduler limiting every company together,
+            or None for no shared limit
+        :param cache: ResponseCache shared by every company with keys kept apart,
+            for example an LRUCache, defaults to None for no caching
+        :param hooks: instrumentation hooks called for every request of every
+            company, see freeagent.metrics
+        :param adapter: requests transport adapter, defaults to an HTTPAdapter
+            sized for max_connections, used for testing
+        """
+        self.api_base_url = api_base_url
+        self.max_workers = max_workers
+        self.per_minute = per_minute
+        self.per_hour = per_hour
+        self.shared_scheduler = shared_scheduler
+        self.cache = None if cache is False else cache  # an empty cache is falsy
+        self.hooks = list(hooks or [])
+        self._oauth = {"client_id": oauth_ident, "client_secret": oauth_secret}
+
+        self.session = requests.Session()
+        self.session.headers.update(
+            {
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+            }
+        )
+        if adapter is None:
+            # pool_block holds requests until a connection is free instead of
+            # opening more sockets
+            adapter = HTTPAdapter(
+                pool_connections=4, pool_maxsize=max_connections, pool_block=True
+            )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._sessions = {}
+        self._clients = {}
+        self._lock = Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Close every connection
+        """
+        self.session.close()
+
+    @property
+    def tenants(self) -> List[str]:
+        """
+        names of the companies in the pool, in the order they were added
+        """
+        with self._lock:
+            return list(self._sessions)
+
+    def add_tenant(
+        self, tenant: str, token: dict = None, save_token_cb=None, token_store=None
+    ):
+        """
+        Add a company, or replace its token
+
+        :param tenant: name of the company, used to keep its cached pages apart
+        :param token: oauth token for the company, from FreeAgent.authenticate,
+            defaults to the one in token_store
+        :param save_token_cb: function to call with the new token when it is
+            refreshed, or None
+        :param token_store: path of a json file holding the company's token, or
+            a FileTokenStore, shared with other processes so only one of them
+            refreshes it
+
+        :raises ValueError: if there is no token, given or in token_store
+        """
+        token, token_store = load_token(token, token_store)
+        if token is None:
+            raise ValueError(
+                f"Need a token for {tenant!r}, or a token_store holding one"
+            )
+        with self._lock:
+            session = self._sessions.get(tenant)
+            if session is None:
+                tokens = TokenManager(
+                    token,
+                    self.refresh_token,
+                    store=token_store,
+                    save_token_cb=save_token_cb,
+                )
+                self._sessions[tenant] = TenantSession(self, tenant, tokens)
+            else:
+                if token_store is not None:
+                    session.tokens.store = token_store
+                session.tokens.save_token_cb = save_token_cb
+                session.tokens.set_token(token)
+
+    def remove_tenant(self, tenant: str):
+        """
+        Remove a company and its cached pages
+
+        :param tenant: name of the company
+        """
+        with self._lock:
+            self._sessions.pop(tenant, None)
+            self._clients.pop(tenant, None)
+        if self.cache is not None:
+            PrefixedCache(self.cache, tenant).invalidate()
+
+    def client(self, tenant: str) -> FreeAgent:
+        """
+        Get the client for a company, built the first time it is asked for
+
+        :param tenant: name of the company
+
+        :return: FreeAgent client sending through the pool
+        :raises KeyError: if the company has not been added
+        """
+        with self._lock:
+            client = self._clients.get(tenant)
+            if client is not None:
+                return client
+            session = self._sessions[tenant]
+            client = FreeAgent(
+                self.api_base_url,
+                self.max_workers,
+                TenantScheduler(
+                    RequestScheduler(self.per_minute, self.per_hour),
+                    self.shared_scheduler,
+                ),
+                None if self.cache is None else PrefixedCache(self.cache, tenant),
+                self.hooks,
+            )
+            client.session = session
+            self._clients[tenant] = client
+            return client
+
+    def refresh_token(self, token: dict) -> dict:
+        """
+        Get a new access token with a refresh token
+
+        :param token: the expired token
+
+        :return: the new token, with expires_at set
+        """
+        response = self.session.post(
+            **refresh_request(self.api_base_url, token, self._oauth)
+        )
+        response.raise_for_status()
+        return refreshed_token(token, response.json())
+
+    def map(
+        self,
+        job: Callable[[FreeAgent], Any],
+        tenants: Iterable[str] = None,
+        max_workers: int = 8,
+    ) -> Dict[str, Any]:
+        """
+        Run a job for many companies at the same time
+
+        A failure does not stop the others, its exception is returned as the
+        company's result.
+
+        :param job: function called with each company's client
+        :param tenants: names of the companies, defaults to every company
+        :param max_workers: number of companies to run at the same time
+
+        :return: dict of company name to the job's result or exception, in order
+        """
+        tenants = self.tenants if tenants is None else list(tenants)
+
+        def run(tenant):
+            try:
+                return job(self.client(tenant))
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                return err
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            return dict(zip(tenants, pool.map(run, tenants)))
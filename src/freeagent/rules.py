@@ -0,0 +1,310 @@
+"""
+Rules for explaining bank transactions automatically
+
+The rules are compiled once into a RuleSet.  Substring rules share one
+Aho-Corasick automaton, so a description is scanned once whatever the number
+of rules.  Regex rules share one combined pattern that rules out most
+descriptions in a single search, the separate patterns only run on the rest.
+Patterns that cannot be combined, those with inline flags such as (?i), numbered
+backreferences or a named group another pattern already uses, are always run
+on their own.
+The first rule in list order that matches wins, as if each rule had been tried
+in turn.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
+import re
+
+from .payload import ExplanationPayload, parse_date, to_pennies
+
+# a numbered backreference such as \1, not an escaped backslash followed by 1,
+# it would refer to another pattern's group once the patterns are combined
+_BACKREFERENCE = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]")
+
+
+@dataclass
+class Rule:  # pylint: disable=too-many-instance-attributes
+    """
+    dataclass for a rule choosing the category of matching bank transactions
+
+    Every condition given must match, a rule without conditions matches anything.
+    """
+
+    category: str  # category url, nominal code or text found in its description
+    contains: Union[str, Sequence[str], None] = None  # any of these, not case sensitive
+    pattern: Optional[str] = None  # regex searched for, not case sensitive
+    min_amount: Union[Decimal, str, None] = None
+    max_amount: Union[Decimal, str, None] = None
+    start: Optional[str] = None  # first date, YYYY-MM-DD
+    end: Optional[str] = None  # last date, YYYY-MM-DD
+    predicate: Optional[Callable[[Dict[str, Any]], bool]] = None  # extra test
+    description: Optional[str] = None  # for the explanation, default the bank's
+    transfer_bank_account: Optional[str] = None
+
+
+@dataclass
+class Match:
+    """
+    dataclass for a bank transaction a rule matched
+    """
+
+    transaction: Dict[str, Any]  # bank transaction dict from freeagent
+    rule: Rule
+    payload: ExplanationPayload
+
+
+class KeywordAutomaton:  # pylint: disable=too-few-public-methods
+    """
+    Aho-Corasick automaton finding every keyword in a text in one pass
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable[int]]):
+        """
+        Build the automaton
+
+        :param keywords: dict of lowercased keyword to the rule numbers it belongs to
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [set()]
+        for keyword, rules in keywords.items():
+            state = 0
+            for char in keyword:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(set())
+                state = nxt
+            self._out[state].update(rules)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+        self._out = [frozenset(out) for out in self._out]
+
+    def search(self, text: str) -> set:
+        """
+        Find the rules with a keyword in text
+
+        :param text: lowercased text to search
+
+        :return: set of rule numbers
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+
+class RuleSet:  # pylint: disable=too-many-instance-attributes
+    """
+    Rules compiled for classifying many bank transactions
+    """
+
+    def __init__(self, rules: Sequence[Rule], categories):
+        """
+        Compile the rules and resolve their categories
+
+        :param rules: list of Rule, earlier rules win
+        :param categories: CategoryIndex to resolve the rule categories with
+
+        :raises ValueError: if a rule category cannot be found
+        """
+        self.rules = list(rules)
+        self.urls = [self._resolve(rule.category, categories) for rule in self.rules]
+
+        keywords = {}
+        patterns = []
+        self._always = set()
+        self._needs = []
+        for number, rule in enumerate(self.rules):
+            needs = 0
+            if rule.contains:
+                words = (
+                    [rule.contains] if isinstance(rule.contains, str) else rule.contains
+                )
+                for word in words:
+                    keywords.setdefault(word.lower(), set()).add(number)
+                needs |= 1
+            if rule.pattern:
+                patterns.append(
+                    (number, re.compile(rule.pattern, re.IGNORECASE | re.DOTALL))
+                )
+                needs |= 2
+            if not needs:
+                self._always.add(number)
+            self._needs.append(needs)
+        self._limits = [
+            (
+                None if rule.min_amount is None else to_pennies(rule.min_amount),
+                None if rule.max_amount is None else to_pennies(rule.max_amount),
+                None if rule.start is None else str(rule.start),
+                None if rule.end is None else str(rule.end),
+            )
+            for rule in self.rules
+        ]
+        self._keywords = KeywordAutomaton(keywords)
+        self._patterns = patterns
+        self._separate = []
+        combined = []
+        names = set()
+        for number, pattern in patterns:
+            wrapped = f"(?:{pattern.pattern})"
+            try:
+                # inline global flags are only allowed at the very start
+                re.compile(wrapped)
+            except re.error:
+                self._separate.append((number, pattern))
+                continue
+            if (
+                names & pattern.groupindex.keys()  # duplicate group names fail
+                or _BACKREFERENCE.search(pattern.pattern)
+            ):
+                self._separate.append((number, pattern))
+                continue
+            names.update(pattern.groupindex)
+            combined.append(wrapped)
+        self._any_pattern = (
+            re.compile("|".join(combined), re.IGNORECASE | re.DOTALL)
+            if combined
+            else None
+        )
+
+    @staticmethod
+    def _resolve(category: str, categories) -> str:
+        """
+        :param category: category url, nominal code or text found in its description
+        :param categories: CategoryIndex to search
+
+        :return: url of the category
+        """
+        if category.startswith(("http://", "https://")):
+            return category
+        found = categories.by_nominal_code.get(str(category)) or categories.find(
+            category
+        )
+        if found is None:
+            raise ValueError(f"no category found for rule category {category!r}")
+        return found["url"]
+
+    def _text_matches(self, description: str) -> set:
+        """
+        :param description: bank transaction description
+
+        :return: set of rule numbers whose text conditions all match
+        """
+        hits = {}
+        for number in self._keywords.search(description.lower()):
+            hits[number] = 1
+        patterns = self._separate
+        if self._any_pattern is not None and self._any_pattern.search(description):
+            patterns = self._patterns
+        for number, pattern in patterns:
+            if pattern.search(description):
+                hits[number] = hits.get(number, 0) | 2
+        matched = {n for n, got in hits.items() if got == self._needs[n]}
+        return matched | self._always
+
+    def match(self, transaction: Dict[str, Any]) -> Optional[int]:
+        """
+        Find the first rule matching a bank transaction
+
+        :param transaction: bank transaction dict from freeagent
+
+        :return: rule number, or None if no rule matches
+        """
+        pennies = None
+        dated_on = transaction.get("dated_on", "")
+        for number in sorted(self._text_matches(transaction.get("description") or "")):
+            low, high, start, end = self._limits[number]
+            if low is not None or high is not None:
+                if pennies is None:
+                    pennies = to_pennies(transaction["amount"])
+                if (low is not None and pennies < low) or (
+                    high is not None and pennies > high
+                ):
+                    continue
+            if (start is not None and dated_on < start) or (
+                end is not None and dated_on > end
+            ):
+                continue
+            predicate = self.rules[number].predicate
+            if predicate is not None and not predicate(transaction):
+                continue
+            return number
+        return None
+
+    def _payload(self, transaction: Dict[str, Any], number: int) -> ExplanationPayload:
+        """
+        Build the explanation of a bank transaction for the rule it matched
+
+        :param transaction: bank transaction dict from freeagent
+        :param number: number of the matching rule
+
+        :return: ExplanationPayload for what is left unexplained
+        """
+        rule = self.rules[number]
+        # explain what is left, part of the amount may be explained already
+        unexplained = transaction.get("unexplained_amount", transaction["amount"])
+        return ExplanationPayload(
+            category=self.urls[number],
+            dated_on=parse_date(transaction["dated_on"]),
+            gross_value=Decimal(unexplained),
+            description=rule.description or transaction.get("description"),
+            bank_transaction=transaction["url"],
+            transfer_bank_account=rule.transfer_bank_account,
+        )
+
+    def classify(self, transactions: Iterable[Dict[str, Any]]) -> List[Match]:
+        """
+        Match bank transactions against the rules
+
+        :param transactions: iterable of bank transaction dicts, for example from
+            iter_unexplained_transactions
+
+        :return: list of Match for the transactions a rule matched, in order
+        """
+        matches = []
+        for transaction in transactions:
+            number = self.match(transaction)
+            if number is not None:
+                matches.append(
+                    Match(
+                        transaction,
+                        self.rules[number],
+                        self._payload(transaction, number),
+                    )
+                )
+        return matches
+
+    def payloads(
+        self, transactions: Iterable[Dict[str, Any]]
+    ) -> List[ExplanationPayload]:
+        """
+        Build the explanations for the bank transactions a rule matches, ready
+        for BankAPI.explain_transactions
+
+        :param transactions: iterable of bank transaction dicts
+
+        :return: list of ExplanationPayload
+        """
+        return [match.payload for match in self.classify(transactions)]
@@ -0,0 +1,204 @@
+"""
+Rate limit aware request scheduler shared by every request a client makes
+
+freeagent allows 120 requests per minute and 3600 per hour for each user,
+going over returns 429 with a Retry-After header.
+"""
+
+from email.utils import parsedate_to_datetime
+from random import uniform
+from threading import Lock
+from time import monotonic, time
+
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+# methods sent again after any retryable failure, a POST or PUT that may have
+# reached freeagent is only sent again on 429 or if it was never sent
+RETRY_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+
+class TokenBucket:  # pylint: disable=too-few-public-methods
+    """
+    Token bucket that hands out reservations, callers that find the bucket empty
+    are given increasing waits so they are spread out instead of all retrying at once
+    """
+
+    def __init__(self, capacity: int, period: float, clock=monotonic):
+        """
+        Initialize the bucket full
+
+        :param capacity: number of requests allowed in period
+        :param period: length of the period in seconds
+        :param clock: function returning the time in seconds
+        """
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+
+    def reserve(self, factor: float = 1.0) -> float:
+        """
+        Take a token from the bucket
+
+        :param factor: fraction of the normal refill rate to use
+
+        :return: seconds to wait before the token can be used
+        """
+        now = self.clock()
+        rate = self.rate * factor
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / rate
+
+
+class RequestScheduler:  # pylint: disable=too-many-instance-attributes
+    """
+    Decide when each request may be sent and when failed requests are retried
+
+    - a token bucket per freeagent limit (per minute and per hour)
+    - Retry-After and X-RateLimit-Remaining/Reset headers pause every request
+    - the send rate halves on each 429 and slowly recovers on success
+    - 429, 5xx and connection errors are retried with jittered exponential backoff
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        per_minute: int = 120,
+        per_hour: int = 3600,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+        max_backoff: float = 60.0,
+        clock=monotonic,
+    ):
+        """
+        Initialize the scheduler
+
+        :param per_minute: requests allowed per minute
+        :param per_hour: requests allowed per hour
+        :param max_retries: times to retry a request before giving up
+        :param backoff: first retry delay in seconds, doubled for each retry
+        :param max_backoff: longest delay between retries in seconds
+        :param clock: function returning the time in seconds
+        """
+        self.buckets = [TokenBucket(per_minute, 60, clock)]
+        if per_hour:
+            self.buckets.append(TokenBucket(per_hour, 3600, clock))
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.factor = 1.0  # fraction of the full rate currently used
+        self.min_factor = 0.1
+        self.blocked_until = 0.0
+        self._lock = Lock()
+
+    def reserve(self) -> float:
+        """
+        Reserve a slot for one request
+
+        :return: seconds to wait before sending the request
+        """
+        with self._lock:
+            wait = max(bucket.reserve(self.factor) for bucket in self.buckets)
+            return max(wait, self.blocked_until - self.clock())
+
+    def record(self, status_code: int, headers) -> float:
+        """
+        Update the scheduler from a response
+
+        :param status_code: HTTP status of the response
+        :param headers: response headers
+
+        :return: seconds the server asked to wait before retrying, or None
+        """
+        retry_after = _parse_retry_after(headers.get("Retry-After"))
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = _parse_reset(headers.get("X-RateLimit-Reset"))
+
+        with self._lock:
+            if status_code == 429:
+                self.factor = max(self.min_factor, self.factor / 2)
+            elif status_code < 400 and self.factor < 1.0:
+                self.factor = min(1.0, self.factor * 1.05)
+
+            pause = retry_after
+            if remaining is not None and str(remaining).strip() == "0" and reset:
+                pause = max(pause or 0.0, reset)
+            if pause:
+                self.blocked_until = max(self.blocked_until, self.clock() + pause)
+        return retry_after
+
+    def record_error(self):
+        """
+        Update the scheduler after a connection error
+        """
+        with self._lock:
+            self.factor = max(self.min_factor, self.factor * 0.75)
+
+    def retry_delay(self, attempt: int, retry_after: float = None) -> float:
+        """
+        Get the delay before retrying a failed request
+
+        :param attempt: number of the attempt that failed, starting at 0
+        :param retry_after: seconds the server asked to wait, if any
+
+        :return: seconds to wait
+        """
+        if retry_after is not None:
+            return retry_after
+        cap = min(self.max_backoff, self.backoff * 2**attempt)
+        return uniform(cap / 2, cap)
+
+    def should_retry(self, status_code: int, method: str = "GET") -> bool:
+        """
+        Check if a response status is worth retrying
+
+        :param status_code: HTTP status of the response
+        :param method: HTTP method of the request
+
+        :return: True for 429, and for 5xx gateway errors if the method is safe
+            to send twice
+        """
+        if method not in RETRY_METHODS:
+            return status_code == 429  # rejected before freeagent acted on it
+        return status_code in RETRY_STATUSES
+
+
+def _parse_retry_after(value: str) -> float:
+    """
+    Parse a Retry-After header
+
+    :param value: header value, either seconds or an HTTP date
+
+    :return: seconds to wait, or None if missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_reset(value: str) -> float:
+    """
+    Parse an X-RateLimit-Reset header
+
+    :param value: header value, either seconds to wait or a unix timestamp
+
+    :return: seconds to wait, or None if missing or invalid
+    """
+    try:
+        reset = float(value)
+    except (TypeError, ValueError):
+        return None
+    if reset > 1e9:  # unix timestamp
+        reset -= time()
+    return max(0.0, reset)
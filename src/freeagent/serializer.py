@@ -0,0 +1,113 @@
+"""
+Compiled serializers turning payload dataclasses into API dicts
+
+A function is generated once for each dataclass type that reads every field
+directly, drops None values and converts Decimal and dates in a single pass,
+without the deep copy dataclasses.asdict makes.
+"""
+
+from dataclasses import fields, is_dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from threading import Lock
+from typing import Any, Callable, Dict
+
+_PLAIN = frozenset((str, int, float, bool, type(None)))
+_SERIALIZERS: Dict[type, Callable[[Any], Dict[str, Any]]] = {}
+_LOCK = Lock()
+
+
+def convert_value(val: Any) -> Any:  # pylint: disable=too-many-return-statements
+    """
+    Convert a value to an API compatible one
+
+    :param val: value to convert
+
+    :return: Decimal as str, dates as ISO strings, containers converted recursively,
+        anything else unchanged
+    """
+    kind = type(val)
+    if kind in _PLAIN:
+        return val
+    if kind is Decimal:
+        return str(val)
+    if kind is date or kind is datetime:
+        return val.isoformat()
+    if kind is dict:
+        return {k: v if type(v) in _PLAIN else convert_value(v) for k, v in val.items()}
+    if kind is list or kind is tuple:
+        return [v if type(v) in _PLAIN else convert_value(v) for v in val]
+    if isinstance(val, Decimal):
+        return str(val)
+    if isinstance(val, (date, datetime)):
+        return val.isoformat()
+    if isinstance(val, dict):
+        return {k: convert_value(v) for k, v in val.items()}
+    if isinstance(val, (list, tuple)):
+        return [convert_value(v) for v in val]
+    if is_dataclass(val) and not isinstance(val, type):
+        return {f.name: convert_value(getattr(val, f.name)) for f in fields(val)}
+    return val
+
+
+def compile_serializer(cls: type) -> Callable[[Any], Dict[str, Any]]:
+    """
+    Generate the serializer for a dataclass type
+
+    :param cls: dataclass type
+
+    :return: function taking an instance and returning the API dict
+    :raises TypeError: if cls is not a dataclass
+    """
+    if not is_dataclass(cls):
+        raise TypeError(f"{cls!r} is not a dataclass")
+
+    lines = ["def serialize(obj):", "    out = {}"]
+    for index, field in enumerate(fields(cls)):
+        lines += [
+            f"    v = obj.{field.name}",
+            "    if v is not None:",
+            f"        out[_names[{index}]] = v if type(v) in _plain else _convert(v)",
+        ]
+    lines.append("    return out")
+
+    namespace = {
+        "_names": tuple(field.name for field in fields(cls)),
+        "_plain": _PLAIN,
+        "_convert": convert_value,
+    }
+    exec("\n".join(lines), namespace)  # pylint: disable=exec-used
+    func = namespace["serialize"]
+    func.__qualname__ = f"serialize_{cls.__name__}"
+    return func
+
+
+def get_serializer(cls: type) -> Callable[[Any], Dict[str, Any]]:
+    """
+    Get the serializer for a dataclass type, compiling it the first time
+
+    :param cls: dataclass type
+
+    :return: function taking an instance and returning the API dict
+    """
+    try:
+        return _SERIALIZERS[cls]
+    except KeyError:
+        pass
+    with _LOCK:
+        if cls not in _SERIALIZERS:
+            _SERIALIZERS[cls] = compile_serializer(cls)
+        return _SERIALIZERS[cls]
+
+
+def serialize(obj: Any) -> Dict[str, Any]:
+    """
+    Convert a dataclass or dict into a plain API compatible dict, dropping None values
+
+    :param obj: dataclass instance or dict to convert
+
+    :return: API compatible dict
+    """
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return get_serializer(type(obj))(obj)
+    return {k: convert_value(v) for k, v in obj.items() if v is not None}
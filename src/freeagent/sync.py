@@ -0,0 +1,293 @@
+"""
+Incremental sync of freeagent records into a local store
+
+Each feed, an endpoint with its parameters, keeps a watermark of when its last
+fetch started, so the next run only asks for records changed since.
+Changed records replace the stored copy by url, which picks up re-explained
+transactions.  freeagent does not list deleted records, so every full_every
+seconds a feed is fetched in full and stored records missing from it are removed.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from threading import Lock
+from time import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from .cache import cache_key
+from .payload import to_pennies
+from .transaction import LazyTransaction, TransactionAPI
+
+# accounting/transactions feeds use the parameters TransactionAPI requests with
+_transaction_params = TransactionAPI._params  # pylint: disable=protected-access
+
+
+@dataclass
+class Watermark:
+    """
+    dataclass for the sync position of a feed
+    """
+
+    updated_since: Optional[str] = None  # start of the last fetch, ISO timestamp
+    full_at: float = 0  # time of the last full sync
+
+
+@dataclass
+class SyncResult:
+    """
+    dataclass for the outcome of syncing a feed
+    """
+
+    feed: str
+    full: bool  # True if every record was fetched
+    fetched: int = 0
+    deleted: int = 0
+    watermark: Optional[str] = None
+
+
+def since(seconds: float) -> str:
+    """
+    Format a time for the updated_since parameter
+
+    :param seconds: time in seconds since the epoch
+
+    :return: ISO timestamp in UTC
+    """
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class SyncStore(ABC):
+    """
+    Common functions for the stores records are synced into
+
+    Records are kept per company and feed, keyed by their url.
+    """
+
+    @abstractmethod
+    def watermark(self, company: str, feed: str) -> Watermark:
+        """
+        Get the sync position of a feed
+
+        :param company: company the feed belongs to
+        :param feed: feed key from cache_key
+
+        :return: Watermark, empty if the feed has not been synced
+        """
+
+    @abstractmethod
+    def set_watermark(self, company: str, feed: str, watermark: Watermark):
+        """
+        Save the sync position of a feed
+
+        :param company: company the feed belongs to
+        :param feed: feed key from cache_key
+        :param watermark: new Watermark
+        """
+
+    @abstractmethod
+    def upsert(self, company: str, feed: str, records: List[Dict[str, Any]]):
+        """
+        Add records, replacing stored ones with the same url
+
+        :param company: company the feed belongs to
+        :param feed: feed key from cache_key
+        :param records: list of freeagent record dicts
+        """
+
+    @abstractmethod
+    def prune(self, company: str, feed: str, keep: Iterable[str]) -> int:
+        """
+        Delete the stored records of a feed that are not in keep
+
+        :param company: company the feed belongs to
+        :param feed: feed key from cache_key
+        :param keep: urls of the records still on freeagent
+
+        :return: number of records deleted
+        """
+
+    @abstractmethod
+    def records(self, company: str, feed: str) -> List[Dict[str, Any]]:
+        """
+        Get the stored records of a feed
+
+        :param company: company the feed belongs to
+        :param feed: feed key from cache_key
+
+        :return: list of freeagent record dicts
+        """
+
+
+class MemoryStore(SyncStore):
+    """
+    Store kept in memory, for tests and short lived processes
+    """
+
+    def __init__(self):
+        self._records = {}
+        self._watermarks = {}
+        self._lock = Lock()
+
+    def watermark(self, company: str, feed: str) -> Watermark:
+        return self._watermarks.get((company, feed), Watermark())
+
+    def set_watermark(self, company: str, feed: str, watermark: Watermark):
+        with self._lock:
+            self._watermarks[(company, feed)] = watermark
+
+    def upsert(self, company: str, feed: str, records: List[Dict[str, Any]]):
+        with self._lock:
+            stored = self._records.setdefault((company, feed), {})
+            for record in records:
+                stored[record["url"]] = record
+
+    def prune(self, company: str, feed: str, keep: Iterable[str]) -> int:
+        keep = set(keep)
+        with self._lock:
+            stored = self._records.get((company, feed), {})
+            doomed = [url for url in stored if url not in keep]
+            for url in doomed:
+                del stored[url]
+        return len(doomed)
+
+    def records(self, company: str, feed: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._records.get((company, feed), {}).values())
+
+
+class IncrementalSync:
+    """
+    Keep a SyncStore up to date with freeagent, fetching only changed records
+    """
+
+    def __init__(
+        self,
+        parent,
+        store: SyncStore,
+        company: str = "",
+        full_every: float = 7 * 24 * 60 * 60,
+        clock_skew: float = 300,
+    ):
+        """
+        Initialize the sync
+
+        :param parent: the main FreeAgent instance used to fetch records
+        :param store: SyncStore to keep the records in
+        :param company: name for the company, to share a store between companies
+        :param full_every: seconds between full syncs that remove deleted records,
+            0 to always fetch everything
+        :param clock_skew: seconds the watermark is set back from the start of
+            the fetch, to allow for freeagent's clock being behind this one
+        """
+        self.parent = parent
+        self.store = store
+        self.company = company
+        self.full_every = full_every
+        self.clock_skew = clock_skew
+
+    def sync(self, endpoint: str, params: dict = None, full: bool = None) -> SyncResult:
+        """
+        Bring the stored records of a feed up to date
+
+        :param endpoint: end part of the endpoint URL
+        :param params: dict of parameters selecting the records, without
+            updated_since
+        :param full: True to fetch everything and remove deleted records, False for
+            only changed records, None to decide from full_every
+
+        :return: SyncResult
+        """
+        params = dict(params or {})
+        feed = cache_key(endpoint, params)
+        mark = self.store.watermark(self.company, feed)
+        if full is None:
+            full = not mark.updated_since or time() - mark.full_at >= self.full_every
+
+        if not full:
+            params["updated_since"] = mark.updated_since
+        started = time()
+        response = self.parent.get_api(endpoint, params)
+        records = response.get(endpoint.rsplit("/", 1)[-1], [])
+
+        self.store.upsert(self.company, feed, records)
+        result = SyncResult(feed, full, fetched=len(records))
+        if full:
+            result.deleted = self.store.prune(
+                self.company, feed, (record["url"] for record in records)
+            )
+        # pages are fetched at the same time, so a record changed during the
+        # fetch can be missed while a later page has newer ones, the newest
+        # updated_at seen would skip it next time
+        result.watermark = since(started - self.clock_skew)
+        self.store.set_watermark(
+            self.company,
+            feed,
+            Watermark(result.watermark, started if full else mark.full_at),
+        )
+        return result
+
+    def sync_bank_transactions(self, account_id: str, full: bool = None) -> SyncResult:
+        """
+        Sync every bank transaction of an account, explained or not, so
+        transactions leave the unexplained list once they are explained
+
+        :param account_id: account id to use, not the whole url
+        :param full: as for sync
+
+        :return: SyncResult
+        """
+        return self.sync("bank_transactions", {"bank_account": account_id}, full)
+
+    def unexplained_transactions(self, account_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the stored bank transactions of an account still to be explained,
+        call sync_bank_transactions first
+
+        :param account_id: account id to use, not the whole url
+
+        :return: list of bank transaction dicts
+        """
+        feed = cache_key("bank_transactions", {"bank_account": account_id})
+        return [
+            record
+            for record in self.store.records(self.company, feed)
+            if to_pennies(record.get("unexplained_amount") or "0") != 0
+        ]
+
+    def sync_transactions(
+        self, nominal_code: str, start_date: str, end_date: str, full: bool = None
+    ) -> SyncResult:
+        """
+        Sync the accounting transactions of a nominal code and date range
+
+        :param nominal_code: The nominal code of the category.
+        :param start_date: Start date of the date range (YYYY-MM-DD).
+        :param end_date: End date of the date range (YYYY-MM-DD).
+        :param full: as for sync
+
+        :return: SyncResult
+        """
+        return self.sync(
+            "accounting/transactions",
+            _transaction_params(nominal_code, start_date, end_date),
+            full,
+        )
+
+    def transactions(
+        self, nominal_code: str, start_date: str, end_date: str
+    ) -> List[LazyTransaction]:
+        """
+        Get the stored accounting transactions, call sync_transactions first
+
+        :param nominal_code: The nominal code of the category.
+        :param start_date: Start date of the date range (YYYY-MM-DD).
+        :param end_date: End date of the date range (YYYY-MM-DD).
+
+        :return: list of LazyTransaction objects
+        """
+        feed = cache_key(
+            "accounting/transactions",
+            _transaction_params(nominal_code, start_date, end_date),
+        )
+        return [LazyTransaction(r) for r in self.store.records(self.company, feed)]
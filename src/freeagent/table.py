@@ -0,0 +1,356 @@
+"""
+Columnar table of transactions, for pulls too large to hold as Transaction objects
+
+Dates are kept as ordinal ints, amounts as int64 pennies and the category,
+category name and nominal code as small int codes into interned string pools.
+Columns are NumPy arrays when NumPy is installed and array.array otherwise.
+"""
+
+from array import array
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import compress
+from sys import intern
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from .payload import Transaction, parse_date, parse_datetime, to_pennies
+
+CODED = ("category", "category_name", "nominal_code")  # interned columns
+GROUPS = CODED + ("year", "month", "dated_on")  # columns group_by accepts
+OBJECTS = (
+    "url",
+    "description",
+    "created_at",
+    "updated_at",
+    "source_item_url",
+    "foreign_currency_data",
+)  # kept as lists of the raw values
+
+
+def _ordinal(day: Union[date, str]) -> int:
+    """
+    :param day: date or YYYY-MM-DD string
+
+    :return: proleptic Gregorian ordinal of day
+    """
+    return (parse_date(day) if isinstance(day, str) else day).toordinal()
+
+
+class TransactionTable:  # pylint: disable=too-many-instance-attributes
+    """
+    Transactions stored a column at a time
+
+    Build with from_rows, then filter with where or select, and total with sum
+    or group_by.  Index or iterate the table to get Transaction objects back.
+    """
+
+    def __init__(
+        self,
+        columns: Dict[str, Any],
+        pools: Dict[str, List[str]],
+        use_numpy: bool,
+    ):
+        """
+        Initialize from built columns, use from_rows to build a table from rows
+
+        :param columns: dict of column name to array, code array or list
+        :param pools: dict of coded column name to list of its values, None
+            included for rows without one
+        :param use_numpy: True if the numeric columns are NumPy arrays
+        """
+        self.use_numpy = use_numpy
+        self.dated_on = columns["dated_on"]
+        self.pennies = columns["pennies"]
+        self.codes = {name: columns[name] for name in CODED}
+        self.objects = {name: columns[name] for name in OBJECTS}
+        self.pools = pools
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[Any],
+        use_numpy: Optional[bool] = None,
+    ) -> "TransactionTable":
+        """
+        Build a table from transaction rows, reading them one at a time
+
+        :param rows: iterable of raw accounting/transactions dicts, LazyTransaction
+            or Transaction objects
+        :param use_numpy: True or False to choose the backend, None to use NumPy
+            if it is installed
+
+        :return: TransactionTable
+        """
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        if use_numpy and numpy is None:
+            raise ImportError(
+                "use_numpy needs NumPy, install it with: pip install numpy"
+            )
+
+        dated_on = array("i")
+        pennies = array("q")
+        codes = {name: array("i") for name in CODED}
+        lookups = {name: {} for name in CODED}
+        pools = {name: [] for name in CODED}
+        objects = {name: [] for name in OBJECTS}
+
+        for row in rows:
+            if not isinstance(row, (dict, Transaction)):
+                row = row.raw  # LazyTransaction
+            if isinstance(row, Transaction):
+                dated_on.append(row.dated_on.toordinal())
+                pennies.append(to_pennies(row.debit_value))
+                get = row.__getattribute__
+            else:
+                dated_on.append(parse_date(row["dated_on"]).toordinal())
+                pennies.append(to_pennies(row["debit_value"]))
+                get = row.get
+            for name in CODED:
+                value = get(name)
+                value = None if value is None else str(value)  # None has its own code
+                code = lookups[name].get(value)
+                if code is None:
+                    code = lookups[name][value] = len(pools[name])
+                    pools[name].append(value if value is None else intern(value))
+                codes[name].append(code)
+            for name in OBJECTS:
+                value = get(name)
+                if isinstance(value, datetime):
+                    value = value.isoformat()  # stored as sent by freeagent
+                objects[name].append(value)
+
+        columns = {"dated_on": dated_on, "pennies": pennies, **codes, **objects}
+        if use_numpy:
+            columns["dated_on"] = numpy.array(dated_on, dtype=numpy.int32)
+            columns["pennies"] = numpy.array(pennies, dtype=numpy.int64)
+            for name in CODED:
+                columns[name] = numpy.array(codes[name], dtype=numpy.int32)
+        return cls(columns, pools, use_numpy)
+
+    def __len__(self) -> int:
+        return len(self.pennies)
+
+    def __getitem__(self, index: int) -> Transaction:
+        """
+        Get one row as a Transaction
+
+        :param index: row number
+
+        :return: Transaction object
+        """
+        get = self.objects.__getitem__
+        return Transaction(
+            url=get("url")[index],
+            dated_on=date.fromordinal(int(self.dated_on[index])),
+            created_at=parse_datetime(get("created_at")[index]),
+            updated_at=parse_datetime(get("updated_at")[index]),
+            description=get("description")[index],
+            category=self.value("category", index),
+            category_name=self.value("category_name", index),
+            nominal_code=self.value("nominal_code", index),
+            debit_value=Decimal(int(self.pennies[index])).scaleb(-2),
+            source_item_url=get("source_item_url")[index],
+            foreign_currency_data=get("foreign_currency_data")[index],
+        )
+
+    def __iter__(self) -> Iterator[Transaction]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def to_transactions(self) -> List[Transaction]:
+        """
+        Convert every row
+
+        :return: list of Transaction objects
+        """
+        return list(self)
+
+    def value(self, name: str, index: int) -> Optional[str]:
+        """
+        Get the value of a coded column for a row
+
+        :param name: one of category, category_name or nominal_code
+        :param index: row number
+
+        :return: the interned string, or None if the row had no value
+        """
+        return self.pools[name][self.codes[name][index]]
+
+    def _code_set(self, name: str, values: Iterable[str]) -> List[int]:
+        """
+        :param name: coded column name
+        :param values: value or values of the column to look for, None for rows
+            without a value
+
+        :return: list of codes of the values present in the table
+        """
+        pool = self.pools[name]
+        if values is None or isinstance(values, (str, int)):
+            values = [values]
+        wanted = {v if v is None else str(v) for v in values}
+        return [code for code, value in enumerate(pool) if value in wanted]
+
+    def mask(
+        self,
+        start: Union[date, str] = None,
+        end: Union[date, str] = None,
+        **columns: Iterable[str],
+    ) -> Sequence[bool]:
+        """
+        Build a row mask, every condition given must match
+
+        :param start: first date to include
+        :param end: last date to include
+        :param columns: category, category_name or nominal_code keyword set to
+            the values to include, None for rows without a value
+
+        :return: NumPy bool array or list of bools
+        """
+        for name in columns:
+            if name not in CODED:
+                raise ValueError(f"cannot filter on {name!r}, use one of {CODED}")
+        low = None if start is None else _ordinal(start)
+        high = None if end is None else _ordinal(end)
+
+        if self.use_numpy:
+            result = numpy.ones(len(self), dtype=bool)
+            if low is not None:
+                result &= self.dated_on >= low
+            if high is not None:
+                result &= self.dated_on <= high
+            for name, values in columns.items():
+                result &= numpy.isin(self.codes[name], self._code_set(name, values))
+            return result
+
+        result = [True] * len(self)
+        if low is not None or high is not None:
+            low = date.min.toordinal() if low is None else low
+            high = date.max.toordinal() if high is None else high
+            result = [low <= day <= high for day in self.dated_on]
+        for name, values in columns.items():
+            codes = set(self._code_set(name, values))
+            result = [ok and c in codes for ok, c in zip(result, self.codes[name])]
+        return result
+
+    def select(self, mask: Sequence[bool]) -> "TransactionTable":
+        """
+        Get the rows where mask is True
+
+        :param mask: bool per row, from mask or built from the columns
+
+        :return: new TransactionTable sharing the string pools
+        """
+        if self.use_numpy:
+            mask = numpy.asarray(mask, dtype=bool)
+
+            def take(column):
+                return column[mask]
+
+        else:
+
+            def take(column):
+                return array(column.typecode, compress(column, mask))
+
+        columns = {"dated_on": take(self.dated_on), "pennies": take(self.pennies)}
+        for name in CODED:
+            columns[name] = take(self.codes[name])
+        for name in OBJECTS:
+            columns[name] = list(compress(self.objects[name], mask))
+        return TransactionTable(columns, self.pools, self.use_numpy)
+
+    def where(
+        self,
+        start: Union[date, str] = None,
+        end: Union[date, str] = None,
+        **columns: Iterable[str],
+    ) -> "TransactionTable":
+        """
+        Filter rows by date range and coded column values
+
+        :param start: first date to include
+        :param end: last date to include
+        :param columns: category, category_name or nominal_code keyword set to
+            the values to include, None for rows without a value
+
+        :return: new TransactionTable of the matching rows
+        """
+        return self.select(self.mask(start, end, **columns))
+
+    def sum(self) -> int:
+        """
+        Total of the debit values
+
+        :return: total in pennies
+        """
+        return int(self.pennies.sum()) if self.use_numpy else sum(self.pennies)
+
+    def total(self) -> Decimal:
+        """
+        Total of the debit values
+
+        :return: total in pounds
+        """
+        return Decimal(self.sum()).scaleb(-2)
+
+    def _group_keys(self, by: str):
+        """
+        :param by: name of the column to group by
+
+        :return: tuple of a code per row and the list of labels the codes index
+        """
+        if by in CODED:
+            return self.codes[by], self.pools[by]
+        if by not in GROUPS:
+            raise ValueError(f"cannot group by {by!r}, use one of {GROUPS}")
+        label = {
+            "year": lambda day: str(day.year),
+            "month": lambda day: f"{day.year}-{day.month:02d}",
+            "dated_on": date.isoformat,
+        }[by]
+        if self.use_numpy:
+            ordinals, inverse = numpy.unique(self.dated_on, return_inverse=True)
+            return inverse, [label(date.fromordinal(int(o))) for o in ordinals]
+        labels = {}
+        keys = array("i")
+        for ordinal in self.dated_on:
+            code = labels.get(ordinal)
+            if code is None:
+                code = labels[ordinal] = len(labels)
+            keys.append(code)
+        return keys, [label(date.fromordinal(o)) for o in labels]
+
+    def group_by(self, by: str) -> Dict[str, int]:
+        """
+        Total the debit values for each value of a column
+
+        :param by: category, category_name, nominal_code, year, month or dated_on
+
+        :return: dict of column value to total in pennies, in first seen order
+            for coded columns and date order for date columns
+        """
+        keys, labels = self._group_keys(by)
+        if self.use_numpy:
+            totals = numpy.zeros(len(labels), dtype=numpy.int64)
+            numpy.add.at(totals, keys, self.pennies)
+            counts = numpy.bincount(keys, minlength=len(labels))
+            sums = [int(v) for v in totals]
+        else:
+            sums = [0] * len(labels)
+            counts = [0] * len(labels)
+            for key, pennies in zip(keys, self.pennies):
+                sums[key] += pennies
+                counts[key] += 1
+
+        result = {}
+        for label, total, count in zip(labels, sums, counts):
+            if count:  # filtered tables share pools with unused values
+                result[label] = result.get(label, 0) + total
+        if by not in CODED:
+            result = dict(sorted(result.items()))
+        return result
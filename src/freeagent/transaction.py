@@ -2,12 +2,154 @@
 Class for getting freeagent transactions
 """
 
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
 from decimal import Decimal
-from typing import List
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
 
 from .base import FreeAgentBase
-from .payload import Transaction
+from .payload import Transaction, parse_date, parse_datetime
+
+Row = Union[Transaction, "LazyTransaction"]
+SHARDS = ("month", "year", None)  # ways get_transactions_batch can split a range
+
+
+def date_shards(start_date: str, end_date: str, shard: str = "month") -> List[Tuple]:
+    """
+    Split a date range into calendar months or years
+
+    :param start_date: Start date of the date range (YYYY-MM-DD).
+    :param end_date: End date of the date range (YYYY-MM-DD).
+    :param shard: "month", "year" or None for the whole range
+
+    :return: list of (from_date, to_date) string pairs covering the range in order
+    """
+    if shard not in SHARDS:
+        raise ValueError(f"shard must be one of {SHARDS}")
+    start, end = parse_date(start_date), parse_date(end_date)
+    if shard is None:
+        return [(start_date, end_date)] if start <= end else []
+
+    shards = []
+    while start <= end:
+        if shard == "year":
+            following = date(start.year + 1, 1, 1)
+        else:
+            following = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        last = min(following - timedelta(days=1), end)
+        shards.append((start.isoformat(), last.isoformat()))
+        start = following
+    return shards
+
+
+class _LazyField:  # pylint: disable=too-few-public-methods
+    """
+    Descriptor reading a field from the raw row, parsing and caching it on first
+    access
+    """
+
+    def __init__(self, parse=None, required: bool = True):
+        """
+        :param parse: function to convert the raw value, None to use it unchanged
+        :param required: False if the field may be missing from the row
+        """
+        self.parse = parse
+        self.required = required
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        if self.parse is None:
+            return obj.raw[self.name] if self.required else obj.raw.get(self.name)
+        try:
+            return obj.parsed[self.name]
+        except KeyError:
+            pass
+        value = obj.raw[self.name] if self.required else obj.raw.get(self.name)
+        if value is not None:
+            value = self.parse(value)
+        obj.parsed[self.name] = value
+        return value
+
+
+class LazyTransaction:
+    """
+    A transaction row that keeps the JSON from freeagent and only parses a field
+    the first time it is read
+
+    Has the same attributes as Transaction, so reports that only read a couple
+    of fields skip the cost of parsing the rest.
+    """
+
+    __slots__ = ("raw", "parsed")
+
+    url = _LazyField()
+    dated_on = _LazyField(parse_date)
+    created_at = _LazyField(parse_datetime)
+    updated_at = _LazyField(parse_datetime)
+    description = _LazyField()
+    category = _LazyField()
+    category_name = _LazyField()
+    nominal_code = _LazyField()
+    debit_value = _LazyField(Decimal)
+    source_item_url = _LazyField(required=False)
+    foreign_currency_data = _LazyField(required=False)
+
+    def __init__(self, raw: Dict[str, Any]):
+        """
+        Initialize with a row of the accounting/transactions endpoint
+
+        :param raw: dict of a single transaction from freeagent
+        """
+        self.raw = raw
+        self.parsed = {}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, LazyTransaction):
+            return self.raw == other.raw
+        if isinstance(other, Transaction):
+            return self.to_transaction() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"LazyTransaction({self.raw.get('url')!r})"
+
+    def to_transaction(self) -> Transaction:
+        """
+        Parse every field
+
+        :return: Transaction object
+        """
+        return _parse_transaction(self.raw)
+
+
+def _parse_transaction(transaction_data: dict) -> Transaction:
+    """
+    Build a Transaction from a row of the accounting/transactions endpoint
+
+    :param transaction_data: dict of a single transaction from freeagent
+
+    :return: Transaction object
+    """
+    return Transaction(
+        url=transaction_data["url"],
+        dated_on=parse_date(transaction_data["dated_on"]),
+        created_at=parse_datetime(transaction_data["created_at"]),
+        updated_at=parse_datetime(transaction_data["updated_at"]),
+        description=transaction_data["description"],
+        category=transaction_data["category"],
+        category_name=transaction_data["category_name"],
+        nominal_code=transaction_data["nominal_code"],
+        debit_value=Decimal(transaction_data["debit_value"]),
+        source_item_url=transaction_data.get("source_item_url"),
+        foreign_currency_data=transaction_data.get("foreign_currency_data"),
+    )
 
 
 class TransactionAPI(FreeAgentBase):
@@ -21,40 +163,185 @@ class TransactionAPI(FreeAgentBase):
         """
         self.parent = parent  # the main FreeAgent instance
 
-    def get_transactions(
-        self, nominal_code: str, start_date: str, end_date: str
-    ) -> List[Transaction]:
+    @staticmethod
+    def _row(transaction_data: dict, lazy: bool) -> Row:
         """
-        Get transactions for a given category nominal code and date range.
+        Wrap or parse a row of the accounting/transactions endpoint
+
+        :param transaction_data: dict of a single transaction from freeagent
+        :param lazy: True for a LazyTransaction, False to parse it now
+
+        :return: LazyTransaction or Transaction object
+        """
+        if lazy:
+            return LazyTransaction(transaction_data)
+        return _parse_transaction(transaction_data)
+
+    @staticmethod
+    def _params(nominal_code: str, start_date: str, end_date: str) -> dict:
+        """
+        Build the request parameters for a code and date range
 
         :param nominal_code: The nominal code of the category.
         :param start_date: Start date of the date range (YYYY-MM-DD).
         :param end_date: End date of the date range (YYYY-MM-DD).
-        :return: A list of Transaction objects.
+
+        :return: params dict
         """
-        params = {
+        return {
             "nominal_code": nominal_code,
             "from_date": start_date,
             "to_date": end_date,
         }
 
+    @staticmethod
+    def _table(rows: Iterable[dict], use_numpy: bool) -> "TransactionTable":
+        """
+        Build a TransactionTable from transaction rows
+
+        :param rows: iterable of transaction dicts from freeagent
+        :param use_numpy: True or False to choose the backend, None to use NumPy
+            if it is installed.
+
+        :return: A TransactionTable.
+        """
+        # imported here as NumPy is slow to import
+        from .table import TransactionTable  # pylint: disable=import-outside-toplevel
+
+        return TransactionTable.from_rows(rows, use_numpy)
+
+    @staticmethod
+    def _shard_params(
+        nominal_codes: Iterable[str], start_date: str, end_date: str, shard: str
+    ) -> List[dict]:
+        """
+        Build the request parameters for every shard of a batch
+
+        :param nominal_codes: iterable of category nominal codes
+        :param start_date: Start date of the date range (YYYY-MM-DD).
+        :param end_date: End date of the date range (YYYY-MM-DD).
+        :param shard: "month", "year" or None for the whole range
+
+        :return: list of params dicts, by code then date
+        """
+        shards = date_shards(start_date, end_date, shard)
+        return [
+            {"nominal_code": code, "from_date": first, "to_date": last}
+            for code in dict.fromkeys(str(c) for c in nominal_codes)
+            for first, last in shards
+        ]
+
+    def _merge(self, responses: Iterable[dict], lazy: bool) -> List[Row]:
+        """
+        Join the responses of a batch in order, dropping repeated transactions
+
+        :param responses: iterable of get_api responses in shard order
+        :param lazy: True for LazyTransaction rows, False to parse them now
+
+        :return: list of LazyTransaction or Transaction objects
+        """
+        seen = set()
+        rows = []
+        for response in responses:
+            for transaction_data in response.get("transactions", []):
+                url = transaction_data.get("url")
+                if url in seen:
+                    continue
+                seen.add(url)
+                rows.append(self._row(transaction_data, lazy))
+        return rows
+
+    def get_transactions(
+        self, nominal_code: str, start_date: str, end_date: str, lazy: bool = False
+    ) -> List[Row]:
+        """
+        Get transactions for a given category nominal code and date range.
+
+        :param nominal_code: The nominal code of the category.
+        :param start_date: Start date of the date range (YYYY-MM-DD).
+        :param end_date: End date of the date range (YYYY-MM-DD).
+        :param lazy: True for LazyTransaction rows parsed as fields are read,
+            False (the default) for fully parsed Transaction objects.
+        :return: A list of Transaction or LazyTransaction objects.
+        """
+        params = self._params(nominal_code, start_date, end_date)
         response = self.parent.get_api("accounting/transactions", params)
-        transactions = []
-        for transaction_data in response.get("transactions", []):
-            transaction = Transaction(
-                url=transaction_data["url"],
-                dated_on=datetime.strptime(
-                    transaction_data["dated_on"], "%Y-%m-%d"
-                ).date(),
-                created_at=datetime.fromisoformat(transaction_data["created_at"]),
-                updated_at=datetime.fromisoformat(transaction_data["updated_at"]),
-                description=transaction_data["description"],
-                category=transaction_data["category"],
-                category_name=transaction_data["category_name"],
-                nominal_code=transaction_data["nominal_code"],
-                debit_value=Decimal(transaction_data["debit_value"]),
-                source_item_url=transaction_data.get("source_item_url"),
-                foreign_currency_data=transaction_data.get("foreign_currency_data"),
-            )
-            transactions.append(transaction)
-        return transactions
+        return [
+            self._row(transaction_data, lazy)
+            for transaction_data in response.get("transactions", [])
+        ]
+
+    def iter_transactions(
+        self, nominal_code: str, start_date: str, end_date: str, lazy: bool = False
+    ) -> Iterator[Row]:
+        """
+        Yield transactions for a given category nominal code and date range a page
+        at a time, without holding them all in memory.
+
+        :param nominal_code: The nominal code of the category.
+        :param start_date: Start date of the date range (YYYY-MM-DD).
+        :param end_date: End date of the date range (YYYY-MM-DD).
+        :param lazy: True for LazyTransaction rows parsed as fields are read,
+            False (the default) for fully parsed Transaction objects.
+        :return: A generator of Transaction or LazyTransaction objects.
+        """
+        params = self._params(nominal_code, start_date, end_date)
+        for transaction_data in self.parent.iter_api("accounting/transactions", params):
+            yield self._row(transaction_data, lazy)
+
+    def get_transaction_table(
+        self,
+        nominal_code: str,
+        start_date: str,
+        end_date: str,
+        use_numpy: bool = None,
+    ) -> "TransactionTable":
+        """
+        Get transactions for a given category nominal code and date range as a
+        columnar table, built a page at a time.
+
+        :param nominal_code: The nominal code of the category.
+        :param start_date: Start date of the date range (YYYY-MM-DD).
+        :param end_date: End date of the date range (YYYY-MM-DD).
+        :param use_numpy: True or False to choose the backend, None to use NumPy
+            if it is installed.
+        :return: A TransactionTable.
+        """
+        params = self._params(nominal_code, start_date, end_date)
+        return self._table(
+            self.parent.iter_api("accounting/transactions", params), use_numpy
+        )
+
+    def get_transactions_batch(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        nominal_codes: Iterable[str],
+        start_date: str,
+        end_date: str,
+        shard: str = "month",
+        max_workers: int = None,
+        lazy: bool = False,
+    ) -> List[Row]:
+        """
+        Get transactions for many nominal codes over a long date range, split
+        into a request per code and month (or year) fetched at the same time.
+
+        :param nominal_codes: Iterable of category nominal codes.
+        :param start_date: Start date of the date range (YYYY-MM-DD).
+        :param end_date: End date of the date range (YYYY-MM-DD).
+        :param shard: "month", "year" or None to only split by code.
+        :param max_workers: Number of shards to fetch at the same time, defaults
+            to the max_workers of the FreeAgent instance.
+        :param lazy: True for LazyTransaction rows parsed as fields are read,
+            False (the default) for fully parsed Transaction objects.
+        :return: A list of Transaction or LazyTransaction objects, ordered by
+            code then date shard, each transaction once.
+        """
+        shards = self._shard_params(nominal_codes, start_date, end_date, shard)
+        workers = max_workers or getattr(self.parent, "max_workers", 4)
+
+        def fetch(params):
+            # shards are the unit of parallelism, so their pages are fetched in turn
+            return self.parent.get_api("accounting/transactions", params, 1)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            return self._merge(pool.map(fetch, shards), lazy)
@@ -0,0 +1,20 @@
+"""
+Helpers shared by the unit tests.
+"""
+
+import json
+from unittest.mock import MagicMock
+
+
+def make_response(json_data, headers=None, links=None, status_code=200):
+    """
+    Build a mock response with the passed json, headers and links
+    """
+    response = MagicMock()
+    response.status_code = status_code
+    response.text = str(json_data)
+    response.json.return_value = json_data
+    response.content = json.dumps(json_data).encode()
+    response.headers = headers or {}
+    response.links = links or {}
+    return response
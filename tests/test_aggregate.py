@@ -0,0 +1,95 @@
+"""
+Unit tests for the transaction aggregation engine.
+"""
+
+import unittest
+from decimal import Decimal
+
+from freeagent.aggregate import Aggregator, Summary, aggregate, vat_quarter
+from freeagent.transaction import LazyTransaction
+
+
+def make_row(dated_on, value, code="365"):
+    """Build a row as returned by the accounting/transactions endpoint."""
+    return {
+        "url": f"https://api/transactions/{dated_on}{value}",
+        "dated_on": dated_on,
+        "created_at": "2023-01-06T10:00:00+00:00",
+        "updated_at": "2023-01-07T10:00:00+00:00",
+        "description": "x",
+        "category": f"https://api/categories/{code}",
+        "category_name": "Travel" if code == "365" else "Sales",
+        "nominal_code": code,
+        "debit_value": value,
+    }
+
+
+ROWS = [
+    make_row("2023-01-05", "-12.50"),
+    make_row("2023-02-20", "100.00", "001"),
+    make_row("2023-03-31", "-7.25"),
+    make_row("2023-04-01", "0.1"),
+]
+
+
+class AggregateTestCase(unittest.TestCase):
+    """
+    Unit tests for Aggregator and aggregate.
+    """
+
+    def test_by_nominal_code(self):
+        """Test sums, counts, min and max per nominal code."""
+        result = aggregate(iter(ROWS))
+        self.assertEqual(
+            result["365"],
+            Summary(3, Decimal("-19.65"), Decimal("-12.50"), Decimal("0.10")),
+        )
+        self.assertEqual(list(result), ["001", "365"])
+
+    def test_by_period(self):
+        """Test grouping by month, VAT quarter and several keys."""
+        rows = [LazyTransaction(row) for row in ROWS]
+        self.assertEqual(
+            list(aggregate(rows, "month")), ["2023-01", "2023-02", "2023-03", "2023-04"]
+        )
+        quarters = aggregate(rows, "vat_quarter")
+        self.assertEqual(quarters["2023-03"].count, 3)
+        self.assertEqual(quarters["2023-06"].total, Decimal("0.10"))
+        both = aggregate([r.to_transaction() for r in rows], ("year", "category_name"))
+        self.assertEqual(both[("2023", "Sales")].total, Decimal("100.00"))
+
+    def test_vat_quarter(self):
+        """Test quarter end months for each VAT stagger."""
+        self.assertEqual(vat_quarter("2023-01-15"), "2023-03")
+        self.assertEqual(vat_quarter("2023-12-01"), "2023-12")
+        self.assertEqual(vat_quarter("2023-12-01", 2), "2024-01")
+        self.assertEqual(vat_quarter("2023-04-30", 2), "2023-04")
+        self.assertEqual(vat_quarter("2023-12-01", 3), "2024-02")
+        self.assertEqual(vat_quarter("2023-03-01", 3), "2023-05")
+
+    def test_bad_arguments(self):
+        """Test unknown groups and staggers raise ValueError."""
+        with self.assertRaises(ValueError):
+            Aggregator("url")
+        with self.assertRaises(ValueError):
+            Aggregator("month", stagger=4)
+
+
+class AsyncAggregateTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for aggregating async iterators.
+    """
+
+    async def test_aupdate(self):
+        """Test rows from an async generator are added."""
+
+        async def rows():
+            for row in ROWS:
+                yield row
+
+        aggregator = await Aggregator("year").aupdate(rows())
+        self.assertEqual(aggregator.pennies(), {"2023": (4, 8035, -1250, 10000)})
+
+
+if __name__ == "__main__":
+    unittest.main()
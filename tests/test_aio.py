@@ -0,0 +1,201 @@
+"""
+Unit tests for the AsyncFreeAgent classes using a mocked httpx transport.
+Covers pagination, token refresh and the async sub-APIs.
+"""
+
+# pylint: disable=protected-access
+import asyncio
+import unittest
+from time import time
+
+import httpx
+
+from freeagent.aio import AsyncFreeAgent
+from freeagent.base import APIError, PER_PAGE
+from freeagent.scheduler import RequestScheduler
+
+
+class AsyncFreeAgentTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for AsyncFreeAgent using httpx.MockTransport and dummy data.
+    """
+
+    def setUp(self):
+        self.requests = []
+        self.saved_tokens = []
+        self.routes = {}
+
+        def handler(request):
+            self.requests.append(request)
+            route = self.routes[request.url.path]
+            return route(request)
+
+        self.client = AsyncFreeAgent(
+            api_base_url="https://api/v2/", transport=httpx.MockTransport(handler)
+        )
+        self.client.authenticate(
+            "ident",
+            "secret",
+            self.saved_tokens.append,
+            {"access_token": "a1", "refresh_token": "r1", "expires_at": time() + 600},
+        )
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    def test_needs_token(self):
+        """Test authenticate without a token raises ValueError."""
+        with self.assertRaises(ValueError):
+            AsyncFreeAgent().authenticate("ident", "secret", print, None)
+
+    async def test_get_api_paginates(self):
+        """Test remaining pages are fetched concurrently and merged in order."""
+
+        def things(request):
+            page = int(request.url.params["page"])
+            chunk = list(range(250))[(page - 1) * PER_PAGE : page * PER_PAGE]
+            return httpx.Response(
+                200, json={"things": chunk}, headers={"X-Total-Count": "250"}
+            )
+
+        self.routes["/v2/things"] = things
+        result = await self.client.get_api("things")
+        self.assertEqual(result["things"], list(range(250)))
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(self.requests[0].headers["Authorization"], "Bearer a1")
+
+    async def test_iter_api(self):
+        """Test iter_api yields items from every page."""
+
+        def things(request):
+            page = int(request.url.params["page"])
+            count = PER_PAGE if page == 1 else 5
+            return httpx.Response(200, json={"things": [page] * count})
+
+        self.routes["/v2/things"] = things
+        result = [item async for item in self.client.iter_api("things")]
+        self.assertEqual(result, [1] * PER_PAGE + [2] * 5)
+
+    async def test_expired_token_is_refreshed(self):
+        """Test an expired token is refreshed once and saved with the callback."""
+        self.client.token["expires_at"] = time() - 10
+        self.routes["/v2/token_endpoint"] = lambda request: httpx.Response(
+            200,
+            json={"access_token": "a2", "token_type": "bearer", "expires_in": 3600},
+        )
+        self.routes["/v2/users/me"] = lambda request: httpx.Response(
+            200, json={"user": {"first_name": "Test"}}
+        )
+        result = await self.client.get_api("users/me")
+        self.assertEqual(result, {"user": {"first_name": "Test"}})
+        self.assertEqual(self.requests[-1].headers["Authorization"], "Bearer a2")
+        self.assertEqual(len(self.saved_tokens), 1)
+        self.assertEqual(self.saved_tokens[0]["refresh_token"], "r1")
+
+    async def test_token_refreshed_once_ahead_of_expiry(self):
+        """Test a token about to expire is refreshed in the background, once."""
+        self.client.token["expires_at"] = time() + 100
+        self.routes["/v2/token_endpoint"] = lambda request: httpx.Response(
+            200,
+            json={"access_token": "a2", "token_type": "bearer", "expires_in": 3600},
+        )
+        self.routes["/v2/things"] = lambda request: httpx.Response(
+            200, json={"things": [1]}
+        )
+        await asyncio.gather(*(self.client.get_api("things") for _ in range(5)))
+        sent = [r.headers["Authorization"] for r in self.requests if r.method == "GET"]
+        self.assertEqual(sent[0], "Bearer a1")  # did not wait for the refresh
+        await self.client._ahead
+        self.assertEqual([t["access_token"] for t in self.saved_tokens], ["a2"])
+
+    async def test_post_api_failure(self):
+        """Test a failed post raises RuntimeError."""
+        self.routes["/v2/bank_transaction_explanations"] = lambda request: (
+            httpx.Response(422, text="bad")
+        )
+        with self.assertRaises(RuntimeError):
+            await self.client.post_api("bank_transaction_explanations", "x", {})
+
+    async def test_post_retry_policy(self):
+        """Test a post is only sent again if it never reached freeagent."""
+        self.client.scheduler = RequestScheduler(max_retries=2, backoff=0.0)
+        errors = [httpx.ConnectError("refused"), httpx.ReadTimeout("slow")]
+
+        def route(request):
+            raise errors.pop(0)
+
+        self.routes["/v2/things"] = route
+        with self.assertRaises(APIError) as err:
+            await self.client.post_api("things", "x", {})
+        self.assertEqual(len(self.requests), 2)
+        self.assertFalse(err.exception.retryable)
+
+    async def test_explain_transactions_bad_body(self):
+        """Test a response that is not JSON fails its item, not the batch."""
+        bodies = [b'{"x": 1}', b"<html>", b'{"x": 3}']
+        self.routes["/v2/bank_transaction_explanations"] = lambda request: (
+            httpx.Response(201, content=bodies.pop(0))
+        )
+        self.client.bank.serialize_for_api = lambda p: {"description": p}
+        report = await self.client.bank.explain_transactions(
+            ["a", "b", "c"], max_workers=1
+        )
+        self.assertEqual([r.status for r in report.results], ["ok", "failed", "ok"])
+        self.assertEqual(len(self.requests), 3)
+
+    async def test_sub_apis(self):
+        """Test the async bank and category sub-APIs."""
+        self.routes["/v2/bank_accounts"] = lambda request: httpx.Response(
+            200,
+            json={
+                "bank_accounts": [
+                    {"name": "Current", "url": "https://api/b/1", "is_primary": True}
+                ]
+            },
+        )
+        self.routes["/v2/categories"] = lambda request: httpx.Response(
+            200,
+            json={
+                "admin_expenses_categories": [
+                    {"description": "Travel", "url": "https://c/1", "nominal_code": "1"}
+                ]
+            },
+        )
+        self.assertEqual(await self.client.bank.get_id("current"), "1")
+        self.assertEqual(await self.client.bank.get_primary(), "1")
+        self.assertEqual(await self.client.category.get_desc_id("trav"), "https://c/1")
+        self.assertEqual(
+            await self.client.category.get_nominal_code_id(1), "https://c/1"
+        )
+
+    async def test_get_transactions_batch(self):
+        """Test shards are fetched concurrently and merged in order."""
+
+        def transactions(request):
+            params = request.url.params
+            row = {
+                "url": f"https://api/t/{params['nominal_code']}-{params['from_date']}",
+                "dated_on": params["from_date"],
+                "created_at": "2023-01-01T10:00:00",
+                "updated_at": "2023-01-01T10:00:00",
+                "description": "Payment",
+                "category": "https://api/categories/365",
+                "category_name": "Travel",
+                "nominal_code": params["nominal_code"],
+                "debit_value": "1.00",
+            }
+            return httpx.Response(200, json={"transactions": [row]})
+
+        self.routes["/v2/accounting/transactions"] = transactions
+        rows = await self.client.transaction.get_transactions_batch(
+            ["250", "365"], "2023-01-15", "2023-02-10", max_workers=2
+        )
+        self.assertEqual(
+            [t.url.rsplit("/", 1)[-1] for t in rows],
+            ["250-2023-01-15", "250-2023-02-01", "365-2023-01-15", "365-2023-02-01"],
+        )
+        self.assertEqual(len(self.requests), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
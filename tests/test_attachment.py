@@ -0,0 +1,134 @@
+"""
+Unit tests for streaming attachments and JSON request bodies.
+"""
+
+import asyncio
+import base64
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from freeagent.attachment import (
+    AttachmentCache,
+    Base64File,
+    JSONStreamBody,
+    PreparedAttachment,
+    data_digest,
+    encode_json,
+)
+
+
+class AttachmentTestCase(unittest.TestCase):
+    """
+    Unit tests for Base64File and encode_json using temporary files.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = Path(self.tmp.name) / "receipt.pdf"
+        # not a multiple of the chunk size, so the last chunk is padded
+        self.content = bytes(range(256)) * 1000 + b"x"
+        self.path.write_bytes(self.content)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_base64_file_matches_b64encode(self):
+        """Test chunked encoding gives the same bytes as encoding in one go."""
+        data = Base64File(self.path)
+        data.chunk_size = 3 * 1000
+        expected = base64.b64encode(self.content)
+        self.assertEqual(b"".join(data), expected)
+        self.assertEqual(len(data), len(expected))
+        # can be read again, so requests can be retried
+        self.assertEqual(b"".join(data), expected)
+
+    def test_encode_json_without_files(self):
+        """Test documents without files are encoded to bytes."""
+        body = encode_json({"a": {"b": 1}})
+        self.assertEqual(json.loads(body), {"a": {"b": 1}})
+
+    def test_encode_json_streams_files(self):
+        """Test files are streamed into a valid JSON body of the right length."""
+        document = {
+            "bank_transaction_explanation": {
+                "description": "Receipt",
+                "attachment": {"file_name": "r.pdf", "data": Base64File(self.path)},
+            }
+        }
+        body = encode_json(document)
+        self.assertIsInstance(body, JSONStreamBody)
+        raw = b"".join(body)
+        self.assertEqual(len(raw), len(body))
+        decoded = json.loads(raw)
+        attachment = decoded["bank_transaction_explanation"]["attachment"]
+        self.assertEqual(base64.b64decode(attachment["data"]), self.content)
+        self.assertEqual(attachment["file_name"], "r.pdf")
+
+    def test_async_iteration(self):
+        """Test the body can be sent by an async client."""
+        body = encode_json({"data": Base64File(self.path)})
+
+        async def collect():
+            return b"".join([chunk async for chunk in body])
+
+        self.assertEqual(asyncio.run(collect()), b"".join(body))
+
+
+class AttachmentCacheTestCase(unittest.TestCase):
+    """
+    Unit tests for AttachmentCache using temporary files.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.dir = Path(self.tmp.name)
+        self.prepared = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def prepare(self, path, stream):
+        """Prepare an attachment, recording each call."""
+        self.prepared.append((path, stream))
+        data = base64.b64encode(path.read_bytes()).decode()
+        return PreparedAttachment(path.name, "image/x-png", 0, data, data_digest(data))
+
+    def test_hit_miss_and_change(self):
+        """Test the same file is prepared once and again after it changes."""
+        cache = AttachmentCache()
+        path = self.dir / "a.png"
+        path.write_bytes(b"one")
+        cache.get(path, False, self.prepare)
+        cache.get(path, False, self.prepare)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        path.write_bytes(b"three")  # new size, so a new key
+        self.assertEqual(cache.get(path, False, self.prepare).data, "dGhyZWU=")
+        self.assertEqual(self.prepared, [(path, False), (path, False)])
+
+    def test_same_content_shares_data(self):
+        """Test files with the same content share the encoded string."""
+        cache = AttachmentCache()
+        first, second = self.dir / "a.png", self.dir / "b.png"
+        first.write_bytes(b"same" * 100)
+        second.write_bytes(b"same" * 100)
+        a = cache.get(first, False, self.prepare)
+        b = cache.get(second, False, self.prepare)
+        self.assertIs(a.data, b.data)
+
+    def test_bounded(self):
+        """Test the least recently used entries are dropped."""
+        cache = AttachmentCache(max_entries=2)
+        for name in "abc":
+            path = self.dir / f"{name}.png"
+            path.write_bytes(name.encode())
+            cache.get(path, False, self.prepare)
+        self.assertEqual(len(cache), 2)
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
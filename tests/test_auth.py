@@ -0,0 +1,158 @@
+"""
+Unit tests for the TokenManager, FileTokenStore and TokenAuth classes.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+from threading import Barrier, Lock, Thread
+from time import sleep, time
+
+from freeagent.auth import FileTokenStore, TokenManager, refreshed_token
+from freeagent.base import FreeAgentBase
+
+
+class CountingRefresh:  # pylint: disable=too-few-public-methods
+    """
+    Stand in for the token endpoint, counting the refreshes
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = Lock()
+
+    def __call__(self, token: dict) -> dict:
+        with self._lock:
+            self.calls += 1
+            number = self.calls
+        sleep(self.delay)
+        return refreshed_token(
+            token, {"access_token": f"a{number + 1}", "expires_in": 3600}
+        )
+
+
+def make_token(expires_in: float) -> dict:
+    """
+    Build a token expiring in expires_in seconds
+    """
+    return {
+        "access_token": "a1",
+        "refresh_token": "r1",
+        "expires_at": time() + expires_in,
+    }
+
+
+def run_threads(count: int, target):
+    """
+    Start count threads together and wait for them
+    """
+    barrier = Barrier(count)
+    results = []
+
+    def run():
+        barrier.wait()
+        results.append(target())
+
+    threads = [Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TokenManagerTestCase(unittest.TestCase):
+    """
+    Unit tests for the TokenManager class.
+    """
+
+    def test_needs_token(self):
+        """Test a manager without a token raises ValueError."""
+        with self.assertRaises(ValueError):
+            TokenManager(None)
+
+    def test_expired_token_refreshed_once(self):
+        """Test threads finding the token expired share one refresh."""
+        refresh = CountingRefresh(delay=0.05)
+        saved = []
+        tokens = TokenManager(make_token(-10), refresh, save_token_cb=saved.append)
+        results = run_threads(8, tokens.access_token)
+        self.assertEqual(refresh.calls, 1)
+        self.assertEqual(set(results), {"a2"})
+        self.assertEqual(saved, [tokens.token])
+        self.assertEqual(tokens.token["refresh_token"], "r1")
+
+    def test_refreshed_ahead_of_expiry(self):
+        """Test a token about to expire is used while it refreshes."""
+        refresh = CountingRefresh(delay=0.05)
+        tokens = TokenManager(make_token(100), refresh)
+        self.assertEqual(set(run_threads(8, tokens.access_token)), {"a1"})
+        tokens._background.join()  # pylint: disable=protected-access
+        self.assertEqual(refresh.calls, 1)
+        self.assertEqual(tokens.access_token(), "a2")
+
+    def test_background_failure_retried_at_expiry(self):
+        """Test a failed background refresh leaves the token to be used."""
+
+        def fail(_token):
+            raise ConnectionError("down")
+
+        tokens = TokenManager(make_token(100), fail)
+        self.assertEqual(tokens.access_token(), "a1")
+        tokens._background.join()  # pylint: disable=protected-access
+        tokens.token["expires_at"] = time()
+        with self.assertRaises(ConnectionError):
+            tokens.access_token()
+
+    def test_processes_share_store(self):
+        """Test managers sharing a token file refresh once between them."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "token.json"
+            FileTokenStore(path).save(make_token(-10))
+            refresh = CountingRefresh(delay=0.05)
+            # one manager per process, each with its own view of the file
+            managers = [
+                TokenManager(None, refresh, store=FileTokenStore(path))
+                for _ in range(4)
+            ]
+            results = run_threads(4, lambda: managers.pop().access_token())
+            self.assertEqual(refresh.calls, 1)
+            self.assertEqual(set(results), {"a2"})
+            self.assertEqual(FileTokenStore(path).load()["access_token"], "a2")
+            names = sorted(path.name for path in Path(tmp).iterdir())
+            self.assertEqual(names, ["token.json", "token.json.lock"])
+
+    def test_store_missing(self):
+        """Test a missing or broken token file loads as None."""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FileTokenStore(Path(tmp) / "token.json")
+            self.assertIsNone(store.load())
+            store.path.write_text("{", encoding="utf-8")
+            self.assertIsNone(store.load())
+
+
+class AuthenticateTestCase(unittest.TestCase):
+    """
+    Unit tests for FreeAgentBase.authenticate with a token store.
+    """
+
+    def test_token_from_store(self):
+        """Test authenticate reads the token from the store."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "token.json"
+            FileTokenStore(path).save(make_token(600))
+            api = FreeAgentBase()
+            api.authenticate("ident", "secret", print, token_store=path)
+            self.assertEqual(api.tokens.access_token(), "a1")
+            self.assertIs(api.session.auth.tokens, api.tokens)
+            api.session.close()
+
+    def test_needs_token_or_secret(self):
+        """Test authenticate without a token or secret raises ValueError."""
+        with self.assertRaises(ValueError):
+            FreeAgentBase().authenticate("ident", None, print)
+
+
+if __name__ == "__main__":
+    unittest.main()
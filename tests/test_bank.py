@@ -4,7 +4,9 @@ Covers file handling, transaction explanations, ID lookups, and API integrations
 """
 
 # pylint: disable=protected-access, too-few-public-methods
+import io
 import unittest
+from contextlib import redirect_stdout
 from unittest.mock import MagicMock
 from pathlib import Path
 import tempfile
@@ -12,7 +14,9 @@ import os
 import base64
 
 # Import BankAPI from bank.py
+from freeagent.attachment import AttachmentCache, Base64File
 from freeagent.bank import BankAPI
+from freeagent.base import APIError
 
 
 # Dummy ExplanationPayload class for testing
@@ -88,14 +92,56 @@ class BankAPITestCase(unittest.TestCase):
             self.assertEqual(payload.attachment["description"], "desc")
         os.unlink(tmp.name)
 
+    def test_attach_file_to_explanation_stream(self):
+        """Test a streamed attachment is not read until it is sent."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "receipt.pdf"
+            path.write_bytes(b"data")
+            payload = DummyPayload()
+            self.api.attach_file_to_explanation(payload, path, stream=True)
+            data = payload.attachment["data"]
+            self.assertIsInstance(data, Base64File)
+            self.assertEqual(b"".join(data), base64.b64encode(b"data"))
+            self.assertEqual(payload.attachment["content_type"], "application/x-pdf")
+
+    def test_attach_file_without_cache(self):
+        """Test a file is encoded each time it is attached without a cache."""
+        self.assertIsNone(self.api.attachment_cache)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "invoice.pdf"
+            path.write_bytes(b"invoice")
+            self.api._encode_file_base64 = MagicMock(wraps=self.api._encode_file_base64)
+            self.api.attach_file_to_explanation(DummyPayload(), path)
+            self.api.attach_file_to_explanation(DummyPayload(), path)
+            self.assertEqual(self.api._encode_file_base64.call_count, 2)
+
+    def test_attach_file_reuses_prepared_attachment(self):
+        """Test a file attached twice with a cache is only encoded once."""
+        self.api = BankAPI(self.parent, AttachmentCache())
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "invoice.pdf"
+            path.write_bytes(b"invoice")
+            self.api._encode_file_base64 = MagicMock(wraps=self.api._encode_file_base64)
+            first, second = DummyPayload(), DummyPayload()
+            self.api.attach_file_to_explanation(first, path)
+            self.api.attach_file_to_explanation(second, path, "again")
+            self.api._encode_file_base64.assert_called_once()
+            self.assertIs(first.attachment["data"], second.attachment["data"])
+            self.assertEqual(second.attachment["description"], "again")
+            cache = self.api.attachment_cache
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
     def test_explain_transaction_dryrun(self):
         """Test dry-run mode for explaining a transaction."""
         payload = DummyPayload()
         self.api.serialize_for_api = MagicMock(
             return_value={"description": "desc", "gross_value": 111}
         )
-        self.api.explain_transaction(payload, dryrun=True)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            self.api.explain_transaction(payload, dryrun=True)
         self.parent.post_api.assert_not_called()
+        self.assertEqual(out.getvalue(), "desc 111\n")
 
     def test_explain_transaction_real(self):
         """Test real mode posts the explanation to parent API."""
@@ -103,8 +149,10 @@ class BankAPITestCase(unittest.TestCase):
         self.api.serialize_for_api = MagicMock(
             return_value={"description": "desc", "gross_value": 111}
         )
-        self.api.explain_transaction(payload, dryrun=False)
+        with self.assertLogs("freeagent.bank", "DEBUG") as logs:
+            self.api.explain_transaction(payload, dryrun=False)
         self.parent.post_api.assert_called_once()
+        self.assertIn("desc 111", logs.output[0])
 
     def test_explain_update_dryrun(self):
         """Test dry-run mode for updating an explanation."""
@@ -132,6 +180,15 @@ class BankAPITestCase(unittest.TestCase):
         self.parent.get_api.assert_called_once()
         self.assertEqual(result, dummy_return)
 
+    def test_iter_unexplained_transactions(self):
+        """Test streaming of unexplained transactions."""
+        self.parent.iter_api.return_value = iter([1, 2, 3])
+        result = self.api.iter_unexplained_transactions("accid")
+        self.assertEqual(list(result), [1, 2, 3])
+        self.parent.iter_api.assert_called_once_with(
+            "bank_transactions", {"bank_account": "accid", "view": "unexplained"}
+        )
+
     def test_get_paypal_id_works(self):
         """Test finding PayPal account ID by name."""
         self.parent.get_api.return_value = {
@@ -148,6 +205,7 @@ class BankAPITestCase(unittest.TestCase):
         result_id = self.api.get_first_paypal_id()
         self.assertEqual(result_id, "456")
         self.parent.get_api.return_value = {"bank_accounts": []}
+        self.api.accounts.invalidate()
         result_id = self.api.get_first_paypal_id()
         self.assertIsNone(result_id)
 
@@ -170,9 +228,135 @@ class BankAPITestCase(unittest.TestCase):
         result_id = self.api.get_primary()
         self.assertEqual(result_id, "222")
         self.parent.get_api.return_value = {"bank_accounts": []}
+        self.api.accounts.invalidate()
         result_id = self.api.get_primary()
         self.assertIsNone(result_id)
 
 
+class BankExplanationsTestCase(unittest.TestCase):
+    """
+    Unit tests for the bulk explain_transactions and explain_updates.
+    """
+
+    def setUp(self):
+        self.parent = MagicMock()
+        self.api = BankAPI(self.parent)
+
+    def test_explain_transactions_report(self):
+        """Test bulk explanations carry on after failures and report each one."""
+        payloads = [DummyPayload() for _ in range(4)]
+        self.api.serialize_for_api = lambda p: {"description": p.description}
+        self.parent.post_api.side_effect = [
+            {"bank_transaction_explanation": {"url": "x/1"}},
+            APIError("POST failed 422: bad", 422, "bad"),
+            APIError("POST failed 503: busy", 503, "busy"),
+            {"bank_transaction_explanation": {"url": "x/4"}},
+        ]
+        # one worker so the side effects line up with the payloads
+        report = self.api.explain_transactions(payloads, max_workers=1)
+        self.assertEqual([r.index for r in report.results], [0, 1, 2, 3])
+        self.assertEqual(len(report.succeeded), 2)
+        self.assertEqual(report.failed[0].error, "bad")
+        self.assertEqual(report.failed[0].status_code, 422)
+        self.assertEqual(report.retryable[0].status_code, 503)
+        self.assertFalse(report.ok)
+        self.assertEqual(self.parent.post_api.call_count, 4)
+
+    def test_explain_transactions_other_errors(self):
+        """Test errors other than APIError fail one item, not the batch."""
+        payloads = [DummyPayload() for _ in range(4)]
+        self.api.serialize_for_api = lambda p: {"description": p.description}
+        self.parent.post_api.side_effect = [
+            {"bank_transaction_explanation": {"url": "x/1"}},
+            ValueError("Expecting value: line 1 column 1 (char 0)"),
+            OSError("Connection reset by peer"),
+            {"bank_transaction_explanation": {"url": "x/4"}},
+        ]
+        report = self.api.explain_transactions(payloads, max_workers=1)
+        self.assertEqual(
+            [r.status for r in report.results], ["ok", "failed", "failed", "ok"]
+        )
+        self.assertEqual(report.results[2].error, "Connection reset by peer")
+        self.assertIsNone(report.results[1].status_code)
+        self.assertEqual(self.parent.post_api.call_count, 4)
+
+    def test_explain_transactions_dryrun(self):
+        """Test bulk dry-run serializes without posting."""
+        self.api.serialize_for_api = lambda p: {"description": p.description}
+        report = self.api.explain_transactions([DummyPayload(), DummyPayload()], True)
+        self.parent.post_api.assert_not_called()
+        self.assertEqual([r.status for r in report.results], ["dryrun", "dryrun"])
+        self.assertEqual(report.results[0].data, {"description": "Test"})
+        self.assertTrue(report.ok)
+
+    def test_explain_updates(self):
+        """Test bulk updates put each payload to its url."""
+        self.api.serialize_for_api = lambda p: {"description": p.description}
+        self.parent.max_workers = 2
+        report = self.api.explain_updates(
+            [("url/1", DummyPayload()), ("url/2", DummyPayload())]
+        )
+        self.assertTrue(report.ok)
+        urls = sorted(c.args[0] for c in self.parent.put_api.call_args_list)
+        self.assertEqual(urls, ["url/1", "url/2"])
+
+
+class BankAccountRegistryTestCase(unittest.TestCase):
+    """
+    Unit tests for the bank account lookups through the registry.
+    """
+
+    def setUp(self):
+        self.parent = MagicMock()
+        self.api = BankAPI(self.parent)
+
+    def test_accounts_fetched_once(self):
+        """Test each bank account view is fetched once and indexed."""
+        self.parent.get_api.return_value = {
+            "bank_accounts": [
+                {
+                    "name": "Current",
+                    "type": "StandardBankAccount",
+                    "is_primary": True,
+                    "url": "http://x/y/1",
+                },
+                {
+                    "name": "Savings",
+                    "type": "StandardBankAccount",
+                    "url": "http://x/y/2",
+                },
+            ]
+        }
+        self.assertEqual(self.api.get_id("current"), "1")
+        self.assertEqual(self.api.get_id("SAVINGS"), "2")
+        self.assertEqual(self.api.get_primary(), "1")
+        self.assertEqual(self.api.get_primary_uri(), "http://x/y/1")
+        self.assertIsNone(self.api.get_id("missing"))
+        self.parent.get_api.assert_called_once_with(
+            "bank_accounts", {"view": "standard_bank_accounts"}
+        )
+
+        # ID and url lookups use the views already loaded
+        self.assertEqual(self.api.accounts.by_id(2)["name"], "Savings")
+        self.assertEqual(self.api.accounts.by_url("http://x/y/1")["name"], "Current")
+        self.parent.get_api.assert_called_once()
+
+        self.api.accounts.refresh("standard_bank_accounts")
+        self.assertEqual(self.parent.get_api.call_count, 2)
+
+    def test_accounts_by_type(self):
+        """Test accounts are grouped by type from the unfiltered list."""
+        self.parent.get_api.return_value = {
+            "bank_accounts": [
+                {"name": "A", "type": "PaypalAccount", "url": "http://x/y/1"},
+                {"name": "B", "type": "CreditCardAccount", "url": "http://x/y/2"},
+            ]
+        }
+        paypal = self.api.accounts.by_type("PaypalAccount")
+        self.assertEqual([a["name"] for a in paypal], ["A"])
+        self.assertIsNone(self.api.accounts.by_id("3"))
+        self.parent.get_api.assert_called_once_with("bank_accounts", None)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,263 @@
+"""
+Unit tests for the FreeAgentBase class using a mocked session.
+Covers pagination in get_api and iter_api, retries through the scheduler
+and the conditional get cache.
+"""
+
+# pylint: disable=protected-access
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import ConnectTimeout, ReadTimeout
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from helpers import make_response
+
+from freeagent.base import APIError, FreeAgentBase, PER_PAGE
+from freeagent.cache import LRUCache, SQLiteCache
+from freeagent.scheduler import RequestScheduler
+
+
+class FreeAgentBaseTestCase(unittest.TestCase):
+    """
+    Unit tests for the FreeAgentBase class using MagicMock and dummy data.
+    """
+
+    def setUp(self):
+        self.api = FreeAgentBase(api_base_url="https://api/")
+        self.api.session = MagicMock()
+
+    def _pages(self, total):
+        """
+        Return a side_effect serving total items split into pages
+        """
+        items = list(range(total))
+
+        def get(_method, _url, params=None, **_kwargs):
+            page = params["page"]
+            chunk = items[(page - 1) * PER_PAGE : page * PER_PAGE]
+            return make_response(
+                {"things": chunk}, headers={"X-Total-Count": str(total)}
+            )
+
+        return get
+
+    def test_get_api_single_object(self):
+        """Test endpoints that do not return a list are passed back as is."""
+        self.api.session.request.return_value = make_response({"user": {"id": 1}})
+        self.assertEqual(self.api.get_api("users/me"), {"user": {"id": 1}})
+
+    def test_get_api_uses_total_count(self):
+        """Test remaining pages are fetched using X-Total-Count, in page order."""
+        self.api.session.request.side_effect = self._pages(350)
+        result = self.api.get_api("things", {"view": "all"}, max_workers=3)
+        self.assertEqual(result["things"], list(range(350)))
+        self.assertEqual(self.api.session.request.call_count, 4)
+
+    def test_get_api_exact_page_no_trailing_request(self):
+        """Test a full last page does not cause an extra empty page request."""
+        self.api.session.request.side_effect = self._pages(200)
+        result = self.api.get_api("things")
+        self.assertEqual(len(result["things"]), 200)
+        self.assertEqual(self.api.session.request.call_count, 2)
+
+    def test_get_api_uses_link_header(self):
+        """Test the last page is read from the Link header."""
+        responses = {
+            1: make_response(
+                {"things": [1] * PER_PAGE},
+                links={"last": {"url": "https://api/things?page=2&per_page=100"}},
+            ),
+            2: make_response({"things": [2] * PER_PAGE}),
+        }
+        self.api.session.request.side_effect = (
+            lambda _method, _url, params, **_kwargs: responses[params["page"]]
+        )
+        result = self.api.get_api("things")
+        self.assertEqual(result["things"], [1] * PER_PAGE + [2] * PER_PAGE)
+        self.assertEqual(self.api.session.request.call_count, 2)
+
+    def test_get_api_without_headers_falls_back(self):
+        """Test pages are fetched until a short page when there are no headers."""
+        responses = {
+            1: make_response({"things": [1] * PER_PAGE}),
+            2: make_response({"things": [2] * PER_PAGE}),
+            3: make_response({"things": [3]}),
+        }
+        self.api.session.request.side_effect = (
+            lambda _method, _url, params, **_kwargs: responses[params["page"]]
+        )
+        result = self.api.get_api("things")
+        self.assertEqual(len(result["things"]), 2 * PER_PAGE + 1)
+        self.assertEqual(self.api.session.request.call_count, 3)
+
+    def test_get_api_does_not_change_params(self):
+        """Test the caller's params dict is left alone."""
+        self.api.session.request.return_value = make_response({"things": []})
+        params = {"view": "all"}
+        self.api.get_api("things", params)
+        self.assertEqual(params, {"view": "all"})
+
+    def test_iter_api_yields_every_page(self):
+        """Test iter_api yields the items of every page in order."""
+        self.api.session.request.side_effect = self._pages(250)
+        result = self.api.iter_api("things")
+        self.assertEqual(list(result), list(range(250)))
+        self.assertEqual(self.api.session.request.call_count, 3)
+
+    def test_iter_api_is_lazy(self):
+        """Test iter_api only fetches ahead by one page."""
+        self.api.session.request.side_effect = self._pages(1000)
+        result = self.api.iter_api("things")
+        self.assertEqual(next(result), 0)
+        result.close()
+        self.assertLessEqual(self.api.session.request.call_count, 2)
+
+    def test_iter_api_single_object(self):
+        """Test endpoints that do not return a list yield the object."""
+        self.api.session.request.return_value = make_response({"user": {"id": 1}})
+        self.assertEqual(list(self.api.iter_api("users/me")), [{"user": {"id": 1}}])
+
+    def test_get_api_conditional_cache(self):
+        """Test pages with an ETag are revalidated and 304 served from the cache."""
+        self.api.cache = LRUCache()
+        self.api.session.request.side_effect = [
+            make_response({"categories": [1, 2]}, headers={"ETag": '"v1"'}),
+            make_response(None, status_code=304),
+        ]
+        first = self.api.get_api("categories")
+        first["categories"].append(3)  # must not change the cached copy
+        second = self.api.get_api("categories")
+        self.assertEqual(second, {"categories": [1, 2]})
+        conditional = self.api.session.request.call_args_list[1]
+        self.assertEqual(conditional.kwargs["headers"], {"If-None-Match": '"v1"'})
+
+    def test_get_api_cache_off_by_default(self):
+        """Test a client without a cache sends plain requests."""
+        self.assertIsNone(self.api.cache)
+        self.api.session.request.return_value = make_response(
+            {"things": []}, headers={"ETag": '"v1"'}
+        )
+        self.api.get_api("things")
+        self.api.get_api("things")
+        self.assertIsNone(self.api.session.request.call_args.kwargs["headers"])
+
+    def test_empty_cache_is_kept(self):
+        """Test an empty cache passed in is used, though it is falsy."""
+        cache = LRUCache()
+        self.assertIs(FreeAgentBase(cache=cache).cache, cache)
+
+    def test_get_api_ttl_skips_request(self):
+        """Test pages younger than the cache time to live are not requested."""
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = SQLiteCache(Path(tmp) / "cache.db", ttls={"categories": 60})
+            self.api.cache = cache
+            self.api.session.request.return_value = make_response({"categories": [1]})
+            self.api.get_api("categories")
+
+            # a new client using the same file starts warm
+            api = FreeAgentBase(api_base_url="https://api/", cache=cache)
+            api.session = MagicMock()
+            self.assertEqual(api.get_api("categories"), {"categories": [1]})
+            api.session.request.assert_not_called()
+
+            cache.invalidate("categories")
+            api.session.request.return_value = make_response({"categories": [2]})
+            self.assertEqual(api.get_api("categories"), {"categories": [2]})
+            cache.close()
+
+
+@patch("freeagent.base.sleep")
+class FreeAgentBaseRetryTestCase(unittest.TestCase):
+    """
+    Unit tests for retries in FreeAgentBase._request
+    """
+
+    def setUp(self):
+        self.api = FreeAgentBase(
+            api_base_url="https://api/", scheduler=RequestScheduler(max_retries=2)
+        )
+        self.api.session = MagicMock()
+
+    def test_retries_429_with_retry_after(self, mock_sleep):
+        """Test a 429 is retried after the Retry-After delay."""
+        self.api.session.request.side_effect = [
+            make_response({}, headers={"Retry-After": "7"}, status_code=429),
+            make_response({"user": {"id": 1}}),
+        ]
+        self.assertEqual(self.api.get_api("users/me"), {"user": {"id": 1}})
+        self.assertIn(7.0, [c.args[0] for c in mock_sleep.call_args_list])
+
+    def test_retries_connection_error(self, _mock_sleep):
+        """Test connection errors are retried, then raise APIError."""
+        self.api.session.request.side_effect = [
+            RequestsConnectionError("reset"),
+            make_response({"user": {"id": 1}}),
+        ]
+        self.assertEqual(self.api.get_api("users/me"), {"user": {"id": 1}})
+
+        self.api.session.request.side_effect = RequestsConnectionError("down")
+        with self.assertRaises(APIError) as err:
+            self.api.get_api("users/me")
+        self.assertTrue(err.exception.retryable)
+
+    def test_post_is_not_retried_on_5xx(self, _mock_sleep):
+        """Test a post failing with 503 is sent once and raises a retryable APIError."""
+        self.api.session.request.return_value = make_response(
+            "unavailable", status_code=503
+        )
+        with self.assertRaises(APIError) as err:
+            self.api.post_api("bank_transaction_explanations", "x", {})
+        self.assertEqual(self.api.session.request.call_count, 1)
+        self.assertEqual(err.exception.status_code, 503)
+        self.assertTrue(err.exception.retryable)
+
+    def test_post_retries_429(self, _mock_sleep):
+        """Test a post rejected with 429 is sent again."""
+        self.api.session.request.side_effect = [
+            make_response({}, status_code=429),
+            make_response({"x": {"id": 1}}),
+        ]
+        self.assertEqual(self.api.post_api("things", "x", {}), {"x": {"id": 1}})
+        self.assertEqual(self.api.session.request.call_count, 2)
+
+    def test_post_retries_connect_errors(self, _mock_sleep):
+        """Test a post that could not connect is sent again."""
+        refused = MaxRetryError(None, "https://api/", NewConnectionError(None, "no"))
+        self.api.session.request.side_effect = [
+            ConnectTimeout("slow"),
+            RequestsConnectionError(refused),
+            make_response({"x": {"id": 1}}),
+        ]
+        self.assertEqual(self.api.post_api("things", "x", {}), {"x": {"id": 1}})
+        self.assertEqual(self.api.session.request.call_count, 3)
+
+    def test_sent_post_is_not_retried(self, _mock_sleep):
+        """Test a post that may have reached freeagent is not sent again."""
+        for error in (ReadTimeout("slow"), RequestsConnectionError("reset")):
+            self.api.session.request.reset_mock()
+            self.api.session.request.side_effect = error
+            with self.assertRaises(APIError) as err:
+                self.api.put_api("https://api/x/1", "x", {})
+            self.assertEqual(self.api.session.request.call_count, 1)
+            self.assertFalse(err.exception.retryable)
+
+        self.api.session.request.reset_mock()
+        self.api.session.request.side_effect = [
+            ReadTimeout("slow"),
+            make_response({"user": {"id": 1}}),
+        ]
+        self.assertEqual(self.api.get_api("users/me"), {"user": {"id": 1}})
+
+    def test_put_does_not_retry_client_errors(self, _mock_sleep):
+        """Test a 422 is not retried."""
+        self.api.session.request.return_value = make_response("bad", status_code=422)
+        with self.assertRaises(RuntimeError):
+            self.api.put_api("https://api/x/1", "x", {})
+        self.assertEqual(self.api.session.request.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
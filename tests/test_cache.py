@@ -0,0 +1,150 @@
+"""
+Unit tests for the LRUCache, PrefixedCache and SQLiteCache classes.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+from time import time
+
+from freeagent.cache import (
+    CacheEntry,
+    LRUCache,
+    PrefixedCache,
+    ResponseCache,
+    SQLiteCache,
+    cache_key,
+)
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    """
+    Unit tests for the LRUCache class.
+    """
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest unused entry is dropped when full."""
+        cache = LRUCache(max_entries=2)
+        cache.set("a", CacheEntry(b"1"))
+        cache.set("b", CacheEntry(b"2"))
+        cache.get("a")
+        cache.set("c", CacheEntry(b"3"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(len(cache), 2)
+
+    def test_byte_limit_and_invalidate(self):
+        """Test the byte limit and invalidating by prefix."""
+        cache = LRUCache(max_bytes=4)
+        cache.set("x?page=1", CacheEntry(b"12345"))
+        self.assertEqual(len(cache), 0)
+        cache.set("x?page=1", CacheEntry(b"12"))
+        cache.set("y?page=1", CacheEntry(b"34"))
+        cache.invalidate("x")
+        self.assertIsNone(cache.get("x?page=1"))
+        self.assertEqual(cache.size, 2)
+
+    def test_ttl(self):
+        """Test entries are only fresh for endpoints with a time to live."""
+        cache = LRUCache(ttls={"categories": 60})
+        key = cache_key("categories", {"page": 1})
+        self.assertTrue(cache.is_fresh(key, CacheEntry(b"")))
+        self.assertFalse(cache.is_fresh(key, CacheEntry(b"", stored_at=time() - 61)))
+        other = cache_key("bank_transactions", {"page": 1})
+        self.assertFalse(cache.is_fresh(other, CacheEntry(b"")))
+
+    def test_base_is_abstract(self):
+        """Test a cache must provide get, set and invalidate."""
+        with self.assertRaises(TypeError):
+            ResponseCache()  # pylint: disable=abstract-class-instantiated
+
+
+class PrefixedCacheTestCase(unittest.TestCase):
+    """
+    Unit tests for the PrefixedCache class.
+    """
+
+    def test_views_are_kept_apart(self):
+        """Test views share entries and limits but not keys."""
+        shared = LRUCache(ttls={"categories": 60})
+        acme = PrefixedCache(shared, "acme")
+        globex = PrefixedCache(shared, "globex")
+        acme.set("categories?page=1", CacheEntry(b"1"))
+        globex.set("categories?page=1", CacheEntry(b"2"))
+        self.assertEqual(acme.get("categories?page=1").content, b"1")
+        self.assertEqual(len(shared), 2)
+        self.assertEqual(acme.ttl("categories?page=1"), 60)
+
+        acme.invalidate()
+        self.assertIsNone(acme.get("categories?page=1"))
+        self.assertIsNotNone(globex.get("categories?page=1"))
+
+
+class SQLiteCacheTestCase(unittest.TestCase):
+    """
+    Unit tests for the SQLiteCache class using a temporary file.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = Path(self.tmp.name) / "cache.db"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_between_instances(self):
+        """Test entries are kept in the file and separated by namespace."""
+        cache = SQLiteCache(self.path, namespace="company1")
+        cache.set(
+            "categories?page=1",
+            CacheEntry(b"{}", '"v1"', None, {"X-Total-Count": "1"}, {}),
+        )
+        cache.close()
+
+        cache = SQLiteCache(self.path, namespace="company1")
+        entry = cache.get("categories?page=1")
+        self.assertEqual(entry.content, b"{}")
+        self.assertEqual(entry.etag, '"v1"')
+        self.assertEqual(entry.headers, {"X-Total-Count": "1"})
+        self.assertTrue(cache.is_fresh("categories?page=1", entry))
+        self.assertEqual(len(cache), 1)
+        cache.close()
+
+        other = SQLiteCache(self.path, namespace="company2")
+        self.assertIsNone(other.get("categories?page=1"))
+        self.assertEqual(len(other), 0)
+        other.close()
+
+    def test_eviction_and_invalidate(self):
+        """Test the least recently used entries go once over max_bytes."""
+        cache = SQLiteCache(self.path, max_bytes=10)
+        cache.set("a_1", CacheEntry(b"x" * 4))
+        cache.set("a%2", CacheEntry(b"x" * 4))
+        cache.get("a_1")
+        cache.set("b", CacheEntry(b"x" * 4))
+        self.assertIsNone(cache.get("a%2"))
+        self.assertIsNotNone(cache.get("a_1"))
+
+        cache.invalidate("a_")
+        self.assertIsNone(cache.get("a_1"))
+        self.assertIsNotNone(cache.get("b"))
+        cache.close()
+
+    def test_namespaces_are_case_sensitive(self):
+        """Test namespaces and prefixes differing only in case are kept apart."""
+        upper = SQLiteCache(self.path, namespace="Acme")
+        lower = SQLiteCache(self.path, namespace="acme")
+        upper.set("Categories?page=1", CacheEntry(b"x"))
+        lower.set("categories?page=1", CacheEntry(b"y"))
+        self.assertEqual((len(upper), len(lower)), (1, 1))
+
+        upper.invalidate("categories")
+        self.assertIsNotNone(upper.get("Categories?page=1"))
+        lower.invalidate()
+        self.assertEqual((len(upper), len(lower)), (1, 0))
+        upper.close()
+        lower.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -63,11 +63,11 @@ class CategoryAPITestCase(unittest.TestCase):
     def test_get_nominal_id_finds_code(self):
         """Test category lookup by nominal code."""
         self.parent.get_api.return_value = self.dummy_categories
-        url = self.api.get_nominal_id(101)
+        url = self.api.get_nominal_code_id(101)
         self.assertEqual(url, "http://cat/1")
-        url = self.api.get_nominal_id(303)
+        url = self.api.get_nominal_code_id(303)
         self.assertEqual(url, "http://cat/3")
-        url = self.api.get_nominal_id(999)
+        url = self.api.get_nominal_code_id(999)
         self.assertIsNone(url)
 
     def test_caching_persists_for_getters(self):
@@ -80,6 +80,34 @@ class CategoryAPITestCase(unittest.TestCase):
         url = self.api.get_desc_id("Office")
         self.assertEqual(url, "http://cat/1")
 
+    def test_get_desc_ids_bulk(self):
+        """Test many descriptions are looked up in one call."""
+        self.parent.get_api.return_value = self.dummy_categories
+        urls = self.api.get_desc_ids(["travel", "OFFICE", "missing", "old"])
+        self.assertEqual(urls, ["http://cat/2", "http://cat/1", None, "http://cat/3"])
+        self.parent.get_api.assert_called_once_with("categories")
+
+    def test_index_prefix_and_url(self):
+        """Test prefix search and url lookup."""
+        self.parent.get_api.return_value = self.dummy_categories
+        self.assertEqual(self.api.get_category("http://cat/2")["nominal_code"], "202")
+        found = self.api.index.find_prefix("o")
+        self.assertEqual([c["url"] for c in found], ["http://cat/1", "http://cat/3"])
+        self.assertEqual(self.api.index.find_prefix("x"), [])
+
+    def test_index_rebuilt_on_refresh(self):
+        """Test the index follows the categories when they are fetched again."""
+        self.parent.get_api.return_value = self.dummy_categories
+        self.assertEqual(self.api.get_nominal_code_id(202), "http://cat/2")
+        self.parent.get_api.return_value = {
+            "income": [
+                {"description": "Sales", "url": "http://cat/4", "nominal_code": "202"}
+            ]
+        }
+        self.api.refresh()
+        self.assertEqual(self.api.get_nominal_code_id(202), "http://cat/4")
+        self.assertIsNone(self.api.get_desc_id("Travel"))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,87 @@
+"""
+Unit tests for the transaction exporters.
+"""
+
+import csv
+import io
+import json
+import tempfile
+import unittest
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+from freeagent import export
+from freeagent.export import COLUMNS, export_transactions, write_csv, write_jsonl
+from freeagent.transaction import LazyTransaction
+
+
+def make_rows(count):
+    """Yield rows as returned by the accounting/transactions endpoint."""
+    for i in range(count):
+        yield {
+            "url": f"https://api/transactions/{i}",
+            "dated_on": "2023-01-05",
+            "created_at": "2023-01-06T10:00:00+00:00",
+            "updated_at": "2023-01-07T10:00:00+00:00",
+            "description": f"Payment {i}",
+            "category": "https://api/categories/365",
+            "category_name": "Travel",
+            "nominal_code": "365",
+            "debit_value": "-12.50",
+            "foreign_currency_data": {"currency": "EUR"} if i == 1 else None,
+        }
+
+
+class ExportTestCase(unittest.TestCase):
+    """
+    Unit tests for the CSV, JSON Lines and Parquet exporters.
+    """
+
+    def test_write_csv(self):
+        """Test rows are written with a header and exact amounts."""
+        out = io.StringIO()
+        self.assertEqual(write_csv(make_rows(5), out, chunk_size=2), 5)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(tuple(rows[0]), COLUMNS)
+        self.assertEqual(rows[0]["debit_value"], "-12.50")
+        self.assertEqual(rows[0]["dated_on"], "2023-01-05")
+        self.assertEqual(
+            json.loads(rows[1]["foreign_currency_data"]), {"currency": "EUR"}
+        )
+
+    def test_write_jsonl(self):
+        """Test one JSON object is written per row."""
+        out = io.StringIO()
+        lazy = (LazyTransaction(row) for row in make_rows(3))
+        self.assertEqual(write_jsonl(lazy, out, chunk_size=2), 3)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[2]["url"], "https://api/transactions/2")
+        self.assertEqual(lines[1]["foreign_currency_data"], {"currency": "EUR"})
+        self.assertEqual(lines[0]["created_at"], "2023-01-06T10:00:00+00:00")
+
+    def test_export_by_extension(self):
+        """Test the format is taken from the file extension."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "out.jsonl"
+            self.assertEqual(export_transactions(make_rows(2), path), 2)
+            self.assertEqual(len(path.read_text(encoding="utf-8").splitlines()), 2)
+            with self.assertRaises(ValueError):
+                export_transactions(make_rows(1), Path(tmp) / "out.xls")
+
+    @unittest.skipIf(export.pyarrow is None, "pyarrow is not installed")
+    def test_write_parquet(self):
+        """Test Parquet keeps decimal and date types."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "out.parquet"
+            self.assertEqual(export_transactions(make_rows(5), path, chunk_size=2), 5)
+            table = export.pyarrow.parquet.read_table(path)
+            self.assertEqual(table.num_rows, 5)
+            self.assertEqual(table.column("debit_value")[0].as_py(), Decimal("-12.50"))
+            self.assertEqual(table.column("dated_on")[0].as_py(), date(2023, 1, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
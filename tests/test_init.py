@@ -0,0 +1,59 @@
+"""
+Unit tests for the lazy imports in the freeagent package.
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+import freeagent
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+
+class LazyImportTestCase(unittest.TestCase):
+    """
+    Unit tests for loading submodules on first attribute access
+    """
+
+    def test_public_names(self):
+        """Test every public name resolves to the class in its submodule."""
+        for name in freeagent.__all__:
+            value = getattr(freeagent, name)
+            self.assertEqual(value.__name__, name)
+        self.assertIn("FreeAgent", dir(freeagent))
+
+    def test_unknown_name(self):
+        """Test a name that is not public raises AttributeError."""
+        with self.assertRaises(AttributeError):
+            getattr(freeagent, "NotAThing")
+
+    def test_heavy_modules_deferred(self):
+        """Test the oauth stack and browser load only when authorising."""
+        script = (
+            "import sys\n"
+            "import freeagent\n"
+            "assert 'freeagent.base' not in sys.modules\n"
+            "client = freeagent.FreeAgent()\n"
+            "for name in ('requests_oauthlib', 'webbrowser', 'httpx', 'numpy'):\n"
+            "    assert name not in sys.modules, name\n"
+            "assert 'freeagent.table' not in sys.modules\n"
+            "client.authenticate('id', 'secret', print, {'access_token': 'x'})\n"
+            "assert 'requests' in sys.modules\n"
+            "assert 'requests_oauthlib' not in sys.modules\n"
+            "assert 'webbrowser' not in sys.modules\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            check=False,
+            env={**os.environ, "PYTHONPATH": str(SRC)},
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
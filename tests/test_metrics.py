@@ -0,0 +1,234 @@
+"""
+Unit tests for the instrumentation hooks, MetricsCollector and StatsdExporter,
+using a mocked session and httpx transport.
+"""
+
+# pylint: disable=protected-access
+import unittest
+from time import time
+from unittest.mock import MagicMock, patch
+
+import httpx
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from helpers import make_response
+
+from freeagent.aio import AsyncFreeAgent
+from freeagent.attachment import encode_json
+from freeagent.base import APIError, FreeAgentBase
+from freeagent.cache import LRUCache
+from freeagent.metrics import (
+    Hook,
+    MetricsCollector,
+    RequestEvent,
+    StatsdExporter,
+    endpoint_name,
+)
+from freeagent.scheduler import RequestScheduler
+
+
+class Recorder(Hook):
+    """
+    Hook keeping every event it is called with
+    """
+
+    def __init__(self):
+        self.before = []
+        self.after = []
+
+    def before_request(self, event):
+        """Keep the method, endpoint and status seen before the request."""
+        self.before.append((event.method, event.endpoint, event.status))
+
+    def after_request(self, event):
+        """Keep the completed event."""
+        self.after.append(event)
+
+
+class MetricsCollectorTestCase(unittest.TestCase):
+    """
+    Unit tests for MetricsCollector and StatsdExporter on their own
+    """
+
+    def test_endpoint_name(self):
+        """Test IDs and query strings are removed from endpoint names."""
+        self.assertEqual(
+            endpoint_name("bank_transaction_explanations/123?x=1"),
+            "bank_transaction_explanations/:id",
+        )
+        self.assertEqual(endpoint_name("bank_accounts/7/x2"), "bank_accounts/:id/x2")
+
+    def test_collects_per_endpoint(self):
+        """Test events are totalled by method and endpoint."""
+        collector = MetricsCollector(buckets=(0.1, 1.0))
+        collector.after_request(
+            RequestEvent("GET", "bank_transactions", status=200, latency=0.05)
+        )
+        collector.after_request(
+            RequestEvent(
+                "GET",
+                "bank_transactions",
+                status=429,
+                latency=2.0,
+                retries=2,
+                bytes_received=10,
+            )
+        )
+        collector.after_request(RequestEvent("PUT", "x/:id", error="down"))
+
+        stats = collector.stats()
+        get = stats[("GET", "bank_transactions")]
+        self.assertEqual(get.requests, 2)
+        self.assertEqual(get.errors, 1)
+        self.assertEqual(get.retries, 2)
+        self.assertEqual(get.bytes_received, 10)
+        self.assertEqual(get.statuses, {200: 1, 429: 1})
+        self.assertEqual(get.buckets, [1, 0, 1])
+        self.assertEqual(stats[("PUT", "x/:id")].errors, 1)
+
+        text = collector.prometheus()
+        self.assertIn(
+            'freeagent_requests_total{method="GET",endpoint="bank_transactions",'
+            'status="429"} 1',
+            text,
+        )
+        self.assertIn(
+            'freeagent_request_duration_seconds_bucket{method="GET",'
+            'endpoint="bank_transactions",le="1.0"} 1',
+            text,
+        )
+        self.assertIn(
+            'freeagent_request_duration_seconds_bucket{method="GET",'
+            'endpoint="bank_transactions",le="+Inf"} 2',
+            text,
+        )
+        self.assertIn("# TYPE freeagent_retries_total counter", text)
+
+        collector.reset()
+        self.assertEqual(collector.stats(), {})
+
+    def test_statsd_lines(self):
+        """Test an event is sent as one packet of StatsD lines."""
+        packets = []
+        exporter = StatsdExporter(prefix="fa", send=packets.append)
+        exporter.after_request(
+            RequestEvent(
+                "PUT",
+                "bank_transaction_explanations/:id",
+                status=200,
+                latency=0.25,
+                retries=1,
+            )
+        )
+        lines = packets[0].decode().split("\n")
+        self.assertIn("fa.put.bank_transaction_explanations._id.requests:1|c", lines)
+        self.assertIn(
+            "fa.put.bank_transaction_explanations._id.latency:250.000|ms", lines
+        )
+        self.assertIn("fa.put.bank_transaction_explanations._id.status.200:1|c", lines)
+        self.assertIn("fa.put.bank_transaction_explanations._id.retries:1|c", lines)
+
+
+@patch("freeagent.base.sleep")
+class FreeAgentBaseHooksTestCase(unittest.TestCase):
+    """
+    Unit tests for the hooks called by FreeAgentBase requests
+    """
+
+    def setUp(self):
+        self.recorder = Recorder()
+        self.collector = MetricsCollector()
+        self.api = FreeAgentBase(
+            api_base_url="https://api/",
+            scheduler=RequestScheduler(max_retries=2),
+            cache=LRUCache(),
+            hooks=[self.recorder],
+        )
+        self.api.add_hook(self.collector)
+        self.api.session = MagicMock()
+
+    def test_get_retries_and_cache(self, _mock_sleep):
+        """Test a get reports retries and bytes, then a cache hit."""
+        self.api.session.request.side_effect = [
+            make_response({}, status_code=503),
+            make_response({"user": {"id": 1}}, headers={"ETag": '"a"'}),
+        ]
+        self.api.get_api("users/me")
+        self.assertEqual(self.recorder.before, [("GET", "users/me", None)])
+        event = self.recorder.after[0]
+        self.assertEqual(event.status, 200)
+        self.assertEqual(event.retries, 1)
+        self.assertEqual(event.page, 1)
+        self.assertEqual(event.bytes_received, len(b'{"user": {"id": 1}}'))
+        self.assertGreater(event.latency, 0)
+        self.assertFalse(event.cached)
+
+        self.api.cache.ttl = lambda key: 60  # serve the stored copy
+        self.api.get_api("users/me")
+        self.assertTrue(self.recorder.after[1].cached)
+        self.assertEqual(self.api.session.request.call_count, 2)
+        stats = self.collector.stats()[("GET", "users/me")]
+        self.assertEqual((stats.requests, stats.cached), (2, 1))
+
+    def test_put_and_post(self, _mock_sleep):
+        """Test put and post report the endpoint, body size and failures."""
+        self.api.session.request.return_value = make_response({"x": 1})
+        self.api.put_api("https://api/bank_transaction_explanations/9", "x", {})
+        self.assertEqual(self.api.post_api("things", "x", {"a": 1}), {"x": 1})
+        put, post = self.recorder.after[0], self.recorder.after[1]
+        self.assertEqual(put.endpoint, "bank_transaction_explanations/:id")
+        self.assertEqual(put.bytes_sent, len(encode_json({"x": {}})))
+        self.assertEqual(post.method, "POST")
+        self.assertEqual(post.status, 200)
+
+        self.api.session.request.return_value = make_response("bad", status_code=422)
+        with self.assertRaises(APIError):
+            self.api.post_api("things", "x", {})
+        self.assertEqual(self.recorder.after[-1].status, 422)
+        self.assertEqual(self.collector.stats()[("POST", "things")].errors, 1)
+
+    def test_connection_failure(self, _mock_sleep):
+        """Test a request that never gets a response reports the error."""
+        self.api.session.request.side_effect = RequestsConnectionError("down")
+        with self.assertRaises(APIError):
+            self.api.get_api("users/me")
+        event = self.recorder.after[0]
+        self.assertIsNone(event.status)
+        self.assertEqual(event.retries, 2)
+        self.assertIn("down", event.error)
+
+
+class AsyncHooksTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the hooks called by AsyncFreeAgent requests
+    """
+
+    async def test_get_and_post(self):
+        """Test async gets and posts are reported to the hooks."""
+
+        def handler(request):
+            if request.method == "POST":
+                return httpx.Response(201, json={"thing": {"id": 1}})
+            return httpx.Response(200, json={"things": [1, 2]})
+
+        recorder = Recorder()
+        client = AsyncFreeAgent(
+            api_base_url="https://api/v2/",
+            transport=httpx.MockTransport(handler),
+            hooks=[recorder],
+        )
+        client.authenticate(
+            "ident", "secret", print, {"access_token": "a", "expires_at": time() + 600}
+        )
+        async with client:
+            await client.get_api("things")
+            await client.post_api("things", "thing", {"a": 1})
+
+        get, post = recorder.after[0], recorder.after[1]
+        self.assertEqual((get.method, get.endpoint, get.status), ("GET", "things", 200))
+        self.assertEqual(get.bytes_received, len(b'{"things":[1,2]}'))
+        self.assertEqual((post.method, post.status), ("POST", 201))
+        self.assertEqual(post.bytes_sent, len(encode_json({"thing": {"a": 1}})))
+
+
+if __name__ == "__main__":
+    unittest.main()
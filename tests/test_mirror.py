@@ -0,0 +1,142 @@
+"""
+Unit tests for the SQLiteMirror store.
+"""
+
+import tempfile
+import unittest
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from freeagent.mirror import SQLiteMirror
+from freeagent.sync import IncrementalSync, Watermark
+
+PAYPAL = "https://api/bank_accounts/9"
+
+
+def bank_transaction(ident, dated_on, amount, unexplained="0.0", account=PAYPAL):
+    """Build a bank transaction dict as returned by freeagent."""
+    return {
+        "url": f"https://api/bank_transactions/{ident}",
+        "bank_account": account,
+        "dated_on": dated_on,
+        "amount": amount,
+        "unexplained_amount": unexplained,
+        "updated_at": f"{dated_on}T10:00:00.000Z",
+    }
+
+
+class SQLiteMirrorTestCase(unittest.TestCase):
+    """
+    Unit tests for SQLiteMirror.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.mirror = SQLiteMirror(Path(self.tmp.name) / "mirror.sqlite")
+
+    def tearDown(self):
+        self.mirror.close()
+        self.tmp.cleanup()
+
+    def test_query(self):
+        """Test queries filter by account, date, amount and explanation."""
+        self.mirror.load(
+            "bank_transactions",
+            [
+                bank_transaction(1, "2024-01-10", "-650.00", "-650.00"),
+                bank_transaction(2, "2024-02-10", "-20.00", "-20.00"),
+                bank_transaction(3, "2024-02-11", "-900.00"),
+                bank_transaction(4, "2024-03-01", "700.00", "700.0", "https://a/1"),
+                bank_transaction(5, "2023-12-31", "-800.00", "-800.00"),
+            ],
+        )
+
+        found = self.mirror.unexplained_transactions(
+            "9", start="2024-01-01", end="2024-03-31", min_size="500"
+        )
+
+        self.assertEqual([t["url"][-1] for t in found], ["1"])
+        self.assertEqual(len(self.mirror.query("bank_transactions", min_amount=0)), 1)
+        self.assertEqual(
+            self.mirror.total("bank_transactions", account=PAYPAL), Decimal("-2370.00")
+        )
+        self.assertEqual(len(self.mirror.query("bank_transactions", limit=2)), 2)
+
+    def test_load_replaces(self):
+        """Test loading a record again replaces it."""
+        self.mirror.load("bank_transactions", [bank_transaction(1, "2024-01-10", "-5")])
+        self.mirror.load(
+            "bank_transactions", [bank_transaction(1, "2024-01-10", "-5", "-5")]
+        )
+        self.assertEqual(len(self.mirror.unexplained_transactions("9")), 1)
+        self.assertEqual(len(self.mirror.unexplained_transactions("9", "other")), 0)
+
+    def test_categories_and_nominal_codes(self):
+        """Test categories and accounting transactions are indexed by nominal code."""
+        self.mirror.load_categories(
+            {
+                "admin_expenses_categories": [
+                    {"url": "https://api/categories/365", "nominal_code": "365"}
+                ],
+                "meta": {},
+            }
+        )
+        self.mirror.load(
+            "transactions",
+            [
+                {
+                    "url": "t1",
+                    "dated_on": "2024-01-01",
+                    "nominal_code": "365",
+                    "debit_value": "12.50",
+                },
+                {
+                    "url": "t2",
+                    "dated_on": "2024-01-02",
+                    "nominal_code": "250",
+                    "debit_value": "1.00",
+                },
+            ],
+        )
+        self.assertEqual(len(self.mirror.query("categories", nominal_code=365)), 1)
+        self.assertEqual(
+            self.mirror.total("transactions", nominal_code="365"), Decimal("12.50")
+        )
+
+    def test_sync_store(self):
+        """Test the mirror works as the store of IncrementalSync."""
+        parent = MagicMock()
+        sync = IncrementalSync(parent, self.mirror, "acme")
+        parent.get_api.return_value = {
+            "bank_transactions": [
+                bank_transaction(1, "2024-01-10", "-5", "-5"),
+                bank_transaction(2, "2024-01-11", "-6"),
+            ]
+        }
+        sync.sync_bank_transactions("9")
+        parent.get_api.return_value = {
+            "bank_transactions": [bank_transaction(2, "2024-01-11", "-6")]
+        }
+        with patch("freeagent.sync.time", return_value=1706780000):
+            result = sync.sync_bank_transactions("9", full=True)
+
+        self.assertEqual(result.deleted, 1)
+        self.assertEqual(sync.unexplained_transactions("9"), [])
+        self.assertEqual(len(self.mirror.query("bank_transactions", company="acme")), 1)
+        feed = "bank_transactions?bank_account=9"
+        self.assertEqual(
+            self.mirror.watermark("acme", feed).updated_since,
+            "2024-02-01T09:28:20Z",
+        )
+        self.assertEqual(self.mirror.watermark("other", feed), Watermark())
+
+    def test_bulk_load_batches(self):
+        """Test loads bigger than a batch are all inserted."""
+        rows = (bank_transaction(i, "2024-01-10", "-1") for i in range(25_000))
+        self.assertEqual(self.mirror.load("bank_transactions", rows), 25_000)
+        self.assertEqual(self.mirror.total("bank_transactions"), Decimal("-25000.00"))
+
+
+if __name__ == "__main__":
+    unittest.main()
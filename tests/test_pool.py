@@ -0,0 +1,186 @@
+"""
+Unit tests for ClientPool using a fake requests transport adapter.
+Covers per company tokens, token refresh, cache separation and fan-out.
+"""
+
+# pylint: disable=protected-access
+import json
+import unittest
+from time import time
+from urllib.parse import parse_qs
+
+from requests import Response
+from requests.adapters import BaseAdapter
+
+from freeagent.cache import LRUCache
+from freeagent.pool import ClientPool, TenantScheduler
+from freeagent.scheduler import RequestScheduler
+
+
+class FakeAdapter(BaseAdapter):
+    """
+    Transport adapter answering from a handler function
+    """
+
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+        self.requests = []
+
+    def send(self, request, **_kwargs):  # pylint: disable=arguments-differ
+        self.requests.append(request)
+        status, body, headers = self.handler(request)
+        response = Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode()
+        response.headers.update(headers or {})
+        response.connection = self
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def token(access, expires_in=600):
+    """
+    Build a token for a company
+    """
+    return {
+        "access_token": access,
+        "refresh_token": f"r-{access}",
+        "expires_at": time() + expires_in,
+    }
+
+
+class ClientPoolTestCase(unittest.TestCase):
+    """
+    Unit tests for ClientPool
+    """
+
+    def setUp(self):
+        self.adapter = FakeAdapter(self.handle)
+        self.pool = ClientPool(
+            "ident",
+            "secret",
+            api_base_url="https://api/v2/",
+            cache=LRUCache(),
+            adapter=self.adapter,
+        )
+        self.saved = []
+
+    def tearDown(self):
+        self.pool.close()
+
+    @staticmethod
+    def handle(request):
+        """
+        Answer users/me with the token used, and token refreshes
+        """
+        if request.url.endswith("token_endpoint"):
+            form = parse_qs(request.body)
+            new = form["refresh_token"][0].replace("r-", "new-")
+            return 200, {"access_token": new, "expires_in": 3600}, None
+        auth = request.headers["Authorization"]
+        if auth == "Bearer revoked":
+            return 401, {"errors": []}, None
+        return 200, {"user": {"token": auth}}, {"ETag": auth}
+
+    def test_clients_use_their_own_tokens(self):
+        """Test each company sends its token and shares the connections."""
+        self.pool.add_tenant("acme", token("a"))
+        self.pool.add_tenant("globex", token("g"))
+        self.assertEqual(self.pool.tenants, ["acme", "globex"])
+
+        acme = self.pool.client("acme")
+        self.assertIs(self.pool.client("acme"), acme)
+        self.assertEqual(acme.get_api("users/me"), {"user": {"token": "Bearer a"}})
+        globex = self.pool.client("globex").get_api("users/me")
+        self.assertEqual(globex, {"user": {"token": "Bearer g"}})
+        self.assertIs(
+            self.pool.client("globex").session.pool.session, self.pool.session
+        )
+
+        # the second company did not send the first company's cached ETag
+        self.assertNotIn("If-None-Match", self.adapter.requests[1].headers)
+        acme.get_api("users/me")
+        self.assertEqual(self.adapter.requests[2].headers["If-None-Match"], "Bearer a")
+
+    def test_expired_token_is_refreshed(self):
+        """Test a token about to expire is refreshed and saved before use."""
+        self.pool.add_tenant("acme", token("a", expires_in=5), self.saved.append)
+        response = self.pool.client("acme").get_api("users/me")
+        self.assertEqual(response, {"user": {"token": "Bearer new-a"}})
+        self.assertEqual(self.saved[0]["access_token"], "new-a")
+        self.assertEqual(self.saved[0]["refresh_token"], "r-a")
+
+    def test_unauthorised_refreshes_once(self):
+        """Test a 401 refreshes the token and sends the request again."""
+        self.pool.add_tenant("acme", token("revoked"), self.saved.append)
+        response = self.pool.client("acme").get_api("users/me")
+        self.assertEqual(response, {"user": {"token": "Bearer new-revoked"}})
+        self.assertEqual(len(self.saved), 1)
+
+    def test_map_runs_every_company(self):
+        """Test map returns each company's result, or its exception."""
+        self.pool.add_tenant("acme", token("a"))
+        self.pool.add_tenant("globex", token("g"))
+
+        def job(client):
+            if client.session.tenant == "globex":
+                raise ValueError("no")
+            return client.get_api("users/me")["user"]["token"]
+
+        results = self.pool.map(job)
+        self.assertEqual(results["acme"], "Bearer a")
+        self.assertIsInstance(results["globex"], ValueError)
+        self.assertIsInstance(self.pool.map(job, ["missing"])["missing"], KeyError)
+
+    def test_tenant_needs_a_token(self):
+        """Test adding or re-adding a company without a token raises ValueError."""
+        with self.assertRaises(ValueError):
+            self.pool.add_tenant("acme")
+        self.assertEqual(self.pool.tenants, [])
+        self.pool.add_tenant("acme", token("a"))
+        with self.assertRaises(ValueError):
+            self.pool.add_tenant("acme", save_token_cb=self.saved.append)
+        self.pool.add_tenant("acme", token("b"))
+        self.assertEqual(
+            self.pool.client("acme").get_api("users/me")["user"]["token"], "Bearer b"
+        )
+
+    def test_remove_tenant(self):
+        """Test removing a company drops its client and cached pages."""
+        self.pool.add_tenant("acme", token("a"))
+        self.pool.client("acme").get_api("users/me")
+        self.assertEqual(len(self.pool.cache), 1)
+        self.pool.remove_tenant("acme")
+        self.assertEqual(len(self.pool.cache), 0)
+        with self.assertRaises(KeyError):
+            self.pool.client("acme")
+
+
+class TenantSchedulerTestCase(unittest.TestCase):
+    """
+    Unit tests for TenantScheduler
+    """
+
+    def test_waits_for_both_limits(self):
+        """Test the shared limit holds back a company with slots left."""
+        now = [0.0]
+        shared = RequestScheduler(per_minute=1, per_hour=0, clock=lambda: now[0])
+        first = TenantScheduler(RequestScheduler(clock=lambda: now[0]), shared)
+        second = TenantScheduler(RequestScheduler(clock=lambda: now[0]), shared)
+        self.assertEqual(first.reserve(), 0)
+        self.assertGreater(second.reserve(), 0)
+
+        # a 429 only slows the company that got it
+        first.record(429, {})
+        self.assertLess(first.tenant.factor, 1.0)
+        self.assertEqual(second.tenant.factor, 1.0)
+        self.assertEqual(shared.factor, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
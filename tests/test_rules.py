@@ -0,0 +1,167 @@
+"""
+Unit tests for the bank transaction rule engine.
+"""
+
+import unittest
+from datetime import date
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+from freeagent.category import CategoryAPI, CategoryIndex
+from freeagent.rules import KeywordAutomaton, Rule, RuleSet
+
+CATEGORIES = {
+    "admin_expenses_categories": [
+        {
+            "description": "Travel",
+            "url": "https://api/categories/365",
+            "nominal_code": "365",
+        },
+        {
+            "description": "Computer Software",
+            "url": "https://api/categories/359",
+            "nominal_code": "359",
+        },
+    ],
+    "income_categories": [
+        {
+            "description": "Sales",
+            "url": "https://api/categories/001",
+            "nominal_code": "001",
+        },
+    ],
+}
+
+
+def bank_transaction(ident, description, amount, dated_on="2024-01-10", left=None):
+    """Build a bank transaction dict as returned by freeagent."""
+    return {
+        "url": f"https://api/bank_transactions/{ident}",
+        "dated_on": dated_on,
+        "description": description,
+        "amount": amount,
+        "unexplained_amount": amount if left is None else left,
+    }
+
+
+class KeywordAutomatonTestCase(unittest.TestCase):
+    """
+    Unit tests for the Aho-Corasick automaton.
+    """
+
+    def test_overlapping_keywords(self):
+        """Test every keyword is found, including overlapping ones."""
+        automaton = KeywordAutomaton({"he": {0}, "she": {1}, "hers": {2}, "his": {3}})
+        self.assertEqual(automaton.search("ushers"), {0, 1, 2})
+        self.assertEqual(automaton.search("this"), {3})
+        self.assertEqual(automaton.search("nothing"), set())
+
+
+class RuleSetTestCase(unittest.TestCase):
+    """
+    Unit tests for RuleSet.
+    """
+
+    def setUp(self):
+        self.rules = RuleSet(
+            [
+                Rule("travel", contains=["tfl", "trainline"], max_amount="0"),
+                Rule("359", pattern=r"\b(github|jetbrains)\b", description="Software"),
+                Rule("sales", contains="stripe", min_amount="0", start="2024-01-01"),
+                Rule(
+                    "https://api/categories/365",
+                    predicate=lambda t: t["description"].startswith("UBER"),
+                ),
+            ],
+            CategoryIndex(CATEGORIES),
+        )
+
+    def test_classify(self):
+        """Test the first matching rule wins and builds the payload."""
+        matches = self.rules.classify(
+            [
+                bank_transaction(1, "TFL TRAVEL CHARGE", "-2.80"),
+                bank_transaction(2, "Card GITHUB INC", "-4.00"),
+                bank_transaction(3, "STRIPE PAYOUT", "100.00"),
+                bank_transaction(4, "STRIPE PAYOUT", "100.00", "2023-12-31"),
+                bank_transaction(5, "TFL refund", "2.80"),
+                bank_transaction(6, "UBER TRIP", "-9.00"),
+                bank_transaction(7, "GITHUBBER", "-1.00"),
+            ]
+        )
+
+        self.assertEqual(
+            [m.transaction["url"][-1] for m in matches], ["1", "2", "3", "6"]
+        )
+        travel = matches[0].payload
+        self.assertEqual(travel.category, "https://api/categories/365")
+        self.assertEqual(travel.gross_value, Decimal("-2.80"))
+        self.assertEqual(travel.dated_on, date(2024, 1, 10))
+        self.assertEqual(travel.description, "TFL TRAVEL CHARGE")
+        self.assertEqual(travel.bank_transaction, "https://api/bank_transactions/1")
+        self.assertEqual(matches[1].payload.category, "https://api/categories/359")
+        self.assertEqual(matches[1].payload.description, "Software")
+        self.assertEqual(matches[2].payload.category, "https://api/categories/001")
+
+    def test_rule_needing_keyword_and_pattern(self):
+        """Test a rule with contains and pattern needs both to match."""
+        rules = RuleSet(
+            [Rule("365", contains="amazon", pattern=r"prime\s+video")],
+            CategoryIndex(CATEGORIES),
+        )
+        self.assertEqual(
+            rules.match(bank_transaction(1, "AMAZON PRIME VIDEO", "-1")), 0
+        )
+        self.assertIsNone(rules.match(bank_transaction(2, "AMAZON MKTPLACE", "-1")))
+        self.assertIsNone(rules.match(bank_transaction(3, "PRIME VIDEO", "-1")))
+
+    def test_partly_explained(self):
+        """Test the explanation covers the unexplained part of the amount."""
+        transaction = bank_transaction(1, "TFL TRAVEL", "-10.00", left="-4.00")
+        payload = self.rules.payloads([transaction])[0]
+        self.assertEqual(payload.gross_value, Decimal("-4.00"))
+
+    def test_patterns_that_cannot_be_combined(self):
+        """Test inline flags, backreferences and repeated group names still match."""
+        rules = RuleSet(
+            [
+                Rule("365", pattern=r"(?P<ref>tfl)\s+\d+"),
+                Rule("359", pattern=r"(?P<ref>adobe)"),
+                Rule("001", pattern=r"(?x) stripe \s payout"),
+                Rule("365", pattern=r"ref (\d)\1"),
+            ],
+            CategoryIndex(CATEGORIES),
+        )
+        self.assertEqual(rules.match(bank_transaction(1, "TFL 42", "-1")), 0)
+        self.assertEqual(rules.match(bank_transaction(2, "ADOBE", "-1")), 1)
+        self.assertEqual(rules.match(bank_transaction(3, "STRIPE PAYOUT", "1")), 2)
+        self.assertEqual(rules.match(bank_transaction(4, "REF 77", "-1")), 3)
+        self.assertIsNone(rules.match(bank_transaction(5, "REF 78", "-1")))
+        self.assertIsNone(rules.match(bank_transaction(6, "TESCO", "-1")))
+
+    def test_null_description(self):
+        """Test a null description only matches rules without text conditions."""
+        rules = RuleSet(
+            [Rule("359", contains="adobe"), Rule("365", max_amount="0")],
+            CategoryIndex(CATEGORIES),
+        )
+        payloads = rules.payloads([bank_transaction(1, None, "-1.00")])
+        self.assertEqual(payloads[0].category, "https://api/categories/365")
+        self.assertIsNone(payloads[0].description)
+
+    def test_unknown_category(self):
+        """Test a category that cannot be resolved raises ValueError."""
+        with self.assertRaises(ValueError):
+            RuleSet([Rule("groceries")], CategoryIndex(CATEGORIES))
+
+    def test_compile_rules(self):
+        """Test CategoryAPI loads the categories and compiles the rules."""
+        parent = MagicMock()
+        parent.get_api.return_value = CATEGORIES
+        rules = CategoryAPI(parent).compile_rules([Rule("software", contains="adobe")])
+        payloads = rules.payloads([bank_transaction(1, "ADOBE", "-10.00")])
+        self.assertEqual(payloads[0].category, "https://api/categories/359")
+
+
+if __name__ == "__main__":
+    unittest.main()
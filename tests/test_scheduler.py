@@ -0,0 +1,76 @@
+"""
+Unit tests for the RequestScheduler class using a fake clock.
+"""
+
+# pylint: disable=too-few-public-methods
+import unittest
+
+from freeagent.scheduler import RequestScheduler, TokenBucket
+
+
+class FakeClock:
+    """
+    Clock that only moves when told to
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RequestSchedulerTestCase(unittest.TestCase):
+    """
+    Unit tests for the TokenBucket and RequestScheduler classes.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = RequestScheduler(per_minute=2, per_hour=0, clock=self.clock)
+
+    def test_bucket_spreads_waits(self):
+        """Test an empty bucket hands out increasing waits."""
+        bucket = TokenBucket(2, 60, self.clock)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 30.0)
+        self.assertAlmostEqual(bucket.reserve(), 60.0)
+        self.clock.now += 120
+        self.assertEqual(bucket.reserve(), 0.0)
+
+    def test_retry_after_blocks_everyone(self):
+        """Test Retry-After pauses every request."""
+        self.assertEqual(self.scheduler.record(429, {"Retry-After": "20"}), 20.0)
+        self.assertAlmostEqual(self.scheduler.reserve(), 20.0)
+
+    def test_rate_limit_headers(self):
+        """Test X-RateLimit-Remaining of 0 pauses until the reset."""
+        self.scheduler.record(
+            200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "15"}
+        )
+        self.assertAlmostEqual(self.scheduler.reserve(), 15.0)
+
+    def test_adaptive_slowdown(self):
+        """Test 429 halves the rate and success slowly restores it."""
+        self.scheduler.record(429, {})
+        self.assertEqual(self.scheduler.factor, 0.5)
+        for _ in range(20):
+            self.scheduler.record(200, {})
+        self.assertEqual(self.scheduler.factor, 1.0)
+
+    def test_retry_delay(self):
+        """Test the backoff doubles, stays under the cap and uses Retry-After."""
+        for attempt in range(10):
+            delay = self.scheduler.retry_delay(attempt)
+            cap = min(self.scheduler.max_backoff, self.scheduler.backoff * 2**attempt)
+            self.assertTrue(cap / 2 <= delay <= cap)
+        self.assertEqual(self.scheduler.retry_delay(3, 4.0), 4.0)
+        self.assertTrue(self.scheduler.should_retry(503))
+        self.assertFalse(self.scheduler.should_retry(404))
+        self.assertFalse(self.scheduler.should_retry(503, "POST"))
+        self.assertTrue(self.scheduler.should_retry(429, "PUT"))
+
+
+if __name__ == "__main__":
+    unittest.main()
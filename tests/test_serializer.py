@@ -0,0 +1,93 @@
+"""
+Unit tests for the compiled dataclass serializers.
+"""
+
+import unittest
+from dataclasses import asdict, dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+
+from freeagent.payload import ExplanationPayload, Transaction
+from freeagent.serializer import (
+    compile_serializer,
+    convert_value,
+    get_serializer,
+    serialize,
+)
+
+
+def reference(obj):
+    """
+    The asdict based serializer the compiled ones replace, converting values
+    with the same convert_value rule
+    """
+    if not isinstance(obj, dict):
+        obj = asdict(obj)
+    return {k: convert_value(v) for k, v in obj.items() if v is not None}
+
+
+@dataclass
+class Nested:
+    """
+    dataclass holding another dataclass
+    """
+
+    inner: ExplanationPayload
+    note: Optional[str] = None
+
+
+class SerializerTestCase(unittest.TestCase):
+    """
+    Unit tests comparing compiled serializers with the asdict based one.
+    """
+
+    def test_explanation_payload(self):
+        """Test ExplanationPayload matches the asdict serializer."""
+        payload = ExplanationPayload(
+            category="https://api/categories/285",
+            dated_on=date(2024, 3, 1),
+            gross_value=Decimal("-12.30"),
+            description="Stationery",
+            attachment={"file_name": "a.pdf", "data": "QUJD", "extra": [Decimal("1")]},
+        )
+        result = serialize(payload)
+        self.assertEqual(result, reference(payload))
+        self.assertNotIn("bank_transaction", result)
+        self.assertEqual(result["gross_value"], "-12.30")
+        self.assertEqual(result["dated_on"], "2024-03-01")
+
+    def test_transaction(self):
+        """Test Transaction matches the asdict serializer."""
+        tx = Transaction(
+            url="u",
+            dated_on=date(2024, 1, 2),
+            created_at=datetime(2024, 1, 2, 3, 4, 5),
+            updated_at=datetime(2024, 1, 3, 3, 4, 5),
+            description="d",
+            category="c",
+            category_name="n",
+            nominal_code="250",
+            debit_value=Decimal("9.99"),
+            foreign_currency_data={"rate": Decimal("1.1")},
+        )
+        self.assertEqual(serialize(tx), reference(tx))
+
+    def test_nested_dataclass_and_dict(self):
+        """Test nested dataclasses and plain dicts are converted."""
+        nested = Nested(ExplanationPayload("c", date(2024, 1, 1), Decimal("1")))
+        self.assertEqual(serialize(nested), reference(nested))
+        plain = {"a": Decimal("2.5"), "b": None, "c": [date(2024, 1, 1)]}
+        self.assertEqual(serialize(plain), reference(plain))
+
+    def test_serializer_cached_per_type(self):
+        """Test the serializer is compiled once per type."""
+        self.assertIs(
+            get_serializer(ExplanationPayload), get_serializer(ExplanationPayload)
+        )
+        with self.assertRaises(TypeError):
+            compile_serializer(dict)
+
+
+if __name__ == "__main__":
+    unittest.main()
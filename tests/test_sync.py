@@ -0,0 +1,132 @@
+"""
+Unit tests for IncrementalSync using a mocked parent and MemoryStore.
+"""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from freeagent.sync import IncrementalSync, MemoryStore, SyncStore, since
+
+NOW = 1706780000  # 2024-02-01T09:33:20Z
+
+
+def bank_transaction(ident, updated_at, unexplained="0.0"):
+    """Build a bank transaction dict as returned by freeagent."""
+    return {
+        "url": f"https://api/bank_transactions/{ident}",
+        "updated_at": updated_at,
+        "unexplained_amount": unexplained,
+    }
+
+
+class IncrementalSyncTestCase(unittest.TestCase):
+    """
+    Unit tests for IncrementalSync.
+    """
+
+    def setUp(self):
+        self.parent = MagicMock()
+        self.store = MemoryStore()
+        self.sync = IncrementalSync(self.parent, self.store, "acme")
+        patcher = patch("freeagent.sync.time", return_value=NOW)
+        self.time = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_first_sync_is_full(self):
+        """Test the first sync fetches everything and sets the watermark."""
+        self.parent.get_api.return_value = {
+            "bank_transactions": [
+                bank_transaction(1, "2024-01-02T10:00:00.000Z", "-5.0"),
+                bank_transaction(2, "2024-01-03T10:00:00.000Z"),
+            ]
+        }
+
+        result = self.sync.sync_bank_transactions("7")
+
+        self.assertTrue(result.full)
+        self.assertEqual(result.fetched, 2)
+        self.assertEqual(result.watermark, "2024-02-01T09:28:20Z")
+        self.parent.get_api.assert_called_once_with(
+            "bank_transactions", {"bank_account": "7"}
+        )
+        self.assertEqual(
+            [t["url"][-1] for t in self.sync.unexplained_transactions("7")], ["1"]
+        )
+
+    def test_incremental_sync_upserts_changes(self):
+        """Test later syncs ask for changes only and replace re-explained records."""
+        self.parent.get_api.return_value = {
+            "bank_transactions": [
+                bank_transaction(1, "2024-01-02T10:00:00.000Z", "-5.0"),
+                bank_transaction(2, "2024-01-03T10:00:00.000Z"),
+            ]
+        }
+        self.sync.sync_bank_transactions("7")
+        self.parent.get_api.return_value = {
+            "bank_transactions": [bank_transaction(1, "2024-02-01T09:40:00.000Z")]
+        }
+        self.time.return_value = NOW + 3600
+
+        result = self.sync.sync_bank_transactions("7")
+
+        self.assertFalse(result.full)
+        self.parent.get_api.assert_called_with(
+            "bank_transactions",
+            {"bank_account": "7", "updated_since": "2024-02-01T09:28:20Z"},
+        )
+        self.assertEqual(result.watermark, "2024-02-01T10:28:20Z")
+        self.assertEqual(self.sync.unexplained_transactions("7"), [])
+
+    def test_full_sync_removes_deleted(self):
+        """Test a full sync drops records no longer on freeagent."""
+        self.parent.get_api.return_value = {
+            "transactions": [
+                {
+                    "url": "a",
+                    "updated_at": "2024-01-01T00:00:00Z",
+                    "dated_on": "2024-01-01",
+                },
+                {
+                    "url": "b",
+                    "updated_at": "2024-01-01T00:00:00Z",
+                    "dated_on": "2024-01-01",
+                },
+            ]
+        }
+        self.sync.sync_transactions("365", "2024-01-01", "2024-12-31")
+        self.parent.get_api.return_value = {"transactions": [{"url": "b"}]}
+
+        result = self.sync.sync_transactions("365", "2024-01-01", "2024-12-31", True)
+
+        self.assertEqual(result.deleted, 1)
+        self.assertEqual(result.watermark, "2024-02-01T09:28:20Z")
+        rows = self.sync.transactions("365", "2024-01-01", "2024-12-31")
+        self.assertEqual([row.url for row in rows], ["b"])
+
+    def test_full_every(self):
+        """Test full_every of 0 makes every sync full."""
+        self.sync.full_every = 0
+        self.parent.get_api.return_value = {"bank_transactions": []}
+        self.sync.sync_bank_transactions("7")
+        self.assertTrue(self.sync.sync_bank_transactions("7").full)
+
+    def test_store_is_abstract(self):
+        """Test a store must provide every SyncStore method."""
+        with self.assertRaises(TypeError):
+            SyncStore()  # pylint: disable=abstract-class-instantiated
+
+    def test_watermark_is_fetch_start(self):
+        """Test the watermark ignores updated_at, which may skip records changed
+        while pages were being fetched."""
+        self.sync.clock_skew = 60
+        self.parent.get_api.return_value = {
+            "bank_transactions": [bank_transaction(1, "2030-01-01T00:00:00Z")]
+        }
+        self.assertEqual(
+            self.sync.sync_bank_transactions("7").watermark, since(NOW - 60)
+        )
+        self.assertEqual(since(0), "1970-01-01T00:00:00Z")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+Unit tests for the columnar TransactionTable.
+"""
+
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from freeagent import table
+from freeagent.payload import to_pennies
+from freeagent.table import TransactionTable
+from freeagent.transaction import LazyTransaction
+
+
+def make_row(index, dated_on, value, code="365", name="Travel"):
+    """Build a row as returned by the accounting/transactions endpoint."""
+    return {
+        "url": f"https://api/transactions/{index}",
+        "dated_on": dated_on,
+        "created_at": "2023-01-06T10:00:00+00:00",
+        "updated_at": "2023-01-07T10:00:00+00:00",
+        "description": f"Payment {index}",
+        "category": f"https://api/categories/{code}",
+        "category_name": name,
+        "nominal_code": code,
+        "debit_value": value,
+    }
+
+
+ROWS = [
+    make_row(1, "2023-01-05", "-12.50"),
+    make_row(2, "2023-01-20", "100.00", "250", "Sales"),
+    make_row(3, "2023-02-01", "-7.25"),
+    make_row(4, "2023-03-15", "0.01", "250", "Sales"),
+]
+
+
+class ArrayTableTestCase(unittest.TestCase):
+    """
+    Unit tests for the array backed table.
+    """
+
+    use_numpy = False
+
+    def setUp(self):
+        self.table = TransactionTable.from_rows(ROWS, use_numpy=self.use_numpy)
+
+    def test_columns(self):
+        """Test rows are stored as ordinals, pennies and interned codes."""
+        self.assertEqual(len(self.table), 4)
+        self.assertEqual(list(self.table.pennies), [-1250, 10000, -725, 1])
+        self.assertEqual(int(self.table.dated_on[0]), date(2023, 1, 5).toordinal())
+        self.assertEqual(self.table.pools["nominal_code"], ["365", "250"])
+        self.assertEqual(list(self.table.codes["nominal_code"]), [0, 1, 0, 1])
+
+    def test_round_trip(self):
+        """Test rows convert back to the same Transaction objects."""
+        self.assertEqual(
+            self.table.to_transactions(),
+            [LazyTransaction(row).to_transaction() for row in ROWS],
+        )
+
+    def test_where_and_sum(self):
+        """Test filtering by date and nominal code."""
+        travel = self.table.where(nominal_code="365")
+        self.assertEqual(travel.sum(), -1975)
+        self.assertEqual(travel.total(), Decimal("-19.75"))
+        january = self.table.where("2023-01-01", date(2023, 1, 31))
+        self.assertEqual([t.url[-1] for t in january], ["1", "2"])
+        self.assertEqual(len(self.table.where(category_name=["None"])), 0)
+        with self.assertRaises(ValueError):
+            self.table.mask(description=["x"])
+
+    def test_group_by(self):
+        """Test totals grouped by coded and date columns."""
+        self.assertEqual(
+            self.table.group_by("category_name"), {"Travel": -1975, "Sales": 10001}
+        )
+        self.assertEqual(
+            self.table.group_by("month"),
+            {"2023-01": 8750, "2023-02": -725, "2023-03": 1},
+        )
+        sales = self.table.where(nominal_code=["250"])
+        self.assertEqual(sales.group_by("nominal_code"), {"250": 10001})
+        with self.assertRaises(ValueError):
+            self.table.group_by("url")
+
+    def test_missing_values(self):
+        """Test None is kept apart from the text "None" and can be filtered on."""
+        rows = [make_row(5, "2023-04-01", "-3.00"), make_row(6, "2023-04-02", "-1.00")]
+        rows[0]["category"] = None
+        rows[1]["category"] = "None"
+        built = TransactionTable.from_rows(rows, use_numpy=self.use_numpy)
+        self.assertEqual(
+            built.to_transactions(),
+            [LazyTransaction(row).to_transaction() for row in rows],
+        )
+        self.assertEqual([t.url[-1] for t in built.where(category=None)], ["5"])
+        self.assertEqual([t.url[-1] for t in built.where(category="None")], ["6"])
+        self.assertEqual(built.group_by("category"), {None: -300, "None": -100})
+
+    def test_from_transactions(self):
+        """Test building from Transaction and LazyTransaction rows."""
+        lazy = [LazyTransaction(row) for row in ROWS]
+        built = TransactionTable.from_rows(lazy, use_numpy=self.use_numpy)
+        again = TransactionTable.from_rows(built, use_numpy=self.use_numpy)
+        self.assertEqual(again.to_transactions(), built.to_transactions())
+
+
+@unittest.skipIf(table.numpy is None, "NumPy is not installed")
+class NumpyTableTestCase(ArrayTableTestCase):
+    """
+    Unit tests for the NumPy backed table.
+    """
+
+    use_numpy = True
+
+
+class PenniesTestCase(unittest.TestCase):
+    """
+    Unit tests for amount conversion.
+    """
+
+    def test_to_pennies(self):
+        """Test amounts convert to whole pennies."""
+        self.assertEqual(to_pennies("-12.50"), -1250)
+        self.assertEqual(to_pennies(Decimal("3")), 300)
+        self.assertEqual(to_pennies("0.005"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,9 +4,29 @@ Unit tests for the TransactionAPI class using offline dummy data and mocks.
 
 # pylint: disable=protected-access, too-few-public-methods
 import unittest
+from datetime import date
+from decimal import Decimal
 from unittest.mock import MagicMock
 
-from freeagent.transaction import TransactionAPI
+from freeagent.payload import Transaction
+from freeagent.transaction import (
+    LazyTransaction,
+    TransactionAPI,
+    date_shards,
+    parse_date,
+)
+
+TRANSACTION_DATA = {
+    "url": "https://api/transactions/1",
+    "dated_on": "2023-01-05",
+    "created_at": "2023-01-06T10:00:00+00:00",
+    "updated_at": "2023-01-07T10:00:00+00:00",
+    "description": "Train ticket",
+    "category": "https://api/categories/365",
+    "category_name": "Travel",
+    "nominal_code": "365",
+    "debit_value": "-12.50",
+}
 
 
 class TransactionAPITestCase(unittest.TestCase):
@@ -24,20 +44,127 @@ class TransactionAPITestCase(unittest.TestCase):
         nominal_code = "123"
         start_date = "2023-01-01"
         end_date = "2023-01-31"
-        expected_transactions = {"transactions": ["transaction1", "transaction2"]}
-        self.parent.get_api.return_value = expected_transactions
+        self.parent.get_api.return_value = {"transactions": [TRANSACTION_DATA]}
 
         transactions = self.api.get_transactions(nominal_code, start_date, end_date)
 
         self.parent.get_api.assert_called_once_with(
-            "transactions",
+            "accounting/transactions",
             {
                 "nominal_code": nominal_code,
                 "from_date": start_date,
                 "to_date": end_date,
             },
         )
-        self.assertEqual(transactions, expected_transactions)
+        self.assertEqual(len(transactions), 1)
+        self.assertIsInstance(transactions[0], Transaction)  # not lazy by default
+        self.assertEqual(transactions[0].dated_on, date(2023, 1, 5))
+        self.assertEqual(transactions[0].debit_value, Decimal("-12.50"))
+
+    def test_iter_transactions(self):
+        """Test that transactions are streamed from iter_api."""
+        self.parent.iter_api.return_value = iter([TRANSACTION_DATA, TRANSACTION_DATA])
+
+        transactions = self.api.iter_transactions("365", "2023-01-01", "2023-01-31")
+
+        self.assertEqual([t.category_name for t in transactions], ["Travel", "Travel"])
+        self.parent.iter_api.assert_called_once()
+        self.parent.get_api.assert_not_called()
+
+    def test_lazy_rows_parse_on_access(self):
+        """Test lazy rows only parse the fields that are read, once."""
+        self.parent.get_api.return_value = {"transactions": [dict(TRANSACTION_DATA)]}
+
+        row = self.api.get_transactions("365", "2023-01-01", "2023-01-31", lazy=True)[0]
+
+        self.assertIsInstance(row, LazyTransaction)
+        self.assertEqual(row.parsed, {})
+        self.assertEqual(row.debit_value, Decimal("-12.50"))
+        self.assertEqual(list(row.parsed), ["debit_value"])
+        self.assertIs(row.debit_value, row.debit_value)
+        self.assertEqual(row.description, "Train ticket")
+        self.assertIsNone(row.source_item_url)
+        self.assertIsNone(row.foreign_currency_data)
+
+    def test_lazy_matches_eager(self):
+        """Test lazy rows hold the same values as parsed Transaction objects."""
+        self.parent.get_api.return_value = {"transactions": [TRANSACTION_DATA]}
+
+        eager = self.api.get_transactions("365", "2023-01-01", "2023-01-31")
+        lazy = self.api.get_transactions("365", "2023-01-01", "2023-01-31", lazy=True)
+
+        self.assertIsInstance(eager[0], Transaction)
+        self.assertEqual(lazy[0], eager[0])
+        self.assertEqual(lazy[0].to_transaction(), eager[0])
+        self.assertEqual(lazy[0].updated_at.year, 2023)
+
+    def test_parse_date_memoised(self):
+        """Test repeated dates are parsed once."""
+        self.assertEqual(parse_date("2023-02-28"), date(2023, 2, 28))
+        self.assertIs(parse_date("2023-02-28"), parse_date("2023-02-28"))
+
+    def test_get_transaction_table(self):
+        """Test a columnar table is built from iter_api pages."""
+        self.parent.iter_api.return_value = iter([TRANSACTION_DATA, TRANSACTION_DATA])
+
+        table = self.api.get_transaction_table("365", "2023-01-01", "2023-01-31")
+
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.sum(), -2500)
+        self.parent.get_api.assert_not_called()
+
+    def test_date_shards(self):
+        """Test date ranges split into calendar months and years."""
+        self.assertEqual(
+            date_shards("2023-11-15", "2024-02-03"),
+            [
+                ("2023-11-15", "2023-11-30"),
+                ("2023-12-01", "2023-12-31"),
+                ("2024-01-01", "2024-01-31"),
+                ("2024-02-01", "2024-02-03"),
+            ],
+        )
+        self.assertEqual(
+            date_shards("2023-11-15", "2024-02-03", "year"),
+            [("2023-11-15", "2023-12-31"), ("2024-01-01", "2024-02-03")],
+        )
+        self.assertEqual(date_shards("2024-01-01", "2023-01-01"), [])
+        with self.assertRaises(ValueError):
+            date_shards("2023-01-01", "2023-02-01", "week")
+
+    def test_get_transactions_batch(self):
+        """Test every code and month is fetched once and merged without repeats."""
+
+        def get_api(endpoint, params, max_workers):
+            self.assertEqual(endpoint, "accounting/transactions")
+            self.assertEqual(max_workers, 1)
+            rows = [
+                dict(
+                    TRANSACTION_DATA,
+                    url=f"{params['nominal_code']}/{params['from_date']}",
+                ),
+                dict(TRANSACTION_DATA, url="shared"),
+            ]
+            return {"transactions": rows}
+
+        self.parent.get_api.side_effect = get_api
+
+        rows = self.api.get_transactions_batch(
+            ["365", "250", "365"], "2023-01-01", "2023-02-28", max_workers=3
+        )
+
+        self.assertEqual(self.parent.get_api.call_count, 4)
+        self.assertEqual(
+            [t.url for t in rows],
+            [
+                "365/2023-01-01",
+                "shared",
+                "365/2023-02-01",
+                "250/2023-01-01",
+                "250/2023-02-01",
+            ],
+        )
+        self.assertTrue(all(isinstance(t, Transaction) for t in rows))
 
 
 if __name__ == "__main__":